@@ -0,0 +1,65 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from pydantic import BaseModel, Field
+from app.core.config import settings, EmbeddingProvider
+from app.services.vector_index import (
+    create_vector_index, list_vector_indexes, drop_vector_index, index_name,
+    CHUNK_TABLES
+)
+import logging
+from typing import Literal, Optional
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class IndexCreate(BaseModel):
+    method: Literal["hnsw", "ivfflat"] = "hnsw"
+    # Defaults to the configured distance and provider, i.e. the operator class, chunk table
+    # and vector dimension that searches use
+    distance: Literal["l2", "cosine", "inner_product"] = Field(default_factory=lambda: settings.VECTOR_DISTANCE)
+    provider: EmbeddingProvider = Field(default_factory=lambda: settings.EMBEDDING_PROVIDER)
+    concurrently: bool = True
+    m: Optional[int] = None
+    ef_construction: Optional[int] = None
+    lists: Optional[int] = None
+    quantization: Literal["none", "halfvec", "binary"] = "none"
+
+async def _build_index(request: IndexCreate):
+    try:
+        await create_vector_index(
+            request.method,
+            request.distance,
+            request.provider,
+            request.concurrently,
+            request.m,
+            request.ef_construction,
+            request.lists,
+            request.quantization
+        )
+    except Exception as e:
+        logger.error(f"Error building vector index: {e}")
+
+@router.get("/admin/indexes")
+async def get_indexes():
+    try:
+        return await list_vector_indexes()
+    except Exception as e:
+        logger.error(f"Error listing vector indexes: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/admin/indexes", status_code=202)
+async def create_index(request: IndexCreate, background_tasks: BackgroundTasks):
+    # Index builds on large tables take minutes, so build in the background and report progress via GET
+    name = index_name(CHUNK_TABLES[request.provider].__tablename__, request.method, request.distance, request.quantization)
+    background_tasks.add_task(_build_index, request)
+    return {"message": f"Building index '{name}'", "index": name}
+
+@router.delete("/admin/indexes/{name}")
+async def delete_index(name: str, concurrently: bool = True):
+    try:
+        dropped = await drop_vector_index(name, concurrently)
+    except Exception as e:
+        logger.error(f"Error dropping vector index: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if not dropped:
+        raise HTTPException(status_code=404, detail=f"Vector index '{name}' not found")
+    return {"message": f"Index '{name}' dropped successfully"}
@@ -1,17 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, insert, delete
+from app.core.config import settings
 from app.db.database import get_db
-from app.models import Collection, Document, ChunkOllama, ChunkOpenAI
+from app.models import Collection, CollectionStats, Document, ChunkOllama, ChunkOpenAI
+from app.services.chunk_partitions import create_collection_partitions, drop_collection_partitions
+from app.services.collection_registry import invalidate_collection_ids
+from app.services.collection_stats import get_all_collection_stats, get_collection_stats
+from app.services.export import NDJSON_MEDIA_TYPE, chunk_export, collection_chunks_query, stream_ndjson
+from app.services.vector_index import ensure_vector_index
+from app.services.memory_index import remove_snapshots
 import logging
-from typing import List
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 class CollectionCreate(BaseModel):
     name: str
+    vector_quantization: Literal["none", "halfvec", "binary"] = "none"
+    rerank_oversample: Optional[int] = Field(None, ge=1, le=100)
+
+class CollectionSettings(BaseModel):
+    vector_quantization: Optional[Literal["none", "halfvec", "binary"]] = None
+    rerank_oversample: Optional[int] = Field(None, ge=1, le=100)
+
+def _settings_response(collection: Collection) -> dict:
+    return {
+        "name": collection.name,
+        "vector_quantization": collection.vector_quantization,
+        "rerank_oversample": collection.rerank_oversample or settings.RERANK_OVERSAMPLE
+    }
 
 @router.get("/collections", response_model=List[str])
 async def get_collections(db: AsyncSession = Depends(get_db)):
@@ -21,8 +42,10 @@ async def get_collections(db: AsyncSession = Depends(get_db)):
         
         if not collections:
             # If no collections exist, create the default collection
-            await db.execute(insert(Collection).values(name="Default"))
+            result = await db.execute(insert(Collection).values(name="Default").returning(Collection.id))
+            await create_collection_partitions(db, result.scalar_one())
             await db.commit()
+            invalidate_collection_ids()
             collections = ["Default"]
         
         return collections
@@ -30,17 +53,91 @@ async def get_collections(db: AsyncSession = Depends(get_db)):
         logger.error(f"Error fetching collections: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/collections/stats")
+async def get_collections_stats(db: AsyncSession = Depends(get_db)):
+    """Counters of every collection and their totals."""
+    try:
+        return await get_all_collection_stats(db)
+    except Exception as e:
+        logger.error(f"Error fetching collection statistics: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/collections/{collection_name}/stats")
+async def get_collection_stats_endpoint(collection_name: str, db: AsyncSession = Depends(get_db)):
+    try:
+        stats = await get_collection_stats(db, collection_name)
+        if stats is None:
+            raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' not found")
+        return stats
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching collection statistics: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.post("/collections")
-async def create_collection(collection: CollectionCreate, db: AsyncSession = Depends(get_db)):
+async def create_collection(collection: CollectionCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
     try:
-        new_collection = Collection(name=collection.name)
+        new_collection = Collection(
+            name=collection.name,
+            vector_quantization=collection.vector_quantization,
+            rerank_oversample=collection.rerank_oversample
+        )
         db.add(new_collection)
+        await db.flush()
+        # Its chunk partitions (partitioned layout) exist as soon as the collection does
+        await create_collection_partitions(db, new_collection.id)
         await db.commit()
+        invalidate_collection_ids()
+        if collection.vector_quantization != "none":
+            background_tasks.add_task(ensure_vector_index, [collection.vector_quantization])
         return {"message": f"Collection '{collection.name}' created successfully"}
     except Exception as e:
         logger.error(f"Error creating collection: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/collections/{collection_name}/settings")
+async def get_collection_settings(collection_name: str, db: AsyncSession = Depends(get_db)):
+    try:
+        result = await db.execute(select(Collection).where(Collection.name == collection_name))
+        collection = result.scalar_one_or_none()
+        if not collection:
+            raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' not found")
+        return _settings_response(collection)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching collection settings: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.patch("/collections/{collection_name}/settings")
+async def update_collection_settings(
+    collection_name: str,
+    update: CollectionSettings,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """Change how a collection is searched; the quantized index is built in the background if missing."""
+    try:
+        result = await db.execute(select(Collection).where(Collection.name == collection_name))
+        collection = result.scalar_one_or_none()
+        if not collection:
+            raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' not found")
+        if update.vector_quantization is not None:
+            collection.vector_quantization = update.vector_quantization
+        if update.rerank_oversample is not None:
+            collection.rerank_oversample = update.rerank_oversample
+        response = _settings_response(collection)
+        await db.commit()
+        if response["vector_quantization"] != "none":
+            background_tasks.add_task(ensure_vector_index, [response["vector_quantization"]])
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating collection settings: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.delete("/collections/{collection_name}")
 async def delete_collection(collection_name: str, db: AsyncSession = Depends(get_db)):
     try:
@@ -51,22 +148,43 @@ async def delete_collection(collection_name: str, db: AsyncSession = Depends(get
         if not collection:
             raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' not found")
         
-        # Delete associated documents and chunks
-        await db.execute(delete(ChunkOllama).where(ChunkOllama.document_id.in_(
-            select(Document.id).where(Document.collection_id == collection.id)
-        )))
-        await db.execute(delete(ChunkOpenAI).where(ChunkOpenAI.document_id.in_(
-            select(Document.id).where(Document.collection_id == collection.id)
-        )))
+        # Delete associated documents and chunks; a partitioned chunk table drops the collection's partition
+        partitioned = await drop_collection_partitions(db, collection.id)
+        for chunk_table in (ChunkOllama, ChunkOpenAI):
+            if chunk_table.__tablename__ not in partitioned:
+                await db.execute(delete(chunk_table).where(chunk_table.collection_id == collection.id))
         await db.execute(delete(Document).where(Document.collection_id == collection.id))
+        await db.execute(delete(CollectionStats).where(CollectionStats.collection_id == collection.id))
         
         # Delete the collection
         await db.execute(delete(Collection).where(Collection.id == collection.id))
         
         await db.commit()
+        invalidate_collection_ids()
+        remove_snapshots(collection.id)
         return {"message": f"Collection '{collection_name}' and its documents deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error deleting collection: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/collections/{collection_name}/export")
+async def export_collection(collection_name: str, include_vectors: bool = True, db: AsyncSession = Depends(get_db)):
+    """Stream every chunk of the collection as NDJSON, one chunk per line."""
+    try:
+        result = await db.execute(select(Collection.id).where(Collection.name == collection_name))
+        collection_id = result.scalar_one_or_none()
+        if collection_id is None:
+            raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' not found")
+
+        return StreamingResponse(
+            stream_ndjson(collection_chunks_query(collection_id), lambda row: chunk_export(row, include_vectors)),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"Content-Disposition": f'attachment; filename="{collection_name}.ndjson"'}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting collection: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,44 +1,135 @@
-from fastapi import APIRouter, UploadFile, File, Header, HTTPException, Depends, Body
-from pydantic import BaseModel
+from fastapi import APIRouter, UploadFile, File, Header, HTTPException, Depends, Body, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, func, Float, union
+from sqlalchemy import select, delete, func
 from app.db.database import get_db
 from app.services.document_service import DocumentService
-from app.models import Collection, Document, ChunkOllama, ChunkOpenAI, Vector
-from sqlalchemy.orm import joinedload
+from app.models import Collection, Document, ChunkOllama, ChunkOpenAI
 import logging
-from typing import Optional, List, Dict
-from app.services.embeddings import get_embeddings
-from app.core.config import settings, EmbeddingProvider
+from typing import Any, Literal, Optional, List, Dict, Tuple
+import time
+from app.services.embeddings import get_query_embedding, get_query_embeddings, EmbeddingError
+from app.services.vector_index import active_chunk_table, apply_search_params
+from app.services.collection_stats import apply_stats_delta, bump_collection_version
+from app.services.search import hybrid_search, batch_hybrid_search, single_query_latency
+from app.services.collection_registry import resolve_collection_ids
+from app.services.result_cache import get_result_cache
+from app.services.ingestion import IngestionQueue, get_ingestion_queue, new_job_id, spool_path
+from app.services.uploads import UploadTooLarge, discard_upload, is_pdf, iter_upload_file, spool_upload
+from app.core.config import settings
+from app.core.metrics import QUERY_EMBEDDING_SECONDS
+from app.services.chunking import check_chunk_options
+from app.services.export import NDJSON_MEDIA_TYPE, chunk_summary, document_chunks_query, stream_ndjson
+from fastapi.responses import JSONResponse, StreamingResponse
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+async def ingest_upload(
+    queue: IngestionQueue,
+    db: AsyncSession,
+    blocks,
+    filename: str,
+    collection_name: str,
+    chunk_size: Optional[int],
+    chunk_overlap: Optional[int],
+    expect_pdf: bool = False
+):
+    """
+    Spool an upload to disk as it arrives, then queue it for the ingestion workers (202 with
+    the job id) or, in sync mode, ingest it from the spooled file within the request.
+    """
+    # Reject before spooling: a streamed text body is not received at all, while a multipart
+    # upload has already been parsed by Starlette but is not copied to the spool directory
+    check_chunk_options(filename, chunk_size, chunk_overlap)
+    result = await db.execute(select(Collection.id).where(Collection.name == collection_name))
+    if result.scalar_one_or_none() is None:
+        raise ValueError(f"Collection not found: {collection_name}")
+
+    job_id = new_job_id()
+    source_path = spool_path(job_id)
+    try:
+        if not await spool_upload(blocks, source_path):
+            raise HTTPException(status_code=400, detail="Empty file provided")
+        if expect_pdf and not is_pdf(source_path):
+            raise HTTPException(status_code=400, detail="Invalid PDF file")
+
+        if settings.INGEST_MODE == "async":
+            job = await queue.submit(filename, collection_name, source_path, chunk_size, chunk_overlap, job_id=job_id)
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "message": "Document queued for processing",
+                    "job_id": job.id,
+                    "status_url": f"/api/jobs/{job.id}"
+                }
+            )
+
+        result = await DocumentService(db).upload_document(
+            source_path,
+            filename,
+            collection_name,
+            chunk_size,
+            chunk_overlap
+        )
+        discard_upload(source_path)
+        return {
+            "message": "Document uploaded successfully",
+            "document_id": result.document_id,
+            "chunks_created": result.chunks,
+            "chunks_added": result.added,
+            "chunks_kept": result.kept,
+            "chunks_removed": result.removed
+        }
+    except BaseException:
+        discard_upload(source_path)
+        raise
+
+
+def parse_search_options(query: Dict[str, Any]) -> Tuple[List[str], int, Optional[int], Optional[int]]:
+    """Validate the options shared by the query endpoints: (collections, limit, ef_search, probes)."""
+    collections = query.get("collections", "Default")
+    limit = query.get("limit", settings.DEFAULT_SEARCH_LIMIT)
+
+    # Validate limit
+    try:
+        limit = int(limit)
+        if limit < settings.MIN_SEARCH_LIMIT or limit > settings.MAX_SEARCH_LIMIT:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Limit must be between {settings.MIN_SEARCH_LIMIT} and {settings.MAX_SEARCH_LIMIT}"
+            )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Limit must be a number")
+
+    # Optional ANN tuning: higher values raise recall at the cost of latency
+    ef_search = query.get("ef_search")
+    probes = query.get("probes")
+    try:
+        ef_search = int(ef_search) if ef_search is not None else None
+        probes = int(probes) if probes is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ef_search and probes must be numbers")
+    if ef_search is not None and not limit <= ef_search <= settings.MAX_HNSW_EF_SEARCH:
+        raise HTTPException(status_code=400, detail=f"ef_search must be between {limit} and {settings.MAX_HNSW_EF_SEARCH}")
+    if probes is not None and probes < 1:
+        raise HTTPException(status_code=400, detail="probes must be at least 1")
+    if isinstance(collections, str):
+        collections = [c.strip() for c in collections.split(',') if c.strip()]
+    if not collections:
+        collections = ["Default"]
+    return collections, limit, ef_search, probes
+
+
 @router.post("/query")
 async def query_documents(
     query: Dict[str, str | int] = Body(...),
     db: AsyncSession = Depends(get_db)
 ):
     try:
+        start = time.perf_counter()
         query_text = str(query.get("query", "")).strip().lower()
-        collections = query.get("collections", "Default")
-        limit = query.get("limit", settings.DEFAULT_SEARCH_LIMIT)
-        
-        # Validate limit
-        try:
-            limit = int(limit)
-            if limit < settings.MIN_SEARCH_LIMIT or limit > settings.MAX_SEARCH_LIMIT:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Limit must be between {settings.MIN_SEARCH_LIMIT} and {settings.MAX_SEARCH_LIMIT}"
-                )
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Limit must be a number")
-        if isinstance(collections, str):
-            collections = [c.strip() for c in collections.split(',') if c.strip()]
-        if not collections:
-            collections = ["Default"]
+        collections, limit, ef_search, probes = parse_search_options(query)
 
         if not query_text:
             raise HTTPException(status_code=400, detail="Query text is required")
@@ -46,130 +137,146 @@ async def query_documents(
         # Log the search query for debugging
         logger.debug(f"Searching for: '{query_text}' in collections: {collections}")
 
-        # Get the embedding for the query
-        query_embedding = await get_embeddings([query_text])
-        if not query_embedding or len(query_embedding) == 0:
+        # Identical requests over unchanged collections are answered without embedding or searching
+        result_cache = get_result_cache()
+        cache_key = None
+        if result_cache is not None:
+            collection_ids = await resolve_collection_ids(db, collections)
+            cache_key = await result_cache.key(db, query_text, collection_ids, limit, ef_search, probes)
+            cached = await result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # Get the embedding for the query (cached per provider/model and normalized text)
+        try:
+            with QUERY_EMBEDDING_SECONDS.time():
+                query_embedding = await get_query_embedding(query_text)
+        except EmbeddingError:
             raise HTTPException(status_code=500, detail="Failed to generate query embedding")
 
-        query_embedding = query_embedding[0]
+        # Applies to this transaction only, so pooled connections keep the server defaults
+        await apply_search_params(db, ef_search, probes)
 
-        # Select the appropriate chunk table based on the embedding provider
-        chunk_table = ChunkOllama if settings.EMBEDDING_PROVIDER == EmbeddingProvider.OLLAMA else ChunkOpenAI
+        # Keyword and vector candidates fused with reciprocal-rank fusion in one statement
+        search_results = await hybrid_search(db, query_text, query_embedding, collections, limit)
 
-        # First get exact text matches
-        text_matches_query = (
-            select(
-                chunk_table.content,
-                chunk_table.chunk_index,
-                Document.filename,
-                Collection.name.label('collection_name'),
-                func.cast(0.0, Float).label("distance")  # Give text matches a distance of 0
-            )
-            .select_from(chunk_table)
-            .join(Document, chunk_table.document_id == Document.id)
-            .join(Collection, Document.collection_id == Collection.id)
-        )
+        logger.debug(f"Search results: {search_results}")
+        single_query_latency.observe(time.perf_counter() - start)
+        if cache_key is not None:
+            await result_cache.set(cache_key, search_results)
 
-        # Add collection filter if specific collections are selected
-        if '-' not in collections:
-            text_matches_query = text_matches_query.where(Collection.name.in_(collections))
-        
-        # Add content search condition
-        text_matches = text_matches_query.where(
-            func.lower(chunk_table.content).op('~*')(f'\\y{query_text}\\y')
-        )
+        return search_results
 
-        # Then get vector similarity matches
-        vector_matches_query = (
-            select(
-                chunk_table.content,
-                chunk_table.chunk_index,
-                Document.filename,
-                Collection.name.label('collection_name'),
-                func.l2_distance(chunk_table.content_vector, func.cast(query_embedding, Vector)).label("distance")
-            )
-            .select_from(chunk_table)
-            .join(Document, chunk_table.document_id == Document.id)
-            .join(Collection, Document.collection_id == Collection.id)
-        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error performing vector search: {e}")
+        raise HTTPException(status_code=500, detail=f"Error performing vector search: {str(e)}")
 
-        # Add collection filter if specific collections are selected
-        if '-' not in collections:
-            vector_matches_query = vector_matches_query.where(Collection.name.in_(collections))
-        
-        vector_matches = vector_matches_query.order_by("distance").limit(limit)
+@router.post("/query/batch")
+async def query_documents_batch(
+    query: Dict[str, Any] = Body(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Run many searches with the same options in one round trip: the query texts are embedded
+    in one provider batch and searched with a single SQL statement.
+    """
+    try:
+        start = time.perf_counter()
+        queries = query.get("queries")
+        if not isinstance(queries, list) or not queries:
+            raise HTTPException(status_code=400, detail="queries must be a non-empty list of query texts")
+        if len(queries) > settings.MAX_BATCH_QUERIES:
+            raise HTTPException(status_code=400, detail=f"At most {settings.MAX_BATCH_QUERIES} queries per batch")
+        query_texts = [str(q).strip().lower() for q in queries]
+        if not all(query_texts):
+            raise HTTPException(status_code=400, detail="Query text is required")
+        collections, limit, ef_search, probes = parse_search_options(query)
 
-        # Combine results with text matches first, then vector matches
-        results = await db.execute(
-            union(text_matches, vector_matches)
-            .order_by("distance")
-            .limit(limit)
-        )
+        try:
+            with QUERY_EMBEDDING_SECONDS.time():
+                query_embeddings = await get_query_embeddings(query_texts)
+        except EmbeddingError:
+            raise HTTPException(status_code=500, detail="Failed to generate query embedding")
+        embedded = time.perf_counter()
 
-        search_results = []
-        for row in results:
-            distance = row.distance
-            if hasattr(distance, 'to_list'):
-                distance = distance.to_list()[0] if distance.to_list() else 0.0
-            elif isinstance(distance, (list, tuple)):
-                distance = distance[0] if distance else 0.0
-            elif isinstance(distance, str):
-                try:
-                    distance = float(distance)
-                except ValueError:
-                    distance = 0.0
-            else:
-                try:
-                    distance = float(distance)
-                except (TypeError, ValueError):
-                    logger.warning(f"Unexpected distance type: {type(distance)}. Using default value.")
-                    distance = 0.0
-
-            logger.debug(f"Raw distance: {row.distance}, Processed distance: {distance}")
-
-            search_results.append({
-                "chunk_content": row.content,
-                "document_filename": row.filename,
-                "collection_name": row.collection_name,
-                "distance": distance,
-                "chunk_number": row.chunk_index
-            })
+        await apply_search_params(db, ef_search, probes)
+        search_results = await batch_hybrid_search(db, query_texts, query_embeddings, collections, limit)
+        finished = time.perf_counter()
 
-        logger.debug(f"Search results: {search_results}")
-
-        return search_results
+        # Estimate against the observed average latency of single /api/query requests
+        total = finished - start
+        sequential = single_query_latency.value * len(query_texts) if single_query_latency.value is not None else None
+        return {
+            "results": [
+                {"query": query_text, "results": results}
+                for query_text, results in zip(query_texts, search_results)
+            ],
+            "timing": {
+                "queries": len(query_texts),
+                "embedding_ms": round((embedded - start) * 1000, 2),
+                "search_ms": round((finished - embedded) * 1000, 2),
+                "total_ms": round(total * 1000, 2),
+                "estimated_sequential_ms": round(sequential * 1000, 2) if sequential is not None else None,
+                "estimated_time_saved_ms": round((sequential - total) * 1000, 2) if sequential is not None else None
+            }
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error performing vector search: {e}")
-        raise HTTPException(status_code=500, detail=f"Error performing vector search: {str(e)}")
+        logger.error(f"Error performing batch vector search: {e}")
+        raise HTTPException(status_code=500, detail=f"Error performing batch vector search: {str(e)}")
 
 @router.delete("/documents/{document_id}")
 async def delete_document(document_id: int, db: AsyncSession = Depends(get_db)):
     try:
-        # Delete associated chunks
-        await db.execute(delete(ChunkOllama).where(ChunkOllama.document_id == document_id))
-        await db.execute(delete(ChunkOpenAI).where(ChunkOpenAI.document_id == document_id))
+        collection_id = (await db.execute(
+            select(Document.collection_id).where(Document.id == document_id)
+        )).scalar_one_or_none()
+
+        # Delete associated chunks, measuring the ones counted in the collection statistics
+        chunk_table = active_chunk_table()
+        result = await db.execute(
+            delete(chunk_table).where(chunk_table.document_id == document_id).returning(func.length(chunk_table.content))
+        )
+        lengths = result.scalars().all()
+        for other_table in (ChunkOllama, ChunkOpenAI):
+            if other_table is not chunk_table:
+                await db.execute(delete(other_table).where(other_table.document_id == document_id))
         
         # Delete the document
         result = await db.execute(delete(Document).where(Document.id == document_id))
-        await db.commit()
         
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Document not found")
+
+        if collection_id is not None:
+            await apply_stats_delta(db, collection_id, documents=-1, chunks=-len(lengths), characters=-sum(lengths))
+            await bump_collection_version(db, collection_id)
+        await db.commit()
         
         return {"message": "Document deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting document: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.post("/documents/upload/text", status_code=201)
+@router.post(
+    "/documents/upload/text",
+    status_code=201,
+    openapi_extra={"requestBody": {"required": True, "content": {"text/plain": {"schema": {"type": "string"}}}}}
+)
 async def upload_text_document(
-    content: str = Body(..., media_type="text/plain"),
+    request: Request,
     collection_name: Optional[str] = Header(None, alias="Collection-Name", description="Collection Name"),
     document_name: Optional[str] = Header(None, alias="Document-Name", description="Document Name"),
     chunk_size: Optional[int] = Header(None, alias="Chunk-Size", description="Custom chunk size"),
     chunk_overlap: Optional[int] = Header(None, alias="Chunk-Overlap", description="Custom chunk overlap"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     if not collection_name:
         raise HTTPException(status_code=400, detail="No Collection-Name provided in header")
@@ -178,21 +285,14 @@ async def upload_text_document(
         raise HTTPException(status_code=400, detail="No Document-Name provided in header")
 
     try:
-        document_service = DocumentService(db)
-        document_id, chunks_created = await document_service.upload_document(
-            content.encode('utf-8'),
-            document_name,
-            collection_name,
-            chunk_size,
-            chunk_overlap
+        # The body is streamed to disk rather than read into memory
+        return await ingest_upload(
+            queue, db, request.stream(), document_name, collection_name, chunk_size, chunk_overlap
         )
-        
-        return {
-            "message": "Document uploaded successfully",
-            "document_id": document_id,
-            "chunks_created": chunks_created
-        }
-        
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -200,67 +300,29 @@ async def upload_text_document(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/documents/{document_id}/chunks")
-async def get_document_chunks(document_id: int, db: AsyncSession = Depends(get_db)):
+async def get_document_chunks(
+    document_id: int,
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one chunk per line"),
+    db: AsyncSession = Depends(get_db)
+):
     try:
-        # Fetch the document with its chunks
-        query = select(Document).options(
-            joinedload(Document.chunks_ollama),
-            joinedload(Document.chunks_openai)
-        ).where(Document.id == document_id)
-        result = await db.execute(query)
-        document = result.unique().scalar_one_or_none()
-
+        document = await db.get(Document, document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
 
-        # Determine which chunks to use based on the embedding provider
-        chunks = document.chunks_ollama if document.chunks_ollama else document.chunks_openai
-
-        # Format the chunks data
-        chunks_data = []
-        for chunk in chunks:
-            chunk_text = chunk.content
-            chunk_start = chunk_text[:50]  # First 50 characters
-            chunk_end = chunk_text[-50:]   # Last 50 characters
-            
-            # Safely handle the content_vector
-            embedding_preview = []
-            if chunk.content_vector is not None:
-                if isinstance(chunk.content_vector, (list, tuple)):
-                    embedding_preview = chunk.content_vector[:5]
-                elif hasattr(chunk.content_vector, 'to_list'):
-                    embedding_preview = chunk.content_vector.to_list()[:5]
-                elif isinstance(chunk.content_vector, str):
-                    try:
-                        embedding_preview = eval(chunk.content_vector)[:5]
-                    except:
-                        logger.warning(f"Failed to parse content_vector string: {chunk.content_vector[:100]}...")
-                elif hasattr(chunk.content_vector, 'tolist'):  # For numpy arrays
-                    embedding_preview = chunk.content_vector.tolist()[:5]
-                else:
-                    logger.warning(f"Unexpected content_vector type: {type(chunk.content_vector)}")
-                    try:
-                        embedding_preview = list(chunk.content_vector)[:5]
-                    except:
-                        logger.error(f"Failed to convert content_vector to list: {chunk.content_vector}")
-            
-            # Ensure all elements in embedding_preview are float
-            embedding_preview = [float(x) for x in embedding_preview if x is not None][:5]
-
-            chunks_data.append({
-                "chunk_number": chunk.chunk_index,
-                "chunk_start": chunk_start,
-                "chunk_end": chunk_end,
-                "embedding_preview": embedding_preview
-            })
-
-        response_data = {
+        query = document_chunks_query(document_id)
+        if format == "ndjson":
+            # Rows are read through a server-side cursor and sent as they arrive
+            return StreamingResponse(stream_ndjson(query, chunk_summary), media_type=NDJSON_MEDIA_TYPE)
+
+        result = await db.execute(query)
+        return {
             "document_id": document.id,
             "filename": document.filename,
-            "chunks": chunks_data
+            "chunks": [chunk_summary(row) for row in result]
         }
-        logger.debug(f"Chunks data for document {document_id}: {response_data}")
-        return response_data
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching document chunks: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -271,7 +333,8 @@ async def upload_document(
     collection_name: Optional[str] = Header(None, alias="Collection-Name", description="Collection Name"),
     chunk_size: Optional[int] = Header(None, alias="Chunk-Size", description="Custom chunk size"),
     chunk_overlap: Optional[int] = Header(None, alias="Chunk-Overlap", description="Custom chunk overlap"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     if not file:
         raise HTTPException(status_code=400, detail="No file provided")
@@ -285,29 +348,15 @@ async def upload_document(
         raise HTTPException(status_code=400, detail="Only PDF, TXT, and MD files are supported")
 
     try:
-        content = await file.read()
-        if not content:
-            raise HTTPException(status_code=400, detail="Empty file provided")
-
-        # Check if it's a PDF or text file
-        if file.filename.lower().endswith('.pdf') and not content.startswith(b'%PDF'):
-            raise HTTPException(status_code=400, detail="Invalid PDF file")
-
-        document_service = DocumentService(db)
-        document_id, chunks_created = await document_service.upload_document(
-            content, 
-            file.filename, 
-            collection_name,
-            chunk_size,
-            chunk_overlap
+        # Copied block by block, so the upload is never held in memory as a whole
+        return await ingest_upload(
+            queue, db, iter_upload_file(file), file.filename, collection_name, chunk_size, chunk_overlap,
+            expect_pdf=file.filename.lower().endswith('.pdf')
         )
-        
-        return {
-            "message": "Document uploaded successfully",
-            "document_id": document_id,
-            "chunks_created": chunks_created
-        }
-        
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -315,11 +364,23 @@ async def upload_document(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/documents", response_model=List[dict])
-async def get_documents(db: AsyncSession = Depends(get_db)):
+async def get_documents(
+    response: Response,
+    collection: Optional[str] = Query(None, description="Only documents in this collection"),
+    sort: Literal["id", "filename", "created_at"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(settings.DOCUMENTS_PAGE_SIZE, ge=1, le=settings.MAX_DOCUMENTS_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    db: AsyncSession = Depends(get_db)
+):
     try:
         document_service = DocumentService(db)
-        documents = await document_service.get_documents()
+        documents, next_cursor = await document_service.get_documents(collection, sort, order, limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return documents
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         logger.error(f"Error fetching documents: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching documents: {str(e)}")
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.services.ingestion import IngestionQueue, get_ingestion_queue
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, queue: IngestionQueue = Depends(get_ingestion_queue)):
+    try:
+        job = await queue.get(job_id)
+    except Exception as e:
+        logger.error(f"Error fetching ingestion job: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "filename": job.filename,
+        "collection_name": job.collection_name,
+        "chunks_embedded": job.chunks_embedded,
+        "chunks_total": job.chunks_total,
+        "pages_done": job.pages_done,
+        "pages_total": job.pages_total,
+        "document_id": job.document_id,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at
+    }
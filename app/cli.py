@@ -0,0 +1,98 @@
+"""
+Administrative commands, run inside the app container:
+
+    python -m app.cli create-index --method hnsw --distance cosine
+    python -m app.cli list-indexes
+    python -m app.cli drop-index ix_chunks_ollama_vector_hnsw_cosine
+    python -m app.cli partition-chunks
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from app.core.config import settings, EmbeddingProvider
+from app.db.database import engine
+from app.services import chunk_partitions, vector_index
+
+logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+async def _create_index(args):
+    await vector_index.create_vector_index(
+        args.method,
+        args.distance,
+        EmbeddingProvider(args.provider) if args.provider else None,
+        not args.blocking,
+        args.m,
+        args.ef_construction,
+        args.lists,
+        args.quantization
+    )
+
+
+async def _list_indexes(args):
+    print(json.dumps(await vector_index.list_vector_indexes(), indent=2))
+
+
+async def _drop_index(args):
+    if not await vector_index.drop_vector_index(args.name, not args.blocking):
+        raise SystemExit(f"Vector index '{args.name}' not found")
+
+
+async def _partition_chunks(args):
+    provider = EmbeddingProvider(args.provider) if args.provider else settings.EMBEDDING_PROVIDER
+    table_name = vector_index.CHUNK_TABLES[provider].__tablename__
+    async with engine.begin() as conn:
+        if table_name in await chunk_partitions.partitioned_tables(conn):
+            raise SystemExit(f"{table_name} is already partitioned")
+        copied = await chunk_partitions.partition_chunk_table(conn, table_name)
+    print(f"Copied {copied} chunks into partitions of {table_name}")
+    if provider == settings.EMBEDDING_PROVIDER:
+        # The ANN indexes were dropped with the old table
+        await vector_index.ensure_vector_index()
+
+
+async def _run(args):
+    try:
+        await args.handler(args)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(required=True)
+
+    create = commands.add_parser("create-index", help="Build an ANN index on a chunk table")
+    create.add_argument("--method", choices=vector_index.INDEX_METHODS, default=settings.VECTOR_INDEX_METHOD if settings.VECTOR_INDEX_METHOD != "none" else "hnsw")
+    create.add_argument("--distance", choices=list(vector_index.DISTANCE_OPS), default=settings.VECTOR_DISTANCE)
+    create.add_argument("--provider", choices=[p.value for p in EmbeddingProvider])
+    create.add_argument("--m", type=int)
+    create.add_argument("--ef-construction", type=int)
+    create.add_argument("--lists", type=int)
+    create.add_argument("--quantization", choices=vector_index.QUANTIZATIONS, default="none",
+                        help="Index a halfvec or binary quantized copy of the vectors")
+    create.add_argument("--blocking", action="store_true", help="Build without CONCURRENTLY (locks writes, but faster)")
+    create.set_defaults(handler=_create_index)
+
+    listing = commands.add_parser("list-indexes", help="Show ANN indexes and whether they are valid")
+    listing.set_defaults(handler=_list_indexes)
+
+    drop = commands.add_parser("drop-index", help="Drop an ANN index")
+    drop.add_argument("name")
+    drop.add_argument("--blocking", action="store_true")
+    drop.set_defaults(handler=_drop_index)
+
+    partition = commands.add_parser(
+        "partition-chunks",
+        help="Convert a chunk table to the partitioned layout (locks the table while its chunks are copied)"
+    )
+    partition.add_argument("--provider", choices=[p.value for p in EmbeddingProvider])
+    partition.set_defaults(handler=_partition_chunks)
+
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,24 +13,118 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "ragpass"
     POSTGRES_DB: str = "ragdb"
     DATABASE_URL: str = "postgresql://raguser:ragpass@db:5432/ragdb"
+    # "production" uses a connection pool; "development" opens a connection per session and echoes SQL
+    DB_ENGINE_PROFILE: Literal["production", "development"] = "production"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a pooled connection is replaced
+    DB_STATEMENT_CACHE_SIZE: int = 100  # Prepared statements cached per connection
+    DB_ECHO: bool = False
+    DB_BINARY_VECTORS: bool = True  # Send vectors in pgvector's binary format
 
     # Embedding configuration
     EMBEDDING_PROVIDER: EmbeddingProvider = EmbeddingProvider.OLLAMA
     EMBEDDING_MODEL: str = "nomic-embed-text"
     EMBEDDING_DIMENSION: int = 1536  # Default to OpenAI's dimension
     OLLAMA_EMBEDDING_DIMENSION: int = 768  # Ollama's default dimension
+    EMBEDDING_NORMALIZE: bool = False  # L2-normalize embeddings before storing them
     OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_BATCH_SIZE: int = 64  # Texts per /api/embed request
+    OLLAMA_MAX_CONCURRENCY: int = 4  # Batches in flight at once
+    OLLAMA_MAX_CONNECTIONS: int = 8  # Size of the shared keep-alive pool
+    OLLAMA_TIMEOUT: float = 60.0
+    OLLAMA_MAX_RETRIES: int = 3  # Attempts for a single text before giving up
     
-    # Optional OpenAI configuration (only needed if using OpenAI provider)
-    OPENAI_API_KEY: Optional[str] = None
+    # Persistent embedding cache, keyed by provider, model, dimension and chunk text hash
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 1_000_000
+    EMBEDDING_CACHE_MAX_AGE_DAYS: int = 90
+    EMBEDDING_CACHE_EVICT_INTERVAL: int = 10_000  # Cache writes between eviction passes
+    
+    # In-process cache of query text -> embedding for /api/query (0 disables it)
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    QUERY_EMBEDDING_CACHE_TTL: float = 3600.0  # Seconds
+    
+    # OpenAI or an OpenAI-compatible server (only needed if using OpenAI provider)
+    OPENAI_API_KEY: Optional[str] = None  # Not needed by most local servers
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    OPENAI_BATCH_SIZE: int = 512  # Inputs per request (the OpenAI API accepts up to 2048)
+    OPENAI_BATCH_TOKENS: int = 100_000  # Estimated tokens per request (the OpenAI API accepts up to 300k)
+    OPENAI_CHARS_PER_TOKEN: float = 4.0  # Used to estimate tokens without a tokenizer
+    OPENAI_MAX_CONCURRENCY: int = 8  # Requests in flight at most; lowered while the server answers 429
+    OPENAI_MAX_CONNECTIONS: int = 16
+    OPENAI_TIMEOUT: float = 60.0
+    OPENAI_MAX_RETRIES: int = 8  # Attempts per request on 429, 5xx and connection errors
+    OPENAI_DIMENSIONS: Optional[int] = None  # Sent as "dimensions" (text-embedding-3 models) when set
+    OPENAI_ENCODING_FORMAT: Literal["float", "base64"] = "float"  # base64 is ~4x smaller; not every server supports it
+
+    # Vector search and ANN indexes
+    VECTOR_DISTANCE: Literal["l2", "cosine", "inner_product"] = "l2"
+    VECTOR_INDEX_METHOD: Literal["none", "hnsw", "ivfflat"] = "hnsw"  # Index ensured on startup
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    IVFFLAT_LISTS: int = 100
+    INDEX_BUILD_MAINTENANCE_WORK_MEM: Optional[str] = None  # e.g. "1GB" for faster builds
+    MAX_HNSW_EF_SEARCH: int = 1000
+    RERANK_OVERSAMPLE: int = 4  # Quantized candidates per re-ranked candidate, unless set on the collection
+    # Keep scanning the ANN index until enough chunks pass the collection filter (pgvector 0.8+)
+    VECTOR_ITERATIVE_SCAN: Literal["off", "relaxed_order", "strict_order"] = "off"
+    COLLECTION_ID_CACHE_SIZE: int = 10000  # Collection name -> id entries cached per worker
+    COLLECTION_ID_CACHE_TTL: float = 60.0  # Seconds before another worker's collection changes are seen
+
+    # In-process exact search over memory-mapped snapshots of small, frequently queried collections
+    MEMORY_INDEX_ENABLED: bool = False
+    MEMORY_INDEX_DIR: str = "data/memory_index"  # Shared by the workers of one host
+    MEMORY_INDEX_MAX_CHUNKS: int = 50000  # Larger collections are always searched in Postgres
+    MEMORY_INDEX_HOT_QUERIES: int = 20  # Queries to a collection (per worker) before it is snapshotted
+    MEMORY_INDEX_MAX_COLLECTIONS: int = 32  # Snapshots kept mapped per worker
+
+    # Cache of /api/query results, keyed by request and collection versions: "memory" (per worker) or "redis" (shared)
+    RESULT_CACHE_BACKEND: Literal["off", "memory", "redis"] = "memory"
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Budget of the "memory" backend
+    RESULT_CACHE_TTL: float = 3600.0  # Seconds; results are never stale, this only bounds unused entries
+    RESULT_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Hybrid search: keyword and vector candidates fused with reciprocal-rank fusion
+    TEXT_SEARCH_CONFIG: str = "simple"  # Baked into content_tsv; a change rebuilds the column on startup
+    HYBRID_CANDIDATE_FACTOR: int = 4  # Candidates per list = limit * factor
+    RRF_K: int = 60
 
     # App configuration
+    METRICS_ENABLED: bool = True  # When off, instrumentation is a no-op and /metrics is empty
     LOG_LEVEL: str = "DEBUG"
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    # "auto" splits Markdown at headings and everything else by sentence
+    CHUNK_STRATEGY: Literal["auto", "character", "sentence", "markdown", "token"] = "auto"
+    CHUNK_MAX_TOKENS: int = 256  # Chunk size and overlap for the "token" strategy
+    CHUNK_OVERLAP_TOKENS: int = 32
+    PDF_PROCESS_WORKERS: int = 0  # Processes extracting PDF text; 0 means one per CPU
+    PDF_PAGES_PER_TASK: int = 8
+    CHUNK_INSERT_METHOD: Literal["copy", "executemany", "orm"] = "copy"
+    # "partitioned" list-partitions the chunk tables by collection: one partition and ANN index per collection
+    CHUNK_TABLE_LAYOUT: Literal["plain", "partitioned"] = "plain"
+
+    # Ingestion jobs: "async" uploads return 202 with a job id, "sync" processes within the request
+    INGEST_MODE: Literal["async", "sync"] = "async"
+    INGEST_WORKERS: int = 2  # Concurrent ingestion jobs per app process
+    INGEST_SPOOL_DIR: str = "data/ingest"  # Must survive restarts for unfinished jobs to resume
+    MAX_UPLOAD_BYTES: int = 256 * 1024 * 1024  # Larger uploads are rejected with 413
+    UPLOAD_READ_SIZE: int = 1024 * 1024  # Bytes read per block when spooling and decoding uploads
+    INGEST_POLL_INTERVAL: float = 2.0  # Seconds between queue polls when idle
+    INGEST_JOB_STALE_AFTER: int = 300  # Seconds without a worker heartbeat before a running job is requeued
+    INGEST_MAX_ATTEMPTS: int = 3
+    INGEST_EMBED_BATCH_SIZE: int = 256  # Chunks embedded and stored per step
+    REINDEX_MODE: Literal["incremental", "replace"] = "incremental"  # On re-upload, keep unchanged chunks or rewrite all
     DEFAULT_SEARCH_LIMIT: int = 10
     MIN_SEARCH_LIMIT: int = 5
     MAX_SEARCH_LIMIT: int = 20
+    MAX_BATCH_QUERIES: int = 100  # Queries accepted by one /api/query/batch request
+    DOCUMENTS_PAGE_SIZE: int = 100  # Default page size of GET /api/documents
+    MAX_DOCUMENTS_PAGE_SIZE: int = 1000
+    STREAM_YIELD_PER: int = 1000  # Rows fetched per server-side cursor round trip in NDJSON responses
 
     class Config:
         env_file = ".env"
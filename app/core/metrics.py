@@ -0,0 +1,335 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Metrics are declared once at module level and updated from the hot paths. With
+METRICS_ENABLED off every declaration returns the shared no-op metric, so instrumented
+code only pays for an empty method call.
+"""
+from app.core.config import settings
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import bisect
+import math
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Timer:
+    """Context manager observing its elapsed time on a histogram (or child)."""
+    __slots__ = ("_target", "_start")
+
+    def __init__(self, target):
+        self._target = target
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._target.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float, count: int = 1):
+        """Record ``count`` observations of ``value``."""
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += count
+            self.sum += value * count
+            self.count += count
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], float]] = None
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from ``function`` at collection time instead of storing it."""
+        self._function = function
+
+    def _unlabelled(self):
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        if self._function is not None:
+            lines.append(f"{self.name} {_format_value(self._function())}")
+            return lines
+        for key, child in sorted(self._children.items()):
+            lines += self._sample_lines(key, child)
+        return lines
+
+    def _sample_lines(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._unlabelled().dec(amount)
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS, registry=None):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float, count: int = 1):
+        self._unlabelled().observe(value, count)
+
+    def time(self) -> _Timer:
+        return _Timer(self._unlabelled())
+
+    def _sample_lines(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.upper_bounds, child.counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        inf_labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_bucket{inf_labels} {child.count}")
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class _NoOpMetric:
+    """Stands in for every metric type when metrics are disabled."""
+
+    def labels(self, *values, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1.0):
+        pass
+
+    def dec(self, amount: float = 1.0):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float, count: int = 1):
+        pass
+
+    def time(self):
+        return _NULL_TIMER
+
+    def set_function(self, function):
+        pass
+
+
+_NULL_TIMER = nullcontext()
+NOOP = _NoOpMetric()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._callbacks: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Run ``callback`` before every collection, e.g. to sample pool usage into gauges."""
+        self._callbacks.append(callback)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        for callback in self._callbacks:
+            callback()
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()):
+    return Counter(name, documentation, labelnames) if settings.METRICS_ENABLED else NOOP
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()):
+    return Gauge(name, documentation, labelnames) if settings.METRICS_ENABLED else NOOP
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+    return Histogram(name, documentation, labelnames, buckets) if settings.METRICS_ENABLED else NOOP
+
+
+# Ingestion
+PDF_PARSE_SECONDS = histogram("rag_pdf_parse_seconds", "Time to extract and split one range of PDF pages")
+CHUNKING_SECONDS = histogram("rag_chunking_seconds", "Time spent splitting a document's text into chunks", ["format"])
+CHUNKS_WRITTEN = counter("rag_chunks_written_total", "Chunks inserted into the chunk table", ["method"])
+DB_INSERT_SECONDS = histogram("rag_db_insert_seconds", "Time to write one batch of chunks", ["method"])
+
+# Embeddings
+EMBEDDING_BATCH_SECONDS = histogram("rag_embedding_batch_seconds", "Latency of one embedding provider request", ["provider"])
+EMBEDDING_TEXT_SECONDS = histogram(
+    "rag_embedding_text_seconds", "Provider request latency divided over the texts in the request", ["provider"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+EMBEDDING_FAILURES = counter("rag_embedding_failures_total", "Failed embedding provider requests", ["provider"])
+EMBEDDING_THROTTLED = counter("rag_embedding_throttled_total", "Embedding requests rejected with 429", ["provider"])
+EMBEDDING_ZERO_VECTORS = counter("rag_embedding_zero_vectors_total", "All-zero embeddings returned by the provider")
+
+# Search
+SEARCH_SECONDS = histogram("rag_search_seconds", "Latency of the search statement", ["mode"])
+QUERY_EMBEDDING_SECONDS = histogram("rag_query_embedding_seconds", "Time to embed query texts, including cache hits")
+
+# HTTP and connection pool
+REQUESTS_IN_FLIGHT = gauge("rag_http_requests_in_flight", "HTTP requests currently being handled")
+REQUEST_SECONDS = histogram("rag_http_request_seconds", "HTTP request latency", ["method", "route", "status"])
+DB_POOL_CHECKED_OUT = gauge("rag_db_pool_checked_out", "Database connections currently checked out of the pool")
+DB_POOL_SIZE = gauge("rag_db_pool_size", "Database connections held by the pool")
+DB_POOL_OVERFLOW = gauge("rag_db_pool_overflow", "Connections opened beyond the pool size")
+
+# Caches, read from their own statistics at collection time
+EMBEDDING_CACHE_HITS = counter("rag_embedding_cache_hits_total", "Chunk embeddings served from the embedding cache")
+EMBEDDING_CACHE_MISSES = counter("rag_embedding_cache_misses_total", "Chunk embeddings not found in the embedding cache")
+QUERY_CACHE_HITS = counter("rag_query_embedding_cache_hits_total", "Query embeddings served from the in-process cache")
+QUERY_CACHE_MISSES = counter("rag_query_embedding_cache_misses_total", "Query embeddings not found in the in-process cache")
+QUERY_CACHE_SIZE = gauge("rag_query_embedding_cache_size", "Query embeddings held in the in-process cache")
+RESULT_CACHE_HITS = counter("rag_search_result_cache_hits_total", "Searches answered from the result cache")
+RESULT_CACHE_MISSES = counter("rag_search_result_cache_misses_total", "Searches not found in the result cache")
+
+
+class MetricsMiddleware:
+    """ASGI middleware tracking in-flight requests and request latency by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status["code"]
+            ).observe(time.perf_counter() - start)
@@ -2,19 +2,54 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 from sqlalchemy.sql import text
+from sqlalchemy import event
 from app.core.config import settings
-from app.models import Base
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy import Float
+from app.models import Base, CONTENT_TSV_EXPRESSION
+from pgvector.asyncpg import register_vector
 from pgvector.sqlalchemy import Vector
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+def _engine_options() -> dict:
+    """Engine keyword arguments for the configured DB_ENGINE_PROFILE."""
+    connect_args = {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+    if settings.DB_ENGINE_PROFILE == "development":
+        return {"echo": True, "poolclass": NullPool, "connect_args": connect_args}
+    return {
+        "echo": settings.DB_ECHO,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "connect_args": connect_args,
+    }
+
 
-# Create async engine without connection pooling
 engine = create_async_engine(
     settings.DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://'),
-    echo=True,
-    poolclass=NullPool
+    **_engine_options()
 )
 
+
+@event.listens_for(engine.sync_engine, "connect")
+def register_vector_codec(dbapi_connection, connection_record):
+    """Register pgvector's binary codec on every new connection."""
+    if not settings.DB_BINARY_VECTORS:
+        return
+    try:
+        dbapi_connection.run_async(register_vector)
+    except ValueError:
+        # The vector extension does not exist yet; create_tables reconnects once it does
+        logger.warning("pgvector extension not found, vector codec not registered on this connection")
+
+
 # Session factory
 AsyncSessionLocal = sessionmaker(
     engine,
@@ -29,12 +64,97 @@ async def get_db():
         finally:
             await session.close()
 
+def content_tsv_rebuild(table: str) -> str:
+    """
+    Recreate ``table``'s content_tsv column (and so its GIN index) when it was generated with
+    another text search config than TEXT_SEARCH_CONFIG, e.g. by init-db/01-init.sql, which
+    always uses 'simple'. Otherwise queries would not match the index and rank inconsistently.
+    Rewrites the table, so it only runs when the config actually changed.
+    """
+    config = settings.TEXT_SEARCH_CONFIG.replace("'", "''")
+    return f"""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_attrdef d
+                JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+                WHERE d.adrelid = '{table}'::regclass AND a.attname = 'content_tsv'
+                  AND position($cfg$'{config}'::regconfig$cfg$ in pg_get_expr(d.adbin, d.adrelid)) = 0
+            ) THEN
+                RAISE NOTICE 'Rebuilding {table}.content_tsv for text search config {config}';
+                ALTER TABLE {table} DROP COLUMN content_tsv;
+                ALTER TABLE {table} ADD COLUMN content_tsv tsvector GENERATED ALWAYS AS ({CONTENT_TSV_EXPRESSION}) STORED;
+            END IF;
+        END $$
+    """
+
+def schema_upgrades() -> List[str]:
+    """Idempotent DDL that brings databases created by earlier versions up to the current models."""
+    statements = []
+    for table in ("chunks_ollama", "chunks_openai"):
+        statements += [
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+            f"GENERATED ALWAYS AS ({CONTENT_TSV_EXPRESSION}) STORED",
+            content_tsv_rebuild(table),
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_content_tsv ON {table} USING gin (content_tsv)",
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash varchar(64)",
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_document_id_content_hash ON {table} (document_id, content_hash)",
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS collection_id integer",
+            # Stays empty once chunks written before the column existed are backfilled below
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_missing_collection_id ON {table} (id) WHERE collection_id IS NULL",
+            f"UPDATE {table} SET collection_id = documents.collection_id FROM documents "
+            f"WHERE {table}.document_id = documents.id AND {table}.collection_id IS NULL "
+            f"AND documents.collection_id IS NOT NULL",
+            # Narrows filtered searches to a collection's rows without joining documents
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_collection_id_document_id ON {table} (collection_id, document_id)",
+        ]
+    statements += [
+        "CREATE INDEX IF NOT EXISTS ix_documents_filename_id ON documents (filename, id)",
+        "CREATE INDEX IF NOT EXISTS ix_documents_created_at_id ON documents (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_documents_collection_id_filename ON documents (collection_id, filename)",
+    ]
+    statements += [
+        f"ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS {column} integer"
+        for column in ("chunks_added", "chunks_kept", "chunks_removed", "pages_done", "pages_total")
+    ]
+    statements += [
+        "ALTER TABLE embedding_cache ADD COLUMN IF NOT EXISTS normalized boolean NOT NULL DEFAULT false",
+        # Normalized and raw embeddings of the same text are different entries
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint c
+                JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+                WHERE c.conname = 'embedding_cache_pkey' AND a.attname = 'normalized'
+            ) THEN
+                ALTER TABLE embedding_cache DROP CONSTRAINT embedding_cache_pkey;
+                ALTER TABLE embedding_cache ADD PRIMARY KEY (provider, model, dimension, normalized, content_hash);
+            END IF;
+        END $$
+        """,
+    ]
+    statements.append("ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS heartbeat_at timestamp NOT NULL DEFAULT now()")
+    statements += [
+        "ALTER TABLE collections ADD COLUMN IF NOT EXISTS vector_quantization varchar NOT NULL DEFAULT 'none'",
+        "ALTER TABLE collections ADD COLUMN IF NOT EXISTS rerank_oversample integer",
+        "ALTER TABLE collections ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 0",
+    ]
+    return statements
+
 async def create_tables():
     async with engine.begin() as conn:
         # Ensure pgvector extension is created
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+    # Drop connections opened before the extension existed so they pick up the vector codec
+    await engine.dispose()
+
+    async with engine.begin() as conn:
         # Register vector type with SQLAlchemy
         from sqlalchemy.dialects import postgresql
         postgresql.base.ischema_names['vector'] = Vector
         # Create tables
         await conn.run_sync(Base.metadata.create_all)
+        # Add columns and indexes introduced after the tables were first created
+        for statement in schema_upgrades():
+            await conn.execute(text(statement))
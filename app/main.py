@@ -1,8 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api import documents, collections
-from app.db.database import create_tables
+from app.api import documents, collections, admin, jobs
+from app.core import metrics
+from app.db.database import create_tables, engine
+from app.services.embeddings import close_embedding_clients, query_embedding_cache
+from app.services.embedding_cache import cache_stats
+from app.services.vector_index import ensure_vector_index
+from app.services.ingestion import get_ingestion_queue
+from app.services.collection_stats import backfill_collection_stats
+from app.services.chunk_partitions import ensure_chunk_layout
+from app.services.pdf_processor import shutdown_pdf_executor
+from app.services.uploads import UploadLimitMiddleware
+from app.services.result_cache import close_result_cache, get_result_cache
+import asyncio
 import logging
 
 # Configure logging
@@ -15,25 +26,70 @@ logger = logging.getLogger(__name__)
 app = FastAPI(title=settings.PROJECT_NAME)
 logger.debug("FastAPI app initialized")
 
+# Added first so the CORS middleware also wraps its 413 responses
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+
+def sample_pool_usage():
+    pool = engine.pool
+    # NullPool (development profile) keeps no connections, so there is nothing to report
+    if hasattr(pool, "checkedout"):
+        metrics.DB_POOL_CHECKED_OUT.set(pool.checkedout())
+        metrics.DB_POOL_SIZE.set(pool.size())
+        metrics.DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+metrics.REGISTRY.add_callback(sample_pool_usage)
+metrics.EMBEDDING_CACHE_HITS.set_function(lambda: cache_stats.hits)
+metrics.EMBEDDING_CACHE_MISSES.set_function(lambda: cache_stats.misses)
+metrics.QUERY_CACHE_HITS.set_function(lambda: query_embedding_cache.hits)
+metrics.QUERY_CACHE_MISSES.set_function(lambda: query_embedding_cache.misses)
+metrics.QUERY_CACHE_SIZE.set_function(lambda: len(query_embedding_cache))
+metrics.RESULT_CACHE_HITS.set_function(lambda: get_result_cache().hits if get_result_cache() else 0)
+metrics.RESULT_CACHE_MISSES.set_function(lambda: get_result_cache().misses if get_result_cache() else 0)
 
 @app.on_event("startup")
 async def startup_event():
     await create_tables()
+    await ensure_chunk_layout()
+    await backfill_collection_stats()
+    # Building an index over an existing corpus can take a while, so don't block startup on it
+    app.state.index_task = asyncio.create_task(ensure_vector_index())
+    if settings.INGEST_MODE == "async":
+        await get_ingestion_queue().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if settings.INGEST_MODE == "async":
+        await get_ingestion_queue().stop()
+    await close_embedding_clients()
+    await close_result_cache()
+    shutdown_pdf_executor()
 
 app.include_router(documents.router, prefix="/api", tags=["documents"])
 app.include_router(collections.router, prefix="/api", tags=["collections"])
+app.include_router(jobs.router, prefix="/api", tags=["jobs"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the RAG Service API"}
@@ -1,15 +1,50 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, func
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, ForeignKey, Text, DateTime, func, Index, Computed, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import declarative_base, relationship
 from app.core.config import settings
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import Vector as PgVector
+import numpy as np
 
 Base = declarative_base()
 
+# Full-text search vector kept in sync with chunk content by Postgres itself
+CONTENT_TSV_EXPRESSION = f"to_tsvector('{settings.TEXT_SEARCH_CONFIG}'::regconfig, content)"
+
+class Vector(PgVector):
+    """
+    pgvector column type. With DB_BINARY_VECTORS enabled, values are passed to asyncpg as
+    float32 arrays for the binary codec registered on each connection instead of being
+    rendered as text literals.
+    """
+    cache_ok = True
+    # Cast placeholders to vector, so Postgres does not infer text for them inside the VALUES
+    # list of a multi-row INSERT (ORM flushes) and asyncpg picks the vector codec
+    render_bind_cast = True
+
+    def bind_processor(self, dialect):
+        if not settings.DB_BINARY_VECTORS:
+            return super().bind_processor(dialect)
+
+        def process(value):
+            if value is None:
+                return value
+            value = np.asarray(value, dtype=np.float32)
+            if value.ndim != 1:
+                raise ValueError('expected ndim to be 1')
+            if self.dim is not None and value.shape[0] != self.dim:
+                raise ValueError('expected %d dimensions, not %d' % (self.dim, value.shape[0]))
+            return value
+        return process
+
 class Collection(Base):
     __tablename__ = 'collections'
     
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False, unique=True)
+    # Vector search over a quantized copy ("halfvec" or "binary"), re-ranked with exact distances
+    vector_quantization = Column(String, nullable=False, server_default='none')
+    rerank_oversample = Column(Integer)  # Quantized candidates per exact candidate; NULL uses RERANK_OVERSAMPLE
+    version = Column(BigInteger, nullable=False, server_default='0')  # Bumped whenever its chunks change
     created_at = Column(DateTime, server_default=func.now())
     documents = relationship("Document", back_populates="collection")
 
@@ -24,7 +59,11 @@ class Document(Base):
     chunks_ollama = relationship("ChunkOllama", back_populates="document", cascade="all, delete-orphan")
     chunks_openai = relationship("ChunkOpenAI", back_populates="document", cascade="all, delete-orphan")
 
+    # Keyset pagination of the document listing by each sort column
     __table_args__ = (
+        Index('ix_documents_filename_id', 'filename', 'id'),
+        Index('ix_documents_created_at_id', 'created_at', 'id'),
+        Index('ix_documents_collection_id_filename', 'collection_id', 'filename'),
         {'extend_existing': True},
     )
 
@@ -33,21 +72,98 @@ class ChunkOllama(Base):
     
     id = Column(Integer, primary_key=True)
     document_id = Column(Integer, ForeignKey('documents.id', ondelete='CASCADE'))
+    collection_id = Column(Integer)  # Copied from the document; the partition key of the partitioned layout
     content = Column(Text, nullable=False)
     content_vector = Column(Vector(768), nullable=False)
+    content_tsv = Column(TSVECTOR, Computed(CONTENT_TSV_EXPRESSION, persisted=True))
     chunk_index = Column(Integer, nullable=False)
     page_number = Column(Integer, nullable=False)
+    content_hash = Column(String(64))  # sha256 of content, matched on incremental re-index
     created_at = Column(DateTime, server_default=func.now())
     document = relationship("Document", back_populates="chunks_ollama")
 
+    __table_args__ = (
+        Index('ix_chunks_ollama_content_tsv', 'content_tsv', postgresql_using='gin'),
+        Index('ix_chunks_ollama_document_id_content_hash', 'document_id', 'content_hash'),
+        Index('ix_chunks_ollama_collection_id_document_id', 'collection_id', 'document_id'),
+        Index('ix_chunks_ollama_missing_collection_id', 'id', postgresql_where=text('collection_id IS NULL')),
+    )
+
 class ChunkOpenAI(Base):
     __tablename__ = 'chunks_openai'
     
     id = Column(Integer, primary_key=True)
     document_id = Column(Integer, ForeignKey('documents.id', ondelete='CASCADE'))
+    collection_id = Column(Integer)  # Copied from the document; the partition key of the partitioned layout
     content = Column(Text, nullable=False)
     content_vector = Column(Vector(1536), nullable=False)
+    content_tsv = Column(TSVECTOR, Computed(CONTENT_TSV_EXPRESSION, persisted=True))
     chunk_index = Column(Integer, nullable=False)
     page_number = Column(Integer, nullable=False)
+    content_hash = Column(String(64))  # sha256 of content, matched on incremental re-index
     created_at = Column(DateTime, server_default=func.now())
     document = relationship("Document", back_populates="chunks_openai")
+
+    __table_args__ = (
+        Index('ix_chunks_openai_content_tsv', 'content_tsv', postgresql_using='gin'),
+        Index('ix_chunks_openai_document_id_content_hash', 'document_id', 'content_hash'),
+        Index('ix_chunks_openai_collection_id_document_id', 'collection_id', 'document_id'),
+        Index('ix_chunks_openai_missing_collection_id', 'id', postgresql_where=text('collection_id IS NULL')),
+    )
+
+class CollectionStats(Base):
+    """Per-collection counters, updated in the same transaction as the writes they count."""
+    __tablename__ = 'collection_stats'
+
+    collection_id = Column(Integer, ForeignKey('collections.id', ondelete='CASCADE'), primary_key=True)
+    document_count = Column(BigInteger, nullable=False, default=0)
+    chunk_count = Column(BigInteger, nullable=False, default=0)
+    total_characters = Column(BigInteger, nullable=False, default=0)
+    last_ingest_at = Column(DateTime)
+    updated_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = 'embedding_cache'
+
+    provider = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    dimension = Column(Integer, primary_key=True)
+    normalized = Column(Boolean, primary_key=True, default=False)  # EMBEDDING_NORMALIZE when stored
+    content_hash = Column(String(64), primary_key=True)
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    last_used_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_embedding_cache_last_used_at', 'last_used_at'),
+    )
+
+class IngestionJob(Base):
+    __tablename__ = 'ingestion_jobs'
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String, nullable=False, default='queued')  # queued, running, completed, failed
+    stage = Column(String, nullable=False, default='queued')  # queued, parsing, parsed (PDFs), embedding, stored
+    filename = Column(String, nullable=False)
+    collection_name = Column(String, nullable=False)
+    source_path = Column(String, nullable=False)
+    chunk_size = Column(Integer)
+    chunk_overlap = Column(Integer)
+    chunks_total = Column(Integer)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    chunks_added = Column(Integer)
+    chunks_kept = Column(Integer)
+    chunks_removed = Column(Integer)
+    pages_done = Column(Integer)  # Only reported for PDFs
+    pages_total = Column(Integer)
+    document_id = Column(Integer)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), nullable=False)
+    heartbeat_at = Column(DateTime, server_default=func.now(), nullable=False)  # Refreshed while a worker runs the job
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_ingestion_jobs_status_created_at', 'status', 'created_at'),
+    )
@@ -0,0 +1,176 @@
+"""
+Partitioned chunk table layout (CHUNK_TABLE_LAYOUT=partitioned).
+
+Each chunk table is list-partitioned by ``collection_id`` with one partition per collection,
+named ``<table>_c<collection id>``. Partitions inherit the parent's indexes, ANN indexes
+included, so every collection gets its own small ANN graph; searches filtered by collection
+id only touch their partitions, and deleting a collection drops its partitions instead of
+deleting rows.
+"""
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy import select, text
+from app.core.config import settings
+from app.db.database import engine, schema_upgrades
+from app.models import ChunkOllama, ChunkOpenAI, Collection
+import logging
+from typing import List, Union
+
+logger = logging.getLogger(__name__)
+
+# Columns copied when an existing table is converted; content_tsv is generated again
+PARTITION_COPY_COLUMNS = (
+    "id", "document_id", "collection_id", "content", "content_vector",
+    "chunk_index", "page_number", "content_hash", "created_at",
+)
+
+Executor = Union[AsyncSession, AsyncConnection]
+
+
+def chunk_table_names() -> List[str]:
+    return [model.__tablename__ for model in (ChunkOllama, ChunkOpenAI)]
+
+
+def partition_name(table_name: str, collection_id: int) -> str:
+    return f"{table_name}_c{int(collection_id)}"
+
+
+def partition_ddl(table_name: str, collection_id: int) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table_name, collection_id)} "
+        f"PARTITION OF {table_name} FOR VALUES IN ({int(collection_id)})"
+    )
+
+
+def partitioned_table_ddl(table_name: str, new_name: str) -> List[str]:
+    """
+    Statements creating ``new_name`` as a list-partitioned copy of ``table_name``'s columns.
+    The primary key has to include the partition key.
+    """
+    return [
+        f"CREATE TABLE {new_name} (LIKE {table_name} INCLUDING DEFAULTS INCLUDING GENERATED) "
+        f"PARTITION BY LIST (collection_id)",
+        f"ALTER TABLE {new_name} ALTER COLUMN collection_id SET NOT NULL",
+        f"ALTER TABLE {new_name} ADD PRIMARY KEY (id, collection_id)",
+        f"ALTER TABLE {new_name} ADD FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE",
+    ]
+
+
+async def partitioned_tables(db: Executor) -> List[str]:
+    """The chunk tables that are currently partitioned."""
+    result = await db.execute(
+        text("""
+            SELECT c.relname FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            WHERE c.relname = ANY(:tables) AND c.relnamespace = 'public'::regnamespace
+        """),
+        {"tables": chunk_table_names()}
+    )
+    return list(result.scalars())
+
+
+async def unindexed_partitions(db: Executor, table_name: str, index_name: str) -> List[str]:
+    """Partitions of ``table_name`` with no index attached to the partitioned index ``index_name``."""
+    result = await db.execute(
+        text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_inherits ii
+                  JOIN pg_index x ON x.indexrelid = ii.inhrelid
+                  WHERE ii.inhparent = CAST(:index AS regclass) AND x.indrelid = c.oid
+              )
+            ORDER BY c.relname
+        """),
+        {"table": table_name, "index": index_name}
+    )
+    return list(result.scalars())
+
+
+async def create_collection_partitions(db: Executor, collection_id: int):
+    """Provision a new collection's partition in every partitioned chunk table, within the caller's transaction."""
+    for table_name in await partitioned_tables(db):
+        await db.execute(text(partition_ddl(table_name, collection_id)))
+
+
+async def drop_collection_partitions(db: Executor, collection_id: int) -> List[str]:
+    """
+    Drop a collection's partitions, within the caller's transaction. Returns the chunk tables
+    that are partitioned; their chunks are gone, the other tables still hold theirs.
+    """
+    tables = await partitioned_tables(db)
+    for table_name in tables:
+        await db.execute(text(f"DROP TABLE IF EXISTS {partition_name(table_name, collection_id)}"))
+    return tables
+
+
+async def partition_chunk_table(conn: AsyncConnection, table_name: str) -> int:
+    """
+    Replace a plain chunk table by a partitioned one holding the same rows, within the
+    caller's transaction. The table is locked for the whole copy. Chunks of documents
+    without a collection cannot be placed in a partition and are left out; ANN indexes are
+    not copied and have to be built again. Returns the number of chunks copied.
+    """
+    new_name = f"{table_name}_partitioned"
+    await conn.execute(text(f"LOCK TABLE {table_name} IN ACCESS EXCLUSIVE MODE"))
+    for statement in partitioned_table_ddl(table_name, new_name):
+        await conn.execute(text(statement))
+    collection_ids = (await conn.execute(select(Collection.id))).scalars().all()
+    for collection_id in collection_ids:
+        await conn.execute(text(
+            f"CREATE TABLE {partition_name(table_name, collection_id)} "
+            f"PARTITION OF {new_name} FOR VALUES IN ({int(collection_id)})"
+        ))
+    columns = ", ".join(PARTITION_COPY_COLUMNS)
+    result = await conn.execute(text(
+        f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table_name} "
+        f"WHERE collection_id = ANY(:collection_ids)"
+    ), {"collection_ids": list(collection_ids)})
+    copied = result.rowcount
+
+    # Keep the id sequence when the old table (its owner) is dropped
+    sequence = (await conn.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table_name}
+    )).scalar_one_or_none()
+    if sequence:
+        await conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {new_name}.id"))
+    await conn.execute(text(f"DROP TABLE {table_name}"))
+    await conn.execute(text(f"ALTER TABLE {new_name} RENAME TO {table_name}"))
+    # Recreate the secondary indexes under their usual names
+    for statement in schema_upgrades():
+        if f" ON {table_name} " in statement:
+            await conn.execute(text(statement))
+    return copied
+
+
+async def ensure_chunk_layout():
+    """
+    Bring the chunk tables to CHUNK_TABLE_LAYOUT on startup. Empty plain tables are converted
+    right away; converting tables that hold chunks locks them for the whole copy, so that is
+    left to ``python -m app.cli partition-chunks``. Missing partitions are created for every
+    collection.
+    """
+    if settings.CHUNK_TABLE_LAYOUT != "partitioned":
+        return
+    try:
+        async with engine.begin() as conn:
+            partitioned = await partitioned_tables(conn)
+            for table_name in chunk_table_names():
+                if table_name in partitioned:
+                    continue
+                has_rows = (await conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {table_name})"))).scalar()
+                if has_rows:
+                    logger.warning(
+                        f"{table_name} holds chunks and is not partitioned; "
+                        f"run 'python -m app.cli partition-chunks' to convert it"
+                    )
+                    continue
+                await partition_chunk_table(conn, table_name)
+                logger.info(f"Partitioned empty chunk table {table_name} by collection")
+            partitioned = await partitioned_tables(conn)
+            collection_ids = (await conn.execute(select(Collection.id))).scalars().all()
+            for table_name in partitioned:
+                for collection_id in collection_ids:
+                    await conn.execute(text(partition_ddl(table_name, collection_id)))
+    except Exception as e:
+        logger.error(f"Could not ensure the partitioned chunk layout: {e}")
@@ -0,0 +1,86 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, text
+from app.core.config import settings
+from app.core.metrics import CHUNKS_WRITTEN, DB_INSERT_SECONDS
+import itertools
+import logging
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Column order of the rows passed to write_chunks
+CHUNK_COLUMNS = ("document_id", "collection_id", "content", "content_vector", "chunk_index", "page_number", "content_hash")
+
+ChunkRow = Tuple[int, int, str, Sequence[float], int, int, str]
+
+
+async def copy_chunks(db: AsyncSession, chunk_table, rows: Iterable[ChunkRow]) -> int:
+    """
+    Stream chunk rows into the table with asyncpg's binary COPY, inside the session's transaction.
+
+    Rows are passed on as an iterator, so they are encoded as COPY consumes them rather than
+    collected first. Needs the pgvector binary codec on the connection (DB_BINARY_VECTORS).
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    count = 0
+
+    def counted() -> Iterator[ChunkRow]:
+        nonlocal count
+        for row in itertools.chain((first,), rows):
+            count += 1
+            yield row
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    if not driver_connection.is_in_transaction():
+        # SQLAlchemy opens the driver transaction lazily on the first statement
+        await db.execute(text("SELECT 1"))
+    await driver_connection.copy_records_to_table(
+        chunk_table.__tablename__,
+        records=counted(),
+        columns=CHUNK_COLUMNS
+    )
+    return count
+
+
+async def insert_chunks(db: AsyncSession, chunk_table, rows: Iterable[ChunkRow]) -> int:
+    """Insert chunk rows with a single executemany INSERT, without building ORM objects."""
+    params: List[dict] = [dict(zip(CHUNK_COLUMNS, row)) for row in rows]
+    if not params:
+        return 0
+    await db.execute(insert(chunk_table), params)
+    return len(params)
+
+
+async def add_chunks_orm(db: AsyncSession, chunk_table, rows: Iterable[ChunkRow]) -> int:
+    """The original path: one ORM object per chunk, written by the unit-of-work flush."""
+    count = 0
+    for row in rows:
+        db.add(chunk_table(**dict(zip(CHUNK_COLUMNS, row))))
+        count += 1
+    await db.flush()
+    return count
+
+
+CHUNK_WRITERS = {
+    "copy": copy_chunks,
+    "executemany": insert_chunks,
+    "orm": add_chunks_orm,
+}
+
+
+async def write_chunks(db: AsyncSession, chunk_table, rows: Iterable[ChunkRow]) -> int:
+    """Write chunk rows with the configured CHUNK_INSERT_METHOD."""
+    method = settings.CHUNK_INSERT_METHOD
+    if method == "copy" and not settings.DB_BINARY_VECTORS:
+        # COPY ... BINARY has no text fallback for the vector type
+        method = "executemany"
+    with DB_INSERT_SECONDS.labels(method).time():
+        count = await CHUNK_WRITERS[method](db, chunk_table, rows)
+    CHUNKS_WRITTEN.labels(method).inc(count)
+    logger.debug(f"Wrote {count} chunks to {chunk_table.__tablename__} using {method}")
+    return count
@@ -0,0 +1,272 @@
+"""
+Text chunking strategies.
+
+Every strategy is a generator over the input, so chunks can be embedded while the rest of
+the document is still being split, and every one runs in linear time: each step moves
+forward by at least a fixed fraction of the chunk size, whatever the input looks like.
+"""
+from app.core.config import settings
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_HEADING = re.compile(r"^#{1,6}[ \t]+\S.*$", re.MULTILINE)
+# Characters of streamed text buffered before the complete part is chunked
+STREAM_WINDOW = 1 << 20
+
+# Words longer than 16 characters count as several tokens, as subword tokenizers would split them
+_TOKEN = re.compile(r"\w{1,16}|[^\w\s]")
+
+
+def max_overlap(chunk_size: int) -> int:
+    # With at most a quarter of each chunk repeated, every step advances >= chunk_size / 4
+    return chunk_size // 4
+
+
+def _clamp_overlap(chunk_size: int, chunk_overlap: int) -> int:
+    return max(0, min(chunk_overlap, max_overlap(chunk_size)))
+
+
+class CharacterChunker:
+    """
+    Fixed-size windows of ``chunk_size`` characters, broken at the last whitespace in the
+    second half of the window when there is one, with ``chunk_overlap`` characters repeated.
+    """
+    # Preferred places to cut streamed text, best first
+    boundaries = ("\n\n", "\n", " ")
+
+    def __init__(self, chunk_size: int, chunk_overlap: int = 0):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = _clamp_overlap(chunk_size, chunk_overlap)
+
+    def split(self, text: str) -> Iterator[str]:
+        length = len(text)
+        position = 0
+        while position < length:
+            end = min(position + self.chunk_size, length)
+            if end < length:
+                # Only look back half a window, so a chunk is never shorter than chunk_size / 2
+                start = position + self.chunk_size // 2
+                space = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+                if space != -1:
+                    end = space
+            chunk = text[position:end].strip()
+            if chunk:
+                yield chunk
+            if end >= length:
+                break
+            next_position = end - self.chunk_overlap
+            if self.chunk_overlap:
+                # Start the overlap on a word boundary
+                space = text.find(" ", next_position, end)
+                if space != -1:
+                    next_position = space + 1
+            position = max(next_position, position + 1)
+
+
+class SentenceChunker:
+    """
+    Whole sentences packed into chunks of up to ``chunk_size`` characters. Trailing sentences
+    totalling at most ``chunk_overlap`` characters are repeated at the start of the next chunk.
+    Sentences longer than a chunk are split by the character strategy.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int = 0):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = _clamp_overlap(chunk_size, chunk_overlap)
+        self._fallback = CharacterChunker(chunk_size, chunk_overlap)
+
+    def split(self, text: str) -> Iterator[str]:
+        return self.pack(_iter_sentences(text))
+
+    def pack(self, units: Iterator[str]) -> Iterator[str]:
+        current: List[str] = []
+        size = 0
+        for unit in units:
+            if len(unit) > self.chunk_size:
+                if current:
+                    yield " ".join(current)
+                    current, size = [], 0
+                yield from self._fallback.split(unit)
+                continue
+            if current and size + 1 + len(unit) > self.chunk_size:
+                yield " ".join(current)
+                current, size = self._overlap(current)
+                # Drop overlap sentences until the new one fits
+                while current and size + 1 + len(unit) > self.chunk_size:
+                    size = max(0, size - len(current.pop(0)) - 1)
+            current.append(unit)
+            size += len(unit) + (1 if size else 0)
+        if current:
+            yield " ".join(current)
+
+    def _overlap(self, sentences: List[str]):
+        kept: List[str] = []
+        size = 0
+        for sentence in reversed(sentences):
+            if size + len(sentence) + 1 > self.chunk_overlap:
+                break
+            kept.insert(0, sentence)
+            size += len(sentence) + 1
+        return kept, max(0, size - 1)
+
+
+def _iter_sentences(text: str) -> Iterator[str]:
+    position = 0
+    for match in _SENTENCE_END.finditer(text):
+        sentence = " ".join(text[position:match.start()].split())
+        if sentence:
+            yield sentence
+        position = match.end()
+    sentence = " ".join(text[position:].split())
+    if sentence:
+        yield sentence
+
+
+class MarkdownChunker:
+    """
+    Splits Markdown at headings. Sections are packed sentence by sentence, and every chunk
+    starts with the heading of the section it comes from, so it keeps its context.
+    """
+    boundaries = ("\n#", "\n\n", "\n", " ")
+
+    def __init__(self, chunk_size: int, chunk_overlap: int = 0):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = _clamp_overlap(chunk_size, chunk_overlap)
+
+    def split(self, text: str) -> Iterator[str]:
+        for heading, body in _iter_sections(text):
+            if not body:
+                yield heading[:self.chunk_size]
+                continue
+            # Headings longer than half a chunk are cut, leaving at least half of it for the body
+            heading = heading[:(self.chunk_size - 1) // 2].rstrip()
+            if not heading:
+                yield from SentenceChunker(self.chunk_size, self.chunk_overlap).split(body)
+                continue
+            budget = self.chunk_size - len(heading) - 1
+            for chunk in SentenceChunker(budget, self.chunk_overlap).split(body):
+                yield f"{heading}\n{chunk}"
+
+
+def _iter_sections(text: str) -> Iterator[tuple]:
+    """(heading line, section body) pairs; text before the first heading has an empty heading."""
+    heading = ""
+    position = 0
+    for match in _HEADING.finditer(text):
+        body = text[position:match.start()].strip()
+        if body or heading:
+            yield heading, body
+        heading = match.group(0).strip()
+        position = match.end()
+    body = text[position:].strip()
+    if body or heading:
+        yield heading, body
+
+
+class TokenChunker:
+    """
+    Chunks of at most ``max_tokens`` word and punctuation tokens, an approximation of model
+    tokens that needs no tokenizer. Chunks are slices of the original text, so formatting
+    is preserved, and ``overlap_tokens`` tokens are repeated between chunks.
+    """
+
+    def __init__(self, max_tokens: int, overlap_tokens: int = 0):
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be positive")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = _clamp_overlap(max_tokens, overlap_tokens)
+
+    def split(self, text: str) -> Iterator[str]:
+        window: List[re.Match] = []
+        emitted = False
+        for token in _TOKEN.finditer(text):
+            window.append(token)
+            if len(window) == self.max_tokens:
+                yield text[window[0].start():window[-1].end()]
+                emitted = True
+                window = window[len(window) - self.overlap_tokens:] if self.overlap_tokens else []
+        # Skip a tail made only of tokens already emitted as overlap
+        if window and (len(window) > self.overlap_tokens or not emitted):
+            yield text[window[0].start():window[-1].end()]
+
+
+STRATEGIES: Dict[str, Callable] = {
+    "character": CharacterChunker,
+    "sentence": SentenceChunker,
+    "markdown": MarkdownChunker,
+    "token": TokenChunker,
+}
+
+
+def split_stream(chunker, blocks: Iterable[str], window: int = STREAM_WINDOW) -> Iterator[str]:
+    """
+    Chunk text that arrives in blocks, holding at most about ``window`` characters plus one block.
+
+    Once the buffer reaches ``window``, it is cut at the last preferred boundary of the chunker
+    in its second half (a heading for Markdown, otherwise a paragraph break, line break or space)
+    and the part before the cut is chunked on its own. Overlap is not carried across a cut.
+    """
+    boundaries = getattr(chunker, "boundaries", CharacterChunker.boundaries)
+    buffer = ""
+    for block in blocks:
+        buffer += block
+        while len(buffer) >= window:
+            cut = window
+            for boundary in boundaries:
+                index = buffer.rfind(boundary, window // 2, window)
+                if index != -1:
+                    cut = index + 1
+                    break
+            yield from chunker.split(buffer[:cut])
+            buffer = buffer[cut:]
+    if buffer:
+        yield from chunker.split(buffer)
+
+
+def strategy_for(filename: str) -> str:
+    """Resolve CHUNK_STRATEGY, where "auto" picks by file type."""
+    strategy = settings.CHUNK_STRATEGY
+    if strategy != "auto":
+        return strategy
+    return "markdown" if filename.lower().endswith((".md", ".markdown")) else "sentence"
+
+
+def get_chunker(strategy: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+    """
+    Chunker for a strategy. For "token", sizes count tokens and default to CHUNK_MAX_TOKENS
+    and CHUNK_OVERLAP_TOKENS; otherwise they count characters (CHUNK_SIZE, CHUNK_OVERLAP).
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unsupported chunking strategy: {strategy}")
+    if strategy == "token":
+        overlap = settings.CHUNK_OVERLAP_TOKENS if chunk_overlap is None else chunk_overlap
+        return TokenChunker(chunk_size or settings.CHUNK_MAX_TOKENS, overlap)
+    overlap = settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+    return STRATEGIES[strategy](chunk_size or settings.CHUNK_SIZE, overlap)
+
+
+def chunker_for(filename: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+    """Chunker for a file under CHUNK_STRATEGY."""
+    return get_chunker(strategy_for(filename), chunk_size, chunk_overlap)
+
+
+def check_chunk_options(filename: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+    """
+    Raise ValueError for a requested chunk size or overlap that the chunker for ``filename``
+    would not use as given. Chunkers cap the overlap at max_overlap(chunk_size), which is
+    only meant for the configured defaults, so a larger requested overlap is rejected here.
+    """
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError("Chunk size must be positive")
+    if chunk_overlap is None:
+        return
+    size = chunk_size or (settings.CHUNK_MAX_TOKENS if strategy_for(filename) == "token" else settings.CHUNK_SIZE)
+    if not 0 <= chunk_overlap <= max_overlap(size):
+        raise ValueError(
+            f"Chunk overlap must be between 0 and {max_overlap(size)} (a quarter of the chunk size {size})"
+        )
@@ -0,0 +1,42 @@
+"""
+Collection name -> id lookups for searches.
+
+Searches filter chunks on their own ``collection_id``, so a search only needs the ids of the
+collections it names. Known names are cached per process; the cache is cleared whenever this
+process creates or deletes a collection, and entries expire after COLLECTION_ID_CACHE_TTL so
+changes made by other workers are picked up. Unknown names are never cached: a collection
+created by another worker is found by the next search.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models import Collection
+from typing import List, Optional
+
+collection_id_cache = LRUCache(settings.COLLECTION_ID_CACHE_SIZE, settings.COLLECTION_ID_CACHE_TTL)
+
+
+async def resolve_collection_ids(db: AsyncSession, collections: Optional[List[str]]) -> Optional[List[int]]:
+    """Ids of the named collections that exist, or None to search all of them ('-' or no collections)."""
+    if not collections or '-' in collections:
+        return None
+    ids = []
+    missing = []
+    for name in dict.fromkeys(collections):
+        collection_id = collection_id_cache.get(name)
+        if collection_id is None:
+            missing.append(name)
+        else:
+            ids.append(collection_id)
+    if missing:
+        result = await db.execute(select(Collection.name, Collection.id).where(Collection.name.in_(missing)))
+        for name, collection_id in result:
+            collection_id_cache.set(name, collection_id)
+            ids.append(collection_id)
+    return ids
+
+
+def invalidate_collection_ids():
+    """Forget every cached id; called after collections are created or deleted."""
+    collection_id_cache.clear()
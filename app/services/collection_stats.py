@@ -0,0 +1,156 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, null, exists, update
+from sqlalchemy.dialects.postgresql import insert
+from app.models import Collection, CollectionStats, Document
+from app.db.database import AsyncSessionLocal
+from app.services.vector_index import active_chunk_table
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def vector_storage_bytes(dimension: int) -> int:
+    """On-disk size of one pgvector value: 4 bytes per dimension plus an 8 byte header."""
+    return 4 * dimension + 8
+
+
+async def apply_stats_delta(
+    db: AsyncSession,
+    collection_id: int,
+    documents: int = 0,
+    chunks: int = 0,
+    characters: int = 0,
+    ingested: bool = False
+):
+    """
+    Add deltas to a collection's counters within the caller's transaction.
+
+    The upsert increments the stored values in place, so concurrent writers to the same
+    collection serialize on its row instead of overwriting each other's counts.
+    """
+    values = {
+        "collection_id": collection_id,
+        "document_count": documents,
+        "chunk_count": chunks,
+        "total_characters": characters,
+        "updated_at": func.now(),
+    }
+    if ingested:
+        values["last_ingest_at"] = func.now()
+    statement = insert(CollectionStats).values(**values)
+    table = CollectionStats.__table__
+    updates = {
+        "document_count": table.c.document_count + statement.excluded.document_count,
+        "chunk_count": table.c.chunk_count + statement.excluded.chunk_count,
+        "total_characters": table.c.total_characters + statement.excluded.total_characters,
+        "updated_at": func.now(),
+    }
+    if ingested:
+        updates["last_ingest_at"] = statement.excluded.last_ingest_at
+    await db.execute(statement.on_conflict_do_update(index_elements=[table.c.collection_id], set_=updates))
+
+
+async def bump_collection_version(db: AsyncSession, collection_id: int):
+    """Mark a collection's chunks as changed, within the caller's transaction."""
+    await db.execute(
+        update(Collection).where(Collection.id == collection_id).values(version=Collection.version + 1)
+    )
+
+
+def stats_query(collection_name: Optional[str] = None):
+    """Counters of every collection (or one), zero for collections that have none yet."""
+    query = (
+        select(
+            Collection.name,
+            func.coalesce(CollectionStats.document_count, 0).label("document_count"),
+            func.coalesce(CollectionStats.chunk_count, 0).label("chunk_count"),
+            func.coalesce(CollectionStats.total_characters, 0).label("total_characters"),
+            CollectionStats.last_ingest_at
+        )
+        .outerjoin(CollectionStats, CollectionStats.collection_id == Collection.id)
+        .order_by(Collection.name)
+    )
+    if collection_name is not None:
+        query = query.where(Collection.name == collection_name)
+    return query
+
+
+def format_stats(row) -> dict:
+    dimension = active_chunk_table().content_vector.type.dim
+    return {
+        "collection": row.name,
+        "document_count": row.document_count,
+        "chunk_count": row.chunk_count,
+        "total_characters": row.total_characters,
+        "vector_bytes": row.chunk_count * vector_storage_bytes(dimension),
+        "last_ingest_at": row.last_ingest_at.isoformat() if row.last_ingest_at else None
+    }
+
+
+async def get_collection_stats(db: AsyncSession, collection_name: str) -> Optional[dict]:
+    row = (await db.execute(stats_query(collection_name))).one_or_none()
+    return format_stats(row) if row else None
+
+
+async def get_all_collection_stats(db: AsyncSession) -> dict:
+    """Per-collection counters plus their totals."""
+    collections: List[dict] = [format_stats(row) for row in await db.execute(stats_query())]
+    totals = {
+        name: sum(stats[name] for stats in collections)
+        for name in ("document_count", "chunk_count", "total_characters", "vector_bytes")
+    }
+    ingest_times = [stats["last_ingest_at"] for stats in collections if stats["last_ingest_at"]]
+    totals["last_ingest_at"] = max(ingest_times) if ingest_times else None
+    return {"collections": collections, "totals": totals}
+
+
+async def backfill_collection_stats():
+    """
+    Compute counters for collections that have none, e.g. after upgrading a database that
+    predates them. Collections that already have counters are not scanned.
+    """
+    without_stats = ~exists().where(CollectionStats.collection_id == Collection.id)
+    chunk_table = active_chunk_table()
+    chunk_totals = (
+        select(
+            Document.collection_id,
+            func.count(chunk_table.id).label("chunk_count"),
+            func.coalesce(func.sum(func.length(chunk_table.content)), 0).label("total_characters")
+        )
+        .join(chunk_table, chunk_table.document_id == Document.id)
+        .group_by(Document.collection_id)
+        .subquery()
+    )
+    document_totals = (
+        select(Document.collection_id, func.count().label("document_count"))
+        .group_by(Document.collection_id)
+        .subquery()
+    )
+    missing = (
+        select(
+            Collection.id,
+            func.coalesce(document_totals.c.document_count, 0),
+            func.coalesce(chunk_totals.c.chunk_count, 0),
+            func.coalesce(chunk_totals.c.total_characters, 0),
+            null()
+        )
+        .outerjoin(document_totals, document_totals.c.collection_id == Collection.id)
+        .outerjoin(chunk_totals, chunk_totals.c.collection_id == Collection.id)
+        .where(without_stats)
+    )
+    async with AsyncSessionLocal() as db:
+        # Skip the aggregation entirely in the common case where every collection has counters
+        if (await db.execute(select(Collection.id).where(without_stats).limit(1))).scalar() is None:
+            return
+        result = await db.execute(
+            insert(CollectionStats)
+            .from_select(
+                ["collection_id", "document_count", "chunk_count", "total_characters", "last_ingest_at"],
+                missing
+            )
+            .on_conflict_do_nothing()
+        )
+        await db.commit()
+        if result.rowcount:
+            logger.info(f"Computed statistics for {result.rowcount} collections")
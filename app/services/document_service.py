@@ -1,139 +1,358 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, func
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import select, delete, update, func, tuple_
 from app.models import Document, ChunkOllama, ChunkOpenAI, Collection
 from sqlalchemy import cast
 from sqlalchemy.dialects.postgresql import ARRAY, FLOAT
 from app.core.config import settings, EmbeddingProvider
-from app.services.embeddings import get_embeddings
-from app.services.pdf_processor import process_pdf
+from app.core.metrics import CHUNKING_SECONDS
+from app.services.embedding_cache import content_hash, get_embeddings_cached
+from app.services.pdf_processor import iter_pdf_chunks
+from app.services.chunking import chunker_for, split_stream
+from app.services.uploads import UploadSource, is_pdf, iter_text_blocks
+from app.services.chunk_writer import write_chunks
+from app.services.vector_index import active_chunk_table
+from app.services.collection_stats import apply_stats_delta, bump_collection_version
+from datetime import datetime
+import base64
+from contextlib import aclosing
+import json
 import logging
-from typing import List, Tuple
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Called as progress(stage, chunks_done, chunks_total, pages_done=None, pages_total=None) while a
+# document is ingested. Chunks are produced as the document is read, so chunks_total is None until
+# the document is stored; PDFs report pages_total once their pages are counted ("parsed" stage)
+# and pages_done, the page of the last chunk embedded, with every batch.
+ProgressCallback = Callable[..., Awaitable[None]]
+
+# Document columns the listing can be sorted (and keyset-paginated) by
+DOCUMENT_SORT_COLUMNS = {
+    "id": Document.id,
+    "filename": Document.filename,
+    "created_at": Document.created_at,
+}
+
+# Stale chunk ids deleted per statement
+_DELETE_BATCH = 5000
+
+
+class UploadResult(NamedTuple):
+    """Outcome of an upload. On re-upload, chunks with unchanged text are kept instead of re-embedded."""
+    document_id: int
+    chunks: int
+    added: int = 0
+    kept: int = 0
+    removed: int = 0
+
+
+async def _batched(chunks: AsyncIterator[Tuple[str, int]], size: int) -> AsyncIterator[List[Tuple[str, int]]]:
+    batch = []
+    async for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 class DocumentService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def upload_document(
         self, 
-        file_content: bytes, 
+        file_content: UploadSource,
         filename: str, 
         collection_id: str,
         chunk_size: int = None,
-        chunk_overlap: int = None
-    ) -> Tuple[int, int]:
+        chunk_overlap: int = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> UploadResult:
         logger.info(f"Processing document: {filename} for collection: {collection_id}")
-        # Use default values from settings if not provided
-        chunk_size = chunk_size or settings.CHUNK_SIZE
-        chunk_overlap = chunk_overlap or settings.CHUNK_OVERLAP
-        
-        try:
-            # Process file based on type
-            if isinstance(file_content, bytes):
-                if file_content.startswith(b'%PDF'):
-                    chunks_with_pages = process_pdf(file_content)
-                    if not chunks_with_pages:
-                        logger.error("Could not extract text from PDF")
-                        raise ValueError("Could not extract text from PDF")
-                else:
-                    # Process text or markdown file
-                    text_content = file_content.decode('utf-8', errors='replace')
-                    # Split into chunks with specified size and overlap
-                    chunks = []
-                    current_pos = 0
-                    while current_pos < len(text_content):
-                        chunk_end = min(current_pos + chunk_size, len(text_content))
-                        # If we're not at the end, find the last space to break at
-                        if chunk_end < len(text_content):
-                            last_space = text_content.rfind(' ', current_pos, chunk_end)
-                            if last_space != -1:
-                                chunk_end = last_space
-                        chunks.append(text_content[current_pos:chunk_end].strip())
-                        # Move position considering overlap
-                        current_pos = max(current_pos + 1, chunk_end - chunk_overlap)
-                    chunks_with_pages = [(chunk, 1) for chunk in chunks if chunk]  # All chunks are "page 1" for text files
-        except UnicodeDecodeError as e:
-            logger.error(f"Error decoding text file: {e}")
-            raise ValueError("Invalid text file encoding. Please ensure the file is UTF-8 encoded.")
-
-        # Check if collection exists
-        result = await self.db.execute(
-            select(Collection).where(Collection.name == collection_id)
-        )
-        collection = result.scalar_one_or_none()
-        if not collection:
-            logger.error(f"Collection not found: {collection_id}")
-            raise ValueError(f"Collection not found: {collection_id}")
+        # Sizes left unset fall back to the strategy's defaults from settings
+        chunker = chunker_for(filename, chunk_size, chunk_overlap)
 
-        # Check for existing document
-        result = await self.db.execute(
-            select(Document).where(
-                Document.filename == filename,
-                Document.collection_id == collection.id
+        # Chunks are produced lazily: PDF pages are extracted in a process pool while
+        # earlier chunks are already being embedded and stored. A spooled upload (a path) is
+        # read from disk as needed instead of being held in memory.
+        pdf = is_pdf(file_content)
+        pages_total: Optional[int] = None
+        if pdf:
+            async def parsed(page_count: int):
+                nonlocal pages_total
+                pages_total = page_count
+                await self._report(progress, "parsed", 0, None, 0, page_count)
+
+            chunk_source = iter_pdf_chunks(file_content, chunker, on_page_count=parsed)
+        else:
+            chunk_source = self._iter_text_chunks(file_content, chunker)
+
+        # Closed on every exit, so a failed upload does not leave the PDF's temporary file and
+        # in-flight extraction futures behind until the generator is garbage collected
+        async with aclosing(chunk_source):
+            # Check if collection exists
+            result = await self.db.execute(
+                select(Collection).where(Collection.name == collection_id)
             )
-        )
-        existing_doc = result.scalar_one_or_none()
-        
-        if existing_doc:
-            logger.info(f"Existing document found. ID: {existing_doc.id}")
-            # Delete existing chunks
-            if settings.EMBEDDING_PROVIDER == EmbeddingProvider.OLLAMA:
-                await self.db.execute(
-                    delete(ChunkOllama).where(ChunkOllama.document_id == existing_doc.id)
-                )
-            elif settings.EMBEDDING_PROVIDER == EmbeddingProvider.OPENAI:
-                await self.db.execute(
-                    delete(ChunkOpenAI).where(ChunkOpenAI.document_id == existing_doc.id)
+            collection = result.scalar_one_or_none()
+            if not collection:
+                logger.error(f"Collection not found: {collection_id}")
+                raise ValueError(f"Collection not found: {collection_id}")
+
+            # Check for existing document
+            result = await self.db.execute(
+                select(Document).where(
+                    Document.filename == filename,
+                    Document.collection_id == collection.id
                 )
-            document = existing_doc
-        else:
-            # Create new document
-            document = Document(filename=filename, collection_id=collection.id)
-            self.db.add(document)
-            await self.db.flush()
+            )
+            existing_doc = result.scalar_one_or_none()
         
-        # Process chunks and create embeddings
-        chunk_texts = [chunk_text for chunk_text, _ in chunks_with_pages]
-        embeddings = await get_embeddings(chunk_texts)
-
-        # Store chunks with embeddings
-        for idx, ((chunk_text, page_num), embedding) in enumerate(zip(chunks_with_pages, embeddings)):
-            logger.debug(f"Embedding for chunk {idx}: {embedding[:5]}...")  # Log first 5 elements of each embedding
-            
             chunk_class = ChunkOllama if settings.EMBEDDING_PROVIDER == EmbeddingProvider.OLLAMA else ChunkOpenAI
-            chunk = chunk_class(
-                document_id=document.id,
-                content=chunk_text,
-                content_vector=embedding,
-                chunk_index=idx,
-                page_number=page_num
+            # Stored chunks by content hash; each new chunk that matches one keeps that row
+            stored: Dict[str, List[Tuple[int, int, int, int]]] = {}
+            removed = removed_characters = 0
+            if existing_doc:
+                logger.info(f"Existing document found. ID: {existing_doc.id}")
+                if settings.REINDEX_MODE == "incremental":
+                    stored = await self._stored_chunks(chunk_class, existing_doc.id, collection.id)
+                else:
+                    # Delete existing chunks
+                    result = await self.db.execute(
+                        delete(chunk_class)
+                        .where(chunk_class.document_id == existing_doc.id, chunk_class.collection_id == collection.id)
+                        .returning(func.length(chunk_class.content))
+                    )
+                    lengths = result.scalars().all()
+                    removed, removed_characters = len(lengths), sum(lengths)
+                document = existing_doc
+            else:
+                # Create new document
+                document = Document(filename=filename, collection_id=collection.id)
+                self.db.add(document)
+                await self.db.flush()
+        
+            # Embed and store chunks batch by batch, so progress can be reported as it happens
+            total = added = kept = added_characters = repositioned = 0
+            async for batch in _batched(chunk_source, settings.INGEST_EMBED_BATCH_SIZE):
+                new_chunks = []
+                moved = []
+                for offset, (chunk_text, page_num) in enumerate(batch):
+                    chunk_index = total + offset
+                    digest = content_hash(chunk_text)
+                    matches = stored.get(digest)
+                    if not matches:
+                        new_chunks.append((chunk_text, page_num, chunk_index, digest))
+                        continue
+                    chunk_id, old_index, old_page, _ = matches.pop()
+                    if not matches:
+                        del stored[digest]
+                    kept += 1
+                    if (old_index, old_page) != (chunk_index, page_num):
+                        moved.append({"id": chunk_id, "chunk_index": chunk_index, "page_number": page_num})
+
+                if new_chunks:
+                    embeddings = await get_embeddings_cached(self.db, [chunk_text for chunk_text, _, _, _ in new_chunks])
+                    await write_chunks(
+                        self.db,
+                        chunk_class,
+                        (
+                            (document.id, collection.id, chunk_text, embedding, chunk_index, page_num, digest)
+                            for (chunk_text, page_num, chunk_index, digest), embedding in zip(new_chunks, embeddings)
+                        )
+                    )
+                if moved:
+                    # Kept chunks whose position changed: one executemany UPDATE by primary key
+                    await self.db.execute(update(chunk_class), moved)
+                    repositioned += len(moved)
+                added += len(new_chunks)
+                added_characters += sum(len(chunk_text) for chunk_text, _, _, _ in new_chunks)
+                total += len(batch)
+                pages_done = batch[-1][1] if pages_total is not None else None
+                await self._report(progress, "embedding", total, None, pages_done, pages_total)
+
+            if total == 0:
+                await self.db.rollback()
+                logger.error(f"Could not extract text from {filename}")
+                raise ValueError("Could not extract text from PDF" if pdf else "No text content found")
+
+            # Stored chunks that no new chunk matched are gone from the document
+            stale = [(chunk_id, length) for rows in stored.values() for chunk_id, _, _, length in rows]
+            for start in range(0, len(stale), _DELETE_BATCH):
+                stale_ids = [chunk_id for chunk_id, _ in stale[start:start + _DELETE_BATCH]]
+                await self.db.execute(
+                    delete(chunk_class).where(chunk_class.id.in_(stale_ids), chunk_class.collection_id == collection.id)
+                )
+            removed += len(stale)
+            removed_characters += sum(length for _, length in stale)
+
+            # Collection counters change in the same transaction as the chunks
+            await apply_stats_delta(
+                self.db,
+                collection.id,
+                documents=0 if existing_doc else 1,
+                chunks=added - removed,
+                characters=added_characters - removed_characters,
+                ingested=True
             )
-            self.db.add(chunk)
+            if added or removed or repositioned:
+                # Snapshots and cached search results of the collection are now out of date
+                await bump_collection_version(self.db, collection.id)
         
-        logger.debug(f"Processed {len(chunks_with_pages)} chunks with embeddings")
+            logger.debug(f"Processed {total} chunks: {added} added, {kept} kept, {removed} removed")
         
-        await self.db.commit()
+            await self.db.commit()
+            await self._report(progress, "stored", total, total, pages_total, pages_total)
         
-        return document.id, len(chunks_with_pages)
+            return UploadResult(document.id, total, added, kept, removed)
+
+    async def _stored_chunks(
+        self, chunk_class, document_id: int, collection_id: int
+    ) -> Dict[str, List[Tuple[int, int, int, int]]]:
+        """
+        Map content hash -> [(id, chunk_index, page_number, length)] for a document's stored chunks.
+        Lists are in descending chunk order, so pop() hands out the earliest duplicate first.
+        Rows written before content hashes were stored are hashed in the database.
+        """
+        digest = func.coalesce(
+            chunk_class.content_hash,
+            func.encode(func.sha256(func.convert_to(chunk_class.content, 'UTF8')), 'hex')
+        )
+        result = await self.db.execute(
+            select(
+                chunk_class.id,
+                chunk_class.chunk_index,
+                chunk_class.page_number,
+                func.length(chunk_class.content).label("length"),
+                digest.label("digest")
+            )
+            .where(chunk_class.document_id == document_id, chunk_class.collection_id == collection_id)
+            .order_by(chunk_class.chunk_index.desc())
+        )
+        stored: Dict[str, List[Tuple[int, int, int, int]]] = {}
+        for row in result:
+            stored.setdefault(row.digest, []).append((row.id, row.chunk_index, row.page_number, row.length))
+        return stored
+
+    @staticmethod
+    async def _iter_text_chunks(file_content: UploadSource, chunker) -> AsyncIterator[Tuple[str, int]]:
+        """Split a text or markdown file into chunks with the given chunker, decoding it block by block."""
+        # Time spent reading and splitting, excluding the time the consumer holds each chunk
+        started = time.perf_counter()
+        elapsed = 0.0
+        for chunk in split_stream(chunker, iter_text_blocks(file_content)):
+            elapsed += time.perf_counter() - started
+            yield chunk, 1  # All chunks are "page 1" for text files
+            started = time.perf_counter()
+        CHUNKING_SECONDS.labels("text").observe(elapsed + time.perf_counter() - started)
 
-    async def get_documents(self) -> List[dict]:
+    @staticmethod
+    async def _report(
+        progress: Optional[ProgressCallback],
+        stage: str,
+        done: int,
+        total: Optional[int],
+        pages_done: Optional[int] = None,
+        pages_total: Optional[int] = None
+    ):
+        if progress is None:
+            return
+        if pages_total is None:
+            await progress(stage, done, total)
+        else:
+            await progress(stage, done, total, pages_done, pages_total)
+
+    async def get_documents(
+        self,
+        collection: Optional[str] = None,
+        sort: str = "id",
+        order: str = "asc",
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of documents with their chunk counts, and the cursor of the next page (None on the last).
+
+        Pages are read by keyset on (sort column, id), and chunks are counted with a GROUP BY over
+        just the page's documents, so the cost depends on the page size rather than the corpus size.
+        """
         try:
-            query = select(Document).options(
-                joinedload(Document.collection),
-                selectinload(Document.chunks_ollama),
-                selectinload(Document.chunks_openai)
+            if sort not in DOCUMENT_SORT_COLUMNS:
+                raise ValueError(f"Unsupported sort: {sort}")
+            if order not in ("asc", "desc"):
+                raise ValueError(f"Unsupported order: {order}")
+            limit = limit or settings.DOCUMENTS_PAGE_SIZE
+            sort_column = DOCUMENT_SORT_COLUMNS[sort]
+
+            query = (
+                select(Document.id, Document.filename, Document.collection_id, Document.created_at, Collection.name)
+                .outerjoin(Collection, Document.collection_id == Collection.id)
             )
-            result = await self.db.execute(query)
-            documents = result.scalars().all()
-            return [{
-                "id": doc.id,
-                "filename": doc.filename,
-                "collection_id": doc.collection_id,
-                "collection_name": doc.collection.name if doc.collection else "Default",
-                "chunk_count": max(len(doc.chunks_ollama or []), len(doc.chunks_openai or []), 1)
-            } for doc in documents]
+            if collection:
+                query = query.where(Collection.name == collection)
+            if cursor:
+                after = tuple_(sort_column, Document.id)
+                key = tuple_(*_decode_cursor(cursor, sort, order))
+                query = query.where(after > key if order == "asc" else after < key)
+            if order == "asc":
+                query = query.order_by(sort_column, Document.id)
+            else:
+                query = query.order_by(sort_column.desc(), Document.id.desc())
+            # One extra row tells whether there is a next page
+            rows = (await self.db.execute(query.limit(limit + 1))).all()
+            rows, more = rows[:limit], len(rows) > limit
+
+            chunk_table = active_chunk_table()
+            counts = {}
+            if rows:
+                result = await self.db.execute(
+                    select(chunk_table.document_id, func.count())
+                    .where(chunk_table.document_id.in_([row.id for row in rows]))
+                    .group_by(chunk_table.document_id)
+                )
+                counts = dict(result.all())
+
+            documents = [{
+                "id": row.id,
+                "filename": row.filename,
+                "collection_id": row.collection_id,
+                "collection_name": row.name or "Default",
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "chunk_count": counts.get(row.id, 0)
+            } for row in rows]
+            next_cursor = _encode_cursor(sort, order, getattr(rows[-1], sort), rows[-1].id) if more else None
+            return documents, next_cursor
         except Exception as e:
             logger.error(f"Error fetching documents: {e}")
             raise
+
+
+def _encode_cursor(sort: str, order: str, value, document_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, order, value, document_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, order: str) -> tuple:
+    """Return the (sort value, id) a cursor points after. Raises ValueError if it is invalid for this listing."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, document_id = json.loads(payload)
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError("Cursor does not match the requested sort order")
+    # A well-formed cursor can still carry values of the wrong type, which the database would reject
+    expected = int if sort == "id" else str
+    if type(document_id) is not int or type(value) is not expected:
+        raise ValueError("Invalid cursor")
+    if sort == "created_at":
+        try:
+            value = datetime.fromisoformat(value)
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+    return value, document_id
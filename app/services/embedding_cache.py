@@ -0,0 +1,216 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from app.db.database import AsyncSessionLocal
+from app.models import EmbeddingCacheEntry
+from app.core.config import settings
+from app.services.embeddings import get_embeddings
+from dataclasses import dataclass, asdict
+from datetime import timedelta
+import asyncio
+import hashlib
+import numpy as np
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a chunk's text, used as the content address for cached embeddings."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class EmbeddingCacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+# Rows or keys per statement, well below asyncpg's 32767 bind parameter limit
+_STATEMENT_BATCH = 5000
+
+# Hits only refresh last_used_at once it is older than this, so repeated hits cost no writes;
+# eviction works in days, so the recency order stays accurate enough
+TOUCH_INTERVAL = timedelta(hours=1)
+
+# Process-wide counters, shared by every EmbeddingCache instance
+cache_stats = EmbeddingCacheStats()
+_writes_since_eviction = 0
+_eviction_task: Optional[asyncio.Task] = None
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache stored in the embedding_cache table, keyed by provider, model,
+    dimension, whether embeddings are L2-normalized (EMBEDDING_NORMALIZE) and content hash.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.provider = settings.EMBEDDING_PROVIDER.value
+        self.model = settings.EMBEDDING_MODEL
+        self.dimension = settings.EMBEDDING_DIMENSION
+        self.normalized = settings.EMBEDDING_NORMALIZE
+
+    def _key_filter(self):
+        return (
+            EmbeddingCacheEntry.provider == self.provider,
+            EmbeddingCacheEntry.model == self.model,
+            EmbeddingCacheEntry.dimension == self.dimension,
+            EmbeddingCacheEntry.normalized == self.normalized,
+        )
+
+    async def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached embeddings for the given content hashes and mark them as used."""
+        found = {}
+        stale = []
+        for start in range(0, len(hashes), _STATEMENT_BATCH):
+            batch = hashes[start:start + _STATEMENT_BATCH]
+            result = await self.db.execute(
+                select(
+                    EmbeddingCacheEntry.content_hash,
+                    EmbeddingCacheEntry.embedding,
+                    (EmbeddingCacheEntry.last_used_at < func.now() - TOUCH_INTERVAL).label("stale")
+                )
+                .where(*self._key_filter(), EmbeddingCacheEntry.content_hash.in_(batch))
+            )
+            for row in result:
+                found[row.content_hash] = np.asarray(row.embedding, dtype=np.float32)
+                if row.stale:
+                    stale.append(row.content_hash)
+        if stale:
+            await self._touch(sorted(stale))
+        cache_stats.hits += len(found)
+        cache_stats.misses += len(hashes) - len(found)
+        return found
+
+    async def _touch(self, hashes: List[str]):
+        """
+        Mark entries as used now. Like put_many, this commits in a session of its own, over keys in
+        content hash order, so the row locks are not held until the upload's transaction ends.
+        """
+        async with AsyncSessionLocal() as db:
+            for start in range(0, len(hashes), _STATEMENT_BATCH):
+                batch = hashes[start:start + _STATEMENT_BATCH]
+                await db.execute(
+                    update(EmbeddingCacheEntry)
+                    .where(*self._key_filter(), EmbeddingCacheEntry.content_hash.in_(batch))
+                    .values(last_used_at=func.now())
+                )
+            await db.commit()
+
+    async def put_many(self, embeddings: Dict[str, np.ndarray]):
+        """
+        Store embeddings by content hash; existing entries are left untouched.
+
+        Entries are written and committed in a session of their own rather than in the upload's
+        long transaction, so workers embedding the same chunks don't wait on each other's row
+        locks until their uploads finish. Rows are inserted in content hash order, so concurrent
+        writers lock shared keys in the same order and cannot deadlock.
+        """
+        global _writes_since_eviction
+        rows = [
+            {
+                "provider": self.provider,
+                "model": self.model,
+                "dimension": self.dimension,
+                "normalized": self.normalized,
+                "content_hash": digest,
+                "embedding": embedding,
+            }
+            for digest, embedding in sorted(embeddings.items())
+        ]
+        async with AsyncSessionLocal() as db:
+            # Multi-row VALUES uses one bind parameter per column, so keep statements under the driver's limit
+            for start in range(0, len(rows), _STATEMENT_BATCH // 6):
+                await db.execute(
+                    insert(EmbeddingCacheEntry)
+                    .values(rows[start:start + _STATEMENT_BATCH // 6])
+                    .on_conflict_do_nothing()
+                )
+            await db.commit()
+        cache_stats.writes += len(embeddings)
+        _writes_since_eviction += len(embeddings)
+        if _writes_since_eviction >= settings.EMBEDDING_CACHE_EVICT_INTERVAL:
+            _writes_since_eviction = 0
+            schedule_eviction()
+
+    async def evict(self) -> int:
+        """Drop entries older than the configured age, then the least recently used beyond the size cap."""
+        expired = await self.db.execute(
+            delete(EmbeddingCacheEntry).where(
+                EmbeddingCacheEntry.last_used_at < func.now() - timedelta(days=settings.EMBEDDING_CACHE_MAX_AGE_DAYS)
+            )
+        )
+        # Entries past the cap, most recently used first, found by walking the last_used_at index
+        # backwards. Entries written together share a timestamp, so rows are picked by ctid
+        # rather than by a cutoff time, which would also drop the tied entries within the cap.
+        past_cap = (
+            select(literal_column("ctid"))
+            .select_from(EmbeddingCacheEntry)
+            .order_by(EmbeddingCacheEntry.last_used_at.desc())
+            .offset(settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        )
+        evicted = expired.rowcount or 0
+        if (await self.db.execute(past_cap.limit(1))).scalar_one_or_none() is not None:
+            overflow = await self.db.execute(
+                delete(EmbeddingCacheEntry).where(literal_column("ctid").in_(past_cap))
+            )
+            evicted += overflow.rowcount or 0
+        cache_stats.evictions += evicted
+        logger.info(f"Evicted {evicted} embedding cache entries")
+        return evicted
+
+
+async def evict_in_background():
+    """Evict in a session of its own, so deletes and their locks stay out of the upload's transaction."""
+    try:
+        async with AsyncSessionLocal() as db:
+            await EmbeddingCache(db).evict()
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Embedding cache eviction failed: {e}")
+
+
+def schedule_eviction():
+    """Start an eviction pass in the background unless one is still running."""
+    global _eviction_task
+    if _eviction_task is None or _eviction_task.done():
+        _eviction_task = asyncio.create_task(evict_in_background())
+
+
+async def get_embeddings_cached(db: AsyncSession, texts: List[str]) -> np.ndarray:
+    """
+    Get embeddings for texts, only calling the provider for texts not already in the cache.
+    Returns a float32 matrix with one row per text, like get_embeddings.
+    """
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return await get_embeddings(texts)
+
+    cache = EmbeddingCache(db)
+    hashes = [content_hash(text) for text in texts]
+    unique_hashes = list(dict.fromkeys(hashes))
+    cached = await cache.get_many(unique_hashes)
+
+    # Embed each missing text once, even if it occurs several times in the input
+    missing = {digest: text for digest, text in zip(hashes, texts) if digest not in cached}
+    if missing:
+        new_embeddings = dict(zip(missing, await get_embeddings(list(missing.values()))))
+        await cache.put_many(new_embeddings)
+        cached.update(new_embeddings)
+
+    logger.debug(f"Embedding cache: {len(unique_hashes) - len(missing)} hits, {len(missing)} misses")
+    if not hashes:
+        return np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+    return np.stack([cached[digest] for digest in hashes])
@@ -1,13 +1,30 @@
+import asyncio
+import base64
+import email.utils
 import httpx
+import math
 from app.core.config import settings, EmbeddingProvider
+from app.core.cache import LRUCache
+from app.core.metrics import (
+    EMBEDDING_BATCH_SECONDS, EMBEDDING_FAILURES, EMBEDDING_TEXT_SECONDS, EMBEDDING_THROTTLED, EMBEDDING_ZERO_VECTORS
+)
 import logging
-from typing import List, Union
+import time
+from typing import Callable, List, Optional, Tuple
 import numpy as np
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+from app.services.vector_ops import to_matrix, zero_rows, l2_normalize
 
 logger = logging.getLogger(__name__)
 
-async def get_embeddings(texts: List[str]) -> List[List[float]]:
-    """Get embeddings for a list of texts using the configured embedding provider."""
+# Query embeddings keyed by (provider, model, dimension, normalized query text)
+query_embedding_cache = LRUCache(settings.QUERY_EMBEDDING_CACHE_SIZE, settings.QUERY_EMBEDDING_CACHE_TTL)
+
+async def get_embeddings(texts: List[str]) -> np.ndarray:
+    """
+    Get embeddings for a list of texts using the configured embedding provider.
+    Returns a (len(texts), EMBEDDING_DIMENSION) float32 matrix.
+    """
     try:
         logger.debug(f"Getting embeddings for {len(texts)} texts")
         if settings.EMBEDDING_PROVIDER == EmbeddingProvider.OLLAMA:
@@ -16,131 +33,494 @@ async def get_embeddings(texts: List[str]) -> List[List[float]]:
             embeddings = await get_openai_embeddings(texts)
         else:
             raise ValueError(f"Unsupported embedding provider: {settings.EMBEDDING_PROVIDER}")
-        
-        logger.debug(f"Embeddings generated. Type: {type(embeddings)}, Length: {len(embeddings)}")
-        for i, embedding in enumerate(embeddings):
-            logger.debug(f"Embedding {i}: Type: {type(embedding)}, Length: {len(embedding) if isinstance(embedding, (list, tuple)) else 'N/A'}")
-        
-        # Ensure all embeddings are lists of floats
-        validated_embeddings = []
-        for embedding in embeddings:
-            if isinstance(embedding, (list, tuple)):
-                validated_embedding = [float(x) for x in embedding]
-            elif isinstance(embedding, str):
-                try:
-                    validated_embedding = [float(x) for x in eval(embedding)]
-                except:
-                    logger.warning(f"Failed to parse embedding string: {embedding[:100]}...")
-                    validated_embedding = []
-            else:
-                logger.warning(f"Unexpected embedding type: {type(embedding)}")
-                validated_embedding = []
-            
-            validated_embeddings.append(validated_embedding)
-        
-        logger.debug(f"Validated embeddings: {validated_embeddings[:2]}")  # Log first two embeddings
-        return validated_embeddings
-        
-        # Ensure all embeddings are lists of floats
-        validated_embeddings = []
-        for embedding in embeddings:
-            if isinstance(embedding, (list, tuple)):
-                validated_embedding = [float(x) for x in embedding]
-            elif isinstance(embedding, str):
-                try:
-                    validated_embedding = [float(x) for x in eval(embedding)]
-                except:
-                    logger.warning(f"Failed to parse embedding string: {embedding[:100]}...")
-                    validated_embedding = []
-            else:
-                logger.warning(f"Unexpected embedding type: {type(embedding)}")
-                validated_embedding = []
-            
-            validated_embeddings.append(validated_embedding)
-        
-        return validated_embeddings
+
+        if len(embeddings) != len(texts):
+            raise EmbeddingError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+
+        # Validate, fit and normalize the whole batch at once
+        try:
+            matrix = to_matrix(embeddings, settings.EMBEDDING_DIMENSION)
+        except ValueError as e:
+            raise EmbeddingError(f"Invalid embeddings from provider: {e}") from e
+        zero_count = zero_rows(matrix)
+        if zero_count:
+            EMBEDDING_ZERO_VECTORS.inc(zero_count)
+            logger.warning(f"Provider returned {zero_count} all-zero embeddings")
+        if settings.EMBEDDING_NORMALIZE:
+            l2_normalize(matrix)
+
+        logger.debug(f"Embeddings generated: shape {matrix.shape}")
+        return matrix
     except Exception as e:
         logger.error(f"Error getting embeddings: {e}")
         raise
 
-async def get_ollama_embeddings(texts: List[str]) -> List[List[float]]:
-    """Get embeddings from Ollama API and adjust dimensions."""
-    async with httpx.AsyncClient() as client:
-        embeddings = []
-        for text in texts:
+def _query_cache_key(query_text: str) -> tuple:
+    return (settings.EMBEDDING_PROVIDER.value, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSION, query_text)
+
+async def get_query_embedding(query_text: str) -> np.ndarray:
+    """Get the embedding for a single normalized query, served from the in-process cache when possible."""
+    return (await get_query_embeddings([query_text]))[0]
+
+async def get_query_embeddings(query_texts: List[str]) -> np.ndarray:
+    """
+    Get embeddings for several normalized queries. Queries missing from the in-process cache
+    are embedded together in one provider batch; duplicates are embedded once.
+    """
+    embeddings = {}
+    for query_text in query_texts:
+        embedding = query_embedding_cache.get(_query_cache_key(query_text))
+        if embedding is not None:
+            embeddings[query_text] = embedding
+    missing = list(dict.fromkeys(q for q in query_texts if q not in embeddings))
+    if missing:
+        fresh = await get_embeddings(missing)
+        if len(fresh) != len(missing):
+            raise EmbeddingError("Failed to generate query embedding")
+        for query_text, embedding in zip(missing, fresh):
+            query_embedding_cache.set(_query_cache_key(query_text), embedding)
+            embeddings[query_text] = embedding
+    if not query_texts:
+        return np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+    return np.stack([embeddings[query_text] for query_text in query_texts])
+
+class EmbeddingError(Exception):
+    """Raised when the embedding provider cannot embed a text after all retries."""
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed request may succeed if sent again: transport errors, timeouts, throttling and 5xx."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in (408, 429)
+    return isinstance(error, httpx.TransportError)
+
+
+def _blames_input(error: Exception) -> bool:
+    """Whether a failed batch can be blamed on one of its texts, so splitting it can isolate the culprit."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in (400, 413, 422)
+    return isinstance(error, EmbeddingError)
+
+
+class OllamaEmbeddingClient:
+    """
+    Long-lived Ollama client that embeds texts in batches over a shared connection pool.
+
+    Texts are split into sub-batches of ``batch_size`` and posted to ``/api/embed`` with at
+    most ``max_concurrency`` requests in flight. Transport errors, 5xx and throttled requests
+    are retried up to ``max_retries`` times with backoff and then raised as an
+    ``EmbeddingError``, so an unavailable server fails the call quickly. A batch rejected for
+    its content (a 400/413/422, or a wrong count or malformed vector) is split in half and
+    retried until the failure is isolated to a single text.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        max_connections: int = 8,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(1, max_retries)
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._legacy_api = False
+        self._batch_seconds = EMBEDDING_BATCH_SECONDS.labels("ollama")
+        self._text_seconds = EMBEDDING_TEXT_SECONDS.labels("ollama")
+        self._failures = EMBEDDING_FAILURES.labels("ollama")
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            transport=transport
+        )
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed all texts, preserving input order."""
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(self._embed_with_split(batch) for batch in batches))
+        return [embedding for batch in results for embedding in batch]
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _embed_with_split(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) == 1:
+            return [await self._embed_single(texts[0])]
+        try:
+            return await self._post_with_retries(texts)
+        except (httpx.HTTPError, EmbeddingError) as e:
+            if not _blames_input(e):
+                raise EmbeddingError(f"Failed to embed batch of {len(texts)} texts: {e}") from e
+            logger.warning(f"Embedding batch of {len(texts)} texts failed ({e}), splitting and retrying")
+        middle = len(texts) // 2
+        left, right = await asyncio.gather(
+            self._embed_with_split(texts[:middle]),
+            self._embed_with_split(texts[middle:])
+        )
+        return left + right
+
+    async def _embed_single(self, text: str) -> List[float]:
+        try:
+            return (await self._post_with_retries([text]))[0]
+        except (httpx.HTTPError, EmbeddingError) as e:
+            raise EmbeddingError(f"Failed to embed text: {text[:50]}... Error: {e}") from e
+
+    async def _post_with_retries(self, texts: List[str]) -> List[List[float]]:
+        """Post a batch, retrying transport errors, 5xx and throttling with exponential backoff."""
+        for attempt in range(1, self.max_retries + 1):
             try:
-                response = await client.post(
-                    f"{settings.OLLAMA_BASE_URL}/api/embeddings",
-                    json={"model": settings.EMBEDDING_MODEL, "prompt": text},
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                embedding = response.json().get("embedding")
-                
-                if not isinstance(embedding, list):
-                    logger.warning(f"Unexpected embedding type: {type(embedding)}. Expected list.")
-                    embedding = [embedding] if isinstance(embedding, (int, float)) else []
-                
-                adjusted_embedding = adjust_embedding_dimension(embedding, settings.EMBEDDING_DIMENSION)
-                validated_embedding = [float(x) for x in adjusted_embedding]
-                
-                if len(validated_embedding) != settings.EMBEDDING_DIMENSION:
-                    logger.warning(f"Embedding dimension mismatch. Expected {settings.EMBEDDING_DIMENSION}, got {len(validated_embedding)}")
-                    validated_embedding = validated_embedding[:settings.EMBEDDING_DIMENSION] + [0.0] * max(0, settings.EMBEDDING_DIMENSION - len(validated_embedding))
-                
-                embeddings.append(validated_embedding)
-                logger.debug(f"Processed embedding: length={len(validated_embedding)}")
-            except Exception as e:
-                logger.error(f"Error processing embedding for text: {text[:50]}... Error: {str(e)}")
-                embeddings.append([0.0] * settings.EMBEDDING_DIMENSION)  # Fallback to zero vector
-        
-        logger.debug(f"Generated {len(embeddings)} embeddings")
+                async with self._semaphore:
+                    return await self._post_batch(texts)
+            except (httpx.HTTPError, EmbeddingError) as e:
+                if attempt == self.max_retries or not _is_transient(e):
+                    raise
+                logger.warning(f"Embedding attempt {attempt}/{self.max_retries} for {len(texts)} texts failed: {e}")
+                await asyncio.sleep(0.1 * 2 ** (attempt - 1))
+
+    async def _post_batch(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        try:
+            embeddings = await self._request_batch(texts)
+        except (httpx.HTTPError, EmbeddingError):
+            self._failures.inc()
+            raise
+        elapsed = time.perf_counter() - start
+        self._batch_seconds.observe(elapsed)
+        self._text_seconds.observe(elapsed / len(texts), len(texts))
         return embeddings
 
-def adjust_embedding_dimension(embedding: List[float], target_dim: int) -> List[float]:
-    """Adjust the embedding dimension to match the target dimension."""
-    current_dim = len(embedding)
-    if current_dim == target_dim:
-        return embedding
-    elif current_dim < target_dim:
-        return embedding + [0.0] * (target_dim - current_dim)
-    else:
-        return embedding[:target_dim]
-
-def adjust_embedding_dimension(embedding: Union[List[float], float], target_dim: int) -> List[float]:
-    """Adjust the embedding dimension to match the target dimension."""
-    if not isinstance(embedding, list):
-        embedding = [float(embedding)]  # Ensure it's a list, even if a single float
-    current_dim = len(embedding)
-    if current_dim == target_dim:
-        return embedding
-    elif current_dim < target_dim:
-        return embedding + [0.0] * (target_dim - current_dim)
-    else:
-        # If we need to reduce dimensions, we'll use PCA
-        embedding_array = np.array(embedding).reshape(1, -1)
-        pca = np.linalg.svd(embedding_array, full_matrices=False)
-        reduced_embedding = pca[0] @ np.diag(pca[1])[:, :target_dim]
-        return reduced_embedding.flatten().tolist()
-
-def adjust_embedding_dimension(embedding: Union[List[float], float], target_dim: int) -> List[float]:
-    """Adjust the embedding dimension to match the target dimension."""
-    if not isinstance(embedding, list):
-        embedding = [float(embedding)]
-    current_dim = len(embedding)
-    if current_dim == target_dim:
+    async def _request_batch(self, texts: List[str]) -> List[List[float]]:
+        if self._legacy_api:
+            return [await self._post_legacy(text) for text in texts]
+
+        response = await self._client.post(
+            "/api/embed",
+            json={"model": self.model, "input": texts}
+        )
+        if response.status_code == 404 and "model" not in response.text.lower():
+            # Ollama < 0.3 has no batch endpoint; fall back to one request per text
+            logger.info("Ollama /api/embed not available, falling back to /api/embeddings")
+            self._legacy_api = True
+            return [await self._post_legacy(text) for text in texts]
+        response.raise_for_status()
+
+        embeddings = response.json().get("embeddings")
+        if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+            raise EmbeddingError(
+                f"Expected {len(texts)} embeddings, got {len(embeddings) if isinstance(embeddings, list) else type(embeddings)}"
+            )
+        return embeddings
+
+    async def _post_legacy(self, text: str) -> List[float]:
+        response = await self._client.post(
+            "/api/embeddings",
+            json={"model": self.model, "prompt": text}
+        )
+        response.raise_for_status()
+        embedding = response.json().get("embedding")
+        if not isinstance(embedding, list):
+            raise EmbeddingError(f"Unexpected embedding type: {type(embedding)}")
         return embedding
-    elif current_dim < target_dim:
-        return embedding + [0.0] * (target_dim - current_dim)
-    else:
-        # If we need to reduce dimensions, we'll use PCA
-        embedding_array = np.array(embedding).reshape(1, -1)
-        pca = np.linalg.svd(embedding_array, full_matrices=False)
-        reduced_embedding = pca[0] @ np.diag(pca[1])[:, :target_dim]
-        return reduced_embedding.flatten().tolist()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limit on requests in flight that adapts to rate limiting (additive increase,
+    multiplicative decrease). A throttled request halves the limit, at most once per
+    ``decrease_interval`` seconds, and a Retry-After holds every request back until it has
+    passed; ``limit`` successful requests in a row raise the limit by one, up to
+    ``max_concurrency``.
+    """
+
+    def __init__(self, max_concurrency: int, decrease_interval: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.decrease_interval = decrease_interval
+        self._clock = clock
+        self._successes = 0
+        self._paused_until = 0.0
+        self._last_decrease: Optional[float] = None
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            while True:
+                delay = self._paused_until - self._clock()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return self
+                else:
+                    await self._condition.wait()
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def succeeded(self):
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_concurrency:
+            self.limit += 1
+            self._successes = 0
+
+    def throttled(self, retry_after: Optional[float] = None):
+        now = self._clock()
+        self._successes = 0
+        if self._last_decrease is None or now - self._last_decrease >= self.decrease_interval:
+            self.limit = max(1, self.limit // 2)
+            self._last_decrease = now
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Delay requested by a 429/503 response: OpenAI's retry-after-ms, or Retry-After in seconds or as a date."""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(text: str, chars_per_token: float) -> int:
+    return max(1, math.ceil(len(text) / chars_per_token))
+
+
+def pack_batches(texts: List[str], max_inputs: int, max_tokens: int, chars_per_token: float) -> List[Tuple[int, int]]:
+    """
+    Split texts into consecutive (start, end) ranges of at most ``max_inputs`` texts and
+    about ``max_tokens`` estimated tokens each. A text over the token budget gets a range of its own.
+    """
+    ranges = []
+    start = tokens = 0
+    for i, text in enumerate(texts):
+        text_tokens = estimate_tokens(text, chars_per_token)
+        if i > start and (i - start >= max_inputs or tokens + text_tokens > max_tokens):
+            ranges.append((start, i))
+            start, tokens = i, 0
+        tokens += text_tokens
+    if start < len(texts):
+        ranges.append((start, len(texts)))
+    return ranges
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+class OpenAIEmbeddingClient:
+    """
+    Client for the OpenAI embeddings API and servers compatible with it.
+
+    Texts are packed into requests by count (``batch_size``) and estimated tokens
+    (``batch_tokens``), and the requests run concurrently under an adaptive limit: 429
+    responses shrink it and honour Retry-After, successes grow it back to
+    ``max_concurrency``. Throttled, 5xx and failed requests are retried with exponential
+    backoff up to ``max_retries`` attempts before an ``EmbeddingError`` is raised.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        batch_size: int = 512,
+        batch_tokens: int = 100_000,
+        chars_per_token: float = 4.0,
+        max_concurrency: int = 8,
+        max_connections: int = 16,
+        timeout: float = 60.0,
+        max_retries: int = 8,
+        retry_wait: float = 0.5,
+        dimensions: Optional[int] = None,
+        encoding_format: str = "float",
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.batch_tokens = max(1, batch_tokens)
+        self.chars_per_token = chars_per_token
+        self.max_retries = max(1, max_retries)
+        self.retry_wait = retry_wait
+        self.dimensions = dimensions
+        self.encoding_format = encoding_format
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+        self._batch_seconds = EMBEDDING_BATCH_SECONDS.labels("openai")
+        self._text_seconds = EMBEDDING_TEXT_SECONDS.labels("openai")
+        self._failures = EMBEDDING_FAILURES.labels("openai")
+        self._throttled = EMBEDDING_THROTTLED.labels("openai")
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else None,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            transport=transport
+        )
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed all texts, preserving input order."""
+        if not texts:
+            return []
+        ranges = pack_batches(texts, self.batch_size, self.batch_tokens, self.chars_per_token)
+        results = await asyncio.gather(*(self._embed_batch(texts[start:end]) for start, end in ranges))
+        return [embedding for batch in results for embedding in batch]
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_retries),
+                wait=wait_exponential_jitter(initial=self.retry_wait, max=30.0, jitter=self.retry_wait),
+                retry=retry_if_exception(_is_retryable),
+                reraise=True
+            ):
+                with attempt:
+                    async with self.limiter:
+                        return await self._post_batch(texts)
+        except (httpx.HTTPError, EmbeddingError) as e:
+            raise EmbeddingError(f"Failed to embed a batch of {len(texts)} texts: {e}") from e
+
+    async def _post_batch(self, texts: List[str]) -> List[List[float]]:
+        payload = {"model": self.model, "input": texts, "encoding_format": self.encoding_format}
+        if self.dimensions:
+            payload["dimensions"] = self.dimensions
+        start = time.perf_counter()
+        try:
+            response = await self._client.post("/embeddings", json=payload)
+            if response.status_code == 429:
+                self._throttled.inc()
+                self.limiter.throttled(retry_after_seconds(response))
+            response.raise_for_status()
+            embeddings = self._parse(response.json(), len(texts))
+        except ValueError as e:
+            self._failures.inc()
+            raise EmbeddingError(f"Invalid response from embedding server: {e}") from e
+        except (httpx.HTTPError, EmbeddingError):
+            self._failures.inc()
+            raise
+        self.limiter.succeeded()
+        elapsed = time.perf_counter() - start
+        self._batch_seconds.observe(elapsed)
+        self._text_seconds.observe(elapsed / len(texts), len(texts))
+        return embeddings
+
+    def _parse(self, body: dict, count: int) -> List[List[float]]:
+        data = body.get("data") if isinstance(body, dict) else None
+        if not isinstance(data, list) or len(data) != count:
+            raise EmbeddingError(
+                f"Expected {count} embeddings, got {len(data) if isinstance(data, list) else type(data)}"
+            )
+        if not all(isinstance(item, dict) and isinstance(item.get("index", 0), int) for item in data):
+            raise EmbeddingError("Expected a list of embedding objects with integer indexes")
+        embeddings = []
+        for item in sorted(data, key=lambda item: item.get("index", 0)):
+            embedding = item.get("embedding")
+            if isinstance(embedding, str):
+                # encoding_format=base64: little-endian float32, a quarter of the JSON size
+                embedding = np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+            elif not isinstance(embedding, list):
+                raise EmbeddingError(f"Unexpected embedding type: {type(embedding)}")
+            embeddings.append(embedding)
+        return embeddings
+
+
+_ollama_client: Optional[OllamaEmbeddingClient] = None
+_openai_client: Optional[OpenAIEmbeddingClient] = None
+
+
+def get_ollama_client() -> OllamaEmbeddingClient:
+    """Return the process-wide Ollama client, creating it on first use."""
+    global _ollama_client
+    if _ollama_client is None:
+        _ollama_client = OllamaEmbeddingClient(
+            base_url=settings.OLLAMA_BASE_URL,
+            model=settings.EMBEDDING_MODEL,
+            batch_size=settings.OLLAMA_BATCH_SIZE,
+            max_concurrency=settings.OLLAMA_MAX_CONCURRENCY,
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            timeout=settings.OLLAMA_TIMEOUT,
+            max_retries=settings.OLLAMA_MAX_RETRIES
+        )
+    return _ollama_client
+
+
+def get_openai_client() -> OpenAIEmbeddingClient:
+    """Return the process-wide OpenAI-compatible client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAIEmbeddingClient(
+            base_url=settings.OPENAI_BASE_URL,
+            model=settings.EMBEDDING_MODEL,
+            api_key=settings.OPENAI_API_KEY,
+            batch_size=settings.OPENAI_BATCH_SIZE,
+            batch_tokens=settings.OPENAI_BATCH_TOKENS,
+            chars_per_token=settings.OPENAI_CHARS_PER_TOKEN,
+            max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            timeout=settings.OPENAI_TIMEOUT,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            dimensions=settings.OPENAI_DIMENSIONS,
+            encoding_format=settings.OPENAI_ENCODING_FORMAT
+        )
+    return _openai_client
+
+
+async def close_embedding_clients():
+    """Close the shared embedding clients. Called on application shutdown."""
+    global _ollama_client, _openai_client
+    if _ollama_client is not None:
+        await _ollama_client.aclose()
+        _ollama_client = None
+    if _openai_client is not None:
+        await _openai_client.aclose()
+        _openai_client = None
+
+
+async def get_ollama_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get raw embeddings from the Ollama API; get_embeddings fits them to the configured dimension."""
+    embeddings = await get_ollama_client().embed(texts)
+    logger.debug(f"Generated {len(embeddings)} embeddings")
+    return embeddings
 
 async def get_openai_embeddings(texts: List[str]) -> List[List[float]]:
-    """Get embeddings from OpenAI API."""
-    # Implement OpenAI embedding logic here
-    # For now, we'll raise a NotImplementedError
-    raise NotImplementedError("OpenAI embeddings not yet implemented")
+    """Get raw embeddings from the OpenAI API or a compatible server; get_embeddings fits them to the configured dimension."""
+    embeddings = await get_openai_client().embed(texts)
+    logger.debug(f"Generated {len(embeddings)} embeddings")
+    return embeddings
@@ -0,0 +1,89 @@
+from sqlalchemy import select
+from app.models import Document
+from app.db.database import AsyncSessionLocal
+from app.core.config import settings
+from app.services.vector_index import active_chunk_table
+import json
+import logging
+from typing import AsyncIterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def document_chunks_query(document_id: int):
+    """Chunk columns of one document in chunk order, without loading ORM objects."""
+    chunk_table = active_chunk_table()
+    return (
+        select(chunk_table.chunk_index, chunk_table.page_number, chunk_table.content, chunk_table.content_vector)
+        .where(chunk_table.document_id == document_id)
+        .order_by(chunk_table.chunk_index)
+    )
+
+
+def collection_chunks_query(collection_id: int):
+    """Every chunk of a collection, ordered by document and chunk."""
+    chunk_table = active_chunk_table()
+    return (
+        select(
+            Document.id.label("document_id"),
+            Document.filename,
+            chunk_table.chunk_index,
+            chunk_table.page_number,
+            chunk_table.content,
+            chunk_table.content_vector
+        )
+        .join(Document, chunk_table.document_id == Document.id)
+        .where(chunk_table.collection_id == collection_id)
+        .order_by(Document.id, chunk_table.chunk_index)
+    )
+
+
+def chunk_summary(row) -> dict:
+    """The chunk listing format: start and end of the text and the first embedding values."""
+    return {
+        "chunk_number": row.chunk_index,
+        "chunk_start": row.content[:50],
+        "chunk_end": row.content[-50:],
+        "embedding_preview": [float(x) for x in row.content_vector[:5]] if row.content_vector is not None else []
+    }
+
+
+def chunk_export(row, include_vectors: bool = True) -> dict:
+    """A full chunk record for collection exports."""
+    record = {
+        "document_id": row.document_id,
+        "filename": row.filename,
+        "chunk_number": row.chunk_index,
+        "page_number": row.page_number,
+        "content": row.content
+    }
+    if include_vectors:
+        record["embedding"] = row.content_vector.tolist() if row.content_vector is not None else None
+    return record
+
+
+async def stream_ndjson(
+    statement,
+    format_row: Callable[..., dict],
+    session_factory=AsyncSessionLocal,
+    yield_per: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Run a query through a server-side cursor and yield its rows as NDJSON, one fetched batch
+    at a time, so memory stays bounded by ``yield_per`` rows whatever the result size.
+
+    Uses its own session: a streaming response is still being sent after the request's
+    ``get_db`` session has been closed.
+    """
+    statement = statement.execution_options(yield_per=yield_per or settings.STREAM_YIELD_PER)
+    async with session_factory() as db:
+        try:
+            result = await db.stream(statement)
+            async for rows in result.partitions():
+                yield "".join(json.dumps(format_row(row)) + "\n" for row in rows).encode()
+        except Exception as e:
+            # Headers are already sent, so the client sees a truncated stream
+            logger.error(f"Error streaming NDJSON rows: {e}")
+            raise
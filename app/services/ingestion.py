@@ -0,0 +1,416 @@
+from sqlalchemy import select, update, func
+from app.models import IngestionJob
+from app.db.database import AsyncSessionLocal
+from app.services.document_service import DocumentService, UploadResult
+from app.services.uploads import discard_upload
+from app.core.config import settings
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Progress callback passed to job handlers: progress(stage, chunks_done, chunks_total,
+# pages_done=None, pages_total=None). chunks_total is None until the number of chunks is known;
+# the page counts are only reported for paged documents (PDFs).
+JobProgress = Callable[..., Awaitable[None]]
+
+
+@dataclass
+class Job:
+    """Snapshot of an ingestion job as seen by workers and the status API."""
+    id: str
+    filename: str
+    collection_name: str
+    source_path: str
+    chunk_size: Optional[int] = None
+    chunk_overlap: Optional[int] = None
+    status: str = "queued"
+    stage: str = "queued"
+    chunks_total: Optional[int] = None
+    chunks_embedded: int = 0
+    chunks_added: Optional[int] = None
+    chunks_kept: Optional[int] = None
+    chunks_removed: Optional[int] = None
+    pages_done: Optional[int] = None
+    pages_total: Optional[int] = None
+    document_id: Optional[int] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# Handler doing the actual work for a job, returning an UploadResult or (document_id, chunks_created)
+JobHandler = Callable[[Job, JobProgress], Awaitable[tuple]]
+
+
+# Error recorded on jobs whose worker kept dying until they ran out of attempts
+STALE_JOB_ERROR = "Worker stopped responding while processing the job"
+
+
+class NonRetryableJobError(Exception):
+    """Raised by handlers for failures that retrying cannot fix, such as invalid input."""
+
+
+class InMemoryJobStore:
+    """Job store kept in process memory. Used in tests and single-process setups without persistence."""
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._lock = asyncio.Lock()
+
+    async def create(self, job: Job) -> Job:
+        job.created_at = job.updated_at = job.heartbeat_at = datetime.utcnow()
+        self.jobs[job.id] = job
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def claim(self) -> Optional[Job]:
+        async with self._lock:
+            for job in sorted(self.jobs.values(), key=lambda j: j.created_at):
+                if job.status == "queued":
+                    job.status = "running"
+                    job.attempts += 1
+                    job.updated_at = job.heartbeat_at = datetime.utcnow()
+                    return job
+        return None
+
+    async def update(self, job_id: str, **fields):
+        job = self.jobs[job_id]
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.updated_at = job.heartbeat_at = datetime.utcnow()
+
+    async def heartbeat(self, job_id: str):
+        self.jobs[job_id].heartbeat_at = datetime.utcnow()
+
+    async def requeue_stale(self, stale_after: timedelta, max_attempts: Optional[int] = None) -> int:
+        cutoff = datetime.utcnow() - stale_after
+        stale = [job for job in self.jobs.values() if job.status == "running" and job.heartbeat_at < cutoff]
+        requeued = 0
+        for job in stale:
+            if max_attempts is not None and job.attempts >= max_attempts:
+                job.status, job.error, job.finished_at = "failed", STALE_JOB_ERROR, datetime.utcnow()
+                discard_upload(job.source_path)
+            else:
+                job.status = job.stage = "queued"
+                requeued += 1
+        return requeued
+
+
+class SqlJobStore:
+    """Job store backed by the ingestion_jobs table, safe to share between app processes."""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    @staticmethod
+    def _to_job(row: IngestionJob) -> Job:
+        return Job(**{name: getattr(row, name) for name in Job.__dataclass_fields__})
+
+    async def create(self, job: Job) -> Job:
+        async with self.session_factory() as db:
+            row = IngestionJob(
+                id=job.id,
+                filename=job.filename,
+                collection_name=job.collection_name,
+                source_path=job.source_path,
+                chunk_size=job.chunk_size,
+                chunk_overlap=job.chunk_overlap,
+                status="queued",
+                stage="queued",
+                chunks_embedded=0,
+                attempts=0
+            )
+            db.add(row)
+            await db.commit()
+            await db.refresh(row)
+            return self._to_job(row)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        async with self.session_factory() as db:
+            row = await db.get(IngestionJob, job_id)
+            return self._to_job(row) if row else None
+
+    async def claim(self) -> Optional[Job]:
+        # SKIP LOCKED lets workers in several processes claim different jobs without blocking
+        next_job = (
+            select(IngestionJob.id)
+            .where(IngestionJob.status == "queued")
+            .order_by(IngestionJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == next_job)
+                .values(
+                    status="running",
+                    attempts=IngestionJob.attempts + 1,
+                    updated_at=func.now(),
+                    heartbeat_at=func.now()
+                )
+                .returning(IngestionJob)
+            )
+            row = result.scalar_one_or_none()
+            await db.commit()
+            return self._to_job(row) if row else None
+
+    async def update(self, job_id: str, **fields):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id)
+                .values(**fields, updated_at=func.now(), heartbeat_at=func.now())
+            )
+            await db.commit()
+
+    async def heartbeat(self, job_id: str):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(IngestionJob).where(IngestionJob.id == job_id).values(heartbeat_at=func.now())
+            )
+            await db.commit()
+
+    async def requeue_stale(self, stale_after: timedelta, max_attempts: Optional[int] = None) -> int:
+        """
+        Put running jobs whose worker stopped sending heartbeats back in the queue, e.g. after a crash
+        or restart. Jobs that already used ``max_attempts`` are marked failed instead, so a file that
+        kills its worker every time is not retried forever.
+        """
+        stale = [IngestionJob.status == "running", IngestionJob.heartbeat_at < func.now() - stale_after]
+        async with self.session_factory() as db:
+            abandoned = []
+            if max_attempts is not None:
+                result = await db.execute(
+                    update(IngestionJob)
+                    .where(*stale, IngestionJob.attempts >= max_attempts)
+                    .values(status="failed", error=STALE_JOB_ERROR, updated_at=func.now(), finished_at=func.now())
+                    .returning(IngestionJob.source_path)
+                )
+                abandoned = result.scalars().all()
+            result = await db.execute(
+                update(IngestionJob)
+                .where(*stale)
+                .values(status="queued", stage="queued", updated_at=func.now(), heartbeat_at=func.now())
+            )
+            await db.commit()
+        for source_path in abandoned:
+            discard_upload(source_path)
+        return result.rowcount or 0
+
+
+class IngestionQueue:
+    """
+    Pool of in-process workers that take jobs from a job store and run them through a handler.
+
+    Workers in every app process share the same store. While a job runs, its worker refreshes
+    the job's heartbeat every ``heartbeat_interval`` seconds (a third of ``stale_after`` by
+    default), however long parsing or embedding takes; jobs left running by a process that died
+    are requeued once their heartbeat is ``stale_after`` seconds old.
+    """
+
+    def __init__(
+        self,
+        store,
+        handler: JobHandler,
+        workers: int = 2,
+        poll_interval: float = 2.0,
+        stale_after: float = 300.0,
+        max_attempts: int = 3,
+        heartbeat_interval: Optional[float] = None
+    ):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.stale_after = timedelta(seconds=stale_after)
+        self.max_attempts = max_attempts
+        self.heartbeat_interval = heartbeat_interval or stale_after / 3
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        requeued = await self.store.requeue_stale(self.stale_after, self.max_attempts)
+        if requeued:
+            logger.info(f"Requeued {requeued} unfinished ingestion jobs")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        filename: str,
+        collection_name: str,
+        source_path: str,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        job_id: Optional[str] = None
+    ) -> Job:
+        job = await self.store.create(Job(
+            id=job_id or new_job_id(),
+            filename=filename,
+            collection_name=collection_name,
+            source_path=source_path,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        ))
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.store.get(job_id)
+
+    async def run_once(self) -> bool:
+        """Claim and process a single job. Returns False if the queue was empty."""
+        job = await self.store.claim()
+        if job is None:
+            return False
+        await self._process(job)
+        return True
+
+    async def _worker(self, number: int):
+        while True:
+            self._wakeup.clear()
+            try:
+                if await self.run_once():
+                    continue
+                await self.store.requeue_stale(self.stale_after, self.max_attempts)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker {number} error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, job: Job):
+        logger.info(f"Ingestion job {job.id} started: {job.filename} (attempt {job.attempts})")
+
+        async def progress(
+            stage: str, done: int, total: Optional[int], pages_done: Optional[int] = None, pages_total: Optional[int] = None
+        ):
+            fields = dict(stage=stage, chunks_embedded=done, chunks_total=total)
+            if pages_total is not None:
+                fields.update(pages_done=pages_done, pages_total=pages_total)
+            await self.store.update(job.id, **fields)
+
+        attempt = job.attempts
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            await self.store.update(job.id, stage="parsing")
+            result = UploadResult(*await self.handler(job, progress))
+        except asyncio.CancelledError:
+            # Shutdown: leave the job to be requeued once it is stale
+            raise
+        except Exception as e:
+            if not await self._still_owned(job.id, attempt):
+                return
+            retry = not isinstance(e, NonRetryableJobError) and job.attempts < self.max_attempts
+            logger.error(f"Ingestion job {job.id} failed (attempt {job.attempts}): {e}")
+            if retry:
+                await self.store.update(job.id, status="queued", stage="queued", error=str(e))
+            else:
+                await self.store.update(job.id, status="failed", error=str(e), finished_at=datetime.utcnow())
+                discard_upload(job.source_path)
+            return
+        finally:
+            heartbeat.cancel()
+
+        if not await self._still_owned(job.id, attempt):
+            return
+        await self.store.update(
+            job.id,
+            status="completed",
+            stage="stored",
+            document_id=result.document_id,
+            chunks_embedded=result.chunks,
+            chunks_total=result.chunks,
+            chunks_added=result.added,
+            chunks_kept=result.kept,
+            chunks_removed=result.removed,
+            error=None,
+            finished_at=datetime.utcnow()
+        )
+        discard_upload(job.source_path)
+        logger.info(f"Ingestion job {job.id} completed: document {result.document_id}, {result.chunks} chunks")
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.store.heartbeat(job_id)
+            except Exception as e:
+                logger.warning(f"Could not refresh the heartbeat of ingestion job {job_id}: {e}")
+
+    async def _still_owned(self, job_id: str, attempt: int) -> bool:
+        """
+        Whether this run still owns the job. A run that lost its heartbeat for too long may have
+        been requeued and picked up again; it must then leave the job and its upload alone.
+        """
+        current = await self.store.get(job_id)
+        if current is None or current.status != "running" or current.attempts != attempt:
+            logger.warning(f"Ingestion job {job_id} was taken over by another run; dropping attempt {attempt}")
+            return False
+        return True
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def spool_path(job_id: str) -> str:
+    return os.path.join(settings.INGEST_SPOOL_DIR, job_id)
+
+
+async def ingest_document(job: Job, progress: JobProgress) -> UploadResult:
+    """Default job handler: run the spooled upload through DocumentService, reading it from disk."""
+    async with AsyncSessionLocal() as db:
+        try:
+            return await DocumentService(db).upload_document(
+                job.source_path,
+                job.filename,
+                job.collection_name,
+                job.chunk_size,
+                job.chunk_overlap,
+                progress=progress
+            )
+        except ValueError as e:
+            raise NonRetryableJobError(str(e)) from e
+
+
+ingestion_queue: Optional[IngestionQueue] = None
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """FastAPI dependency returning the process-wide queue, created on first use."""
+    global ingestion_queue
+    if ingestion_queue is None:
+        ingestion_queue = IngestionQueue(
+            SqlJobStore(AsyncSessionLocal),
+            ingest_document,
+            workers=settings.INGEST_WORKERS,
+            poll_interval=settings.INGEST_POLL_INTERVAL,
+            stale_after=settings.INGEST_JOB_STALE_AFTER,
+            max_attempts=settings.INGEST_MAX_ATTEMPTS
+        )
+    return ingestion_queue
@@ -0,0 +1,219 @@
+"""
+In-process exact vector search for small, frequently queried collections.
+
+A collection that has been queried MEMORY_INDEX_HOT_QUERIES times and holds at most
+MEMORY_INDEX_MAX_CHUNKS chunks is snapshotted into a float32 ``.npy`` matrix under
+MEMORY_INDEX_DIR. Snapshots are memory-mapped, so every uvicorn worker on the host shares
+the same pages, and they are named after the collection's version: any upload or delete
+bumps the version, and the next query rebuilds instead of reading stale vectors. Everything
+else (large, cold or unknown collections) is searched in Postgres as before.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from app.models import Collection, CollectionStats
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.services.vector_index import active_chunk_table
+from collections import OrderedDict
+import asyncio
+import glob
+import logging
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """Chunk ids and their vectors for one version of a collection."""
+
+    def __init__(self, version: int, ids: np.ndarray, matrix: np.ndarray):
+        self.version = version
+        self.ids = ids
+        self.matrix = matrix
+        # One pass over the mapped matrix; squared norms serve both l2 and cosine distances
+        self.norms_sq = np.einsum("ij,ij->i", matrix, matrix)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def distances(self, query: np.ndarray, distance: Optional[str] = None) -> np.ndarray:
+        """Distances matching the pgvector operators: l2 (<->), cosine (<=>), negative inner product (<#>)."""
+        distance = distance or settings.VECTOR_DISTANCE
+        query = np.asarray(query, dtype=np.float32)
+        scores = self.matrix @ query
+        if distance == "inner_product":
+            return -scores
+        if distance == "cosine":
+            denominator = np.sqrt(self.norms_sq) * np.linalg.norm(query)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(denominator > 0, 1.0 - scores / denominator, 1.0)
+        return np.sqrt(np.maximum(self.norms_sq - 2.0 * scores + float(query @ query), 0.0))
+
+    def search(self, query: np.ndarray, k: int, distance: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, distances) of the ``k`` nearest chunks, nearest first."""
+        return top_k(self.ids, self.distances(query, distance), k)
+
+
+def top_k(ids: np.ndarray, distances: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if k < len(distances):
+        nearest = np.argpartition(distances, k - 1)[:k]
+    else:
+        nearest = np.arange(len(distances))
+    nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+    return ids[nearest], distances[nearest]
+
+
+def _search_snapshots(snapshots: List[Snapshot], query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    results = [snapshot.search(query, k) for snapshot in snapshots]
+    return top_k(
+        np.concatenate([ids for ids, _ in results]), np.concatenate([distances for _, distances in results]), k
+    )
+
+
+def snapshot_prefix(collection_id: int, version: int) -> str:
+    return os.path.join(settings.MEMORY_INDEX_DIR, f"{active_chunk_table().__tablename__}_{collection_id}_v{version}")
+
+
+def write_snapshot(prefix: str, ids: np.ndarray, matrix: np.ndarray):
+    """
+    Write ids and vectors next to each other. Each file is renamed into place once complete,
+    and the matrix goes last, so a reader that finds the matrix also finds the ids.
+    """
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    for suffix, array in ((".ids.npy", ids.astype(np.int64)), (".npy", matrix.astype(np.float32))):
+        temp_path = f"{prefix}{suffix}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(temp_path, prefix + suffix)
+
+
+def load_snapshot(prefix: str, version: int) -> Optional[Snapshot]:
+    """Memory-map a snapshot written by any worker, or None if it does not exist yet."""
+    if not os.path.exists(prefix + ".npy"):
+        return None
+    return Snapshot(version, np.load(prefix + ".ids.npy"), np.load(prefix + ".npy", mmap_mode="r"))
+
+
+def remove_snapshots(collection_id: int, keep_version: Optional[int] = None):
+    """Delete a collection's snapshot files except ``keep_version``. Workers still mapping them keep their pages."""
+    pattern = os.path.join(settings.MEMORY_INDEX_DIR, f"{active_chunk_table().__tablename__}_{collection_id}_v*")
+    keep = None if keep_version is None else snapshot_prefix(collection_id, keep_version)
+    for path in glob.glob(pattern):
+        if keep is None or not path.startswith(keep + "."):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class MemoryIndex:
+    """Per-process registry of loaded snapshots and of how often each collection is queried."""
+
+    def __init__(self):
+        self._snapshots: "OrderedDict[int, Snapshot]" = OrderedDict()
+        self._query_counts: Dict[int, int] = {}
+        self._building: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def clear(self):
+        self._snapshots.clear()
+        self._query_counts.clear()
+
+    async def search(
+        self,
+        db: AsyncSession,
+        collection_ids: Optional[List[int]],
+        query_embedding: np.ndarray,
+        k: int
+    ) -> Optional[Tuple[List[int], List[float]]]:
+        """
+        (chunk ids, distances) of the ``k`` nearest chunks across the collections, or None
+        when any of them has to be searched in Postgres (all collections when None).
+        """
+        if not collection_ids:
+            return None
+        rows = (await db.execute(
+            select(Collection.id, Collection.version, func.coalesce(CollectionStats.chunk_count, 0))
+            .outerjoin(CollectionStats, CollectionStats.collection_id == Collection.id)
+            .where(Collection.id.in_(collection_ids))
+        )).all()
+        if len(rows) != len(set(collection_ids)):
+            return None
+
+        snapshots = []
+        for collection_id, version, chunk_count in rows:
+            self._query_counts[collection_id] = self._query_counts.get(collection_id, 0) + 1
+            if chunk_count > settings.MEMORY_INDEX_MAX_CHUNKS:
+                return None
+            snapshot = self._snapshot(collection_id, version)
+            if snapshot is None:
+                # Still collect the other collections' query counts
+                snapshots = None
+                continue
+            if snapshots is not None:
+                snapshots.append(snapshot)
+        if not snapshots:
+            return None
+
+        # NumPy releases the GIL, so the matrix products run off the event loop
+        ids, distances = await asyncio.to_thread(_search_snapshots, snapshots, query_embedding, k)
+        return ids.tolist(), distances.tolist()
+
+    def _snapshot(self, collection_id: int, version: int) -> Optional[Snapshot]:
+        snapshot = self._snapshots.get(collection_id)
+        if snapshot is not None and snapshot.version == version:
+            self._snapshots.move_to_end(collection_id)
+            return snapshot
+        # Another worker may have built this version already
+        snapshot = load_snapshot(snapshot_prefix(collection_id, version), version)
+        if snapshot is not None:
+            self._remember(collection_id, snapshot)
+            return snapshot
+        if self._query_counts[collection_id] >= settings.MEMORY_INDEX_HOT_QUERIES and collection_id not in self._building:
+            self._building.add(collection_id)
+            task = asyncio.create_task(self._build(collection_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return None
+
+    def _remember(self, collection_id: int, snapshot: Snapshot):
+        self._snapshots[collection_id] = snapshot
+        self._snapshots.move_to_end(collection_id)
+        while len(self._snapshots) > settings.MEMORY_INDEX_MAX_COLLECTIONS:
+            self._snapshots.popitem(last=False)
+
+    async def _build(self, collection_id: int):
+        """Snapshot a collection in the background; queries use Postgres until it is written."""
+        try:
+            chunk_table = active_chunk_table()
+            async with AsyncSessionLocal() as db:
+                # Read the version first: chunks committed after it only make the snapshot newer
+                version = (await db.execute(
+                    select(Collection.version).where(Collection.id == collection_id)
+                )).scalar_one_or_none()
+                if version is None:
+                    return
+                rows = (await db.execute(
+                    select(chunk_table.id, chunk_table.content_vector)
+                    .where(chunk_table.collection_id == collection_id)
+                    .order_by(chunk_table.id)
+                )).all()
+            dimension = chunk_table.content_vector.type.dim
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            matrix = np.stack([np.asarray(row[1], dtype=np.float32) for row in rows]) if rows \
+                else np.zeros((0, dimension), dtype=np.float32)
+            prefix = snapshot_prefix(collection_id, version)
+            await asyncio.to_thread(write_snapshot, prefix, ids, matrix)
+            remove_snapshots(collection_id, keep_version=version)
+            self._remember(collection_id, load_snapshot(prefix, version))
+            logger.info(f"Memory index snapshot of collection {collection_id} v{version}: {len(ids)} chunks")
+        except Exception as e:
+            logger.error(f"Could not snapshot collection {collection_id}: {e}")
+        finally:
+            self._building.discard(collection_id)
+
+
+memory_index = MemoryIndex()
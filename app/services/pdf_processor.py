@@ -1,29 +1,170 @@
 import PyPDF2
-from typing import List, Tuple
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple, Union
 from app.core.config import settings
+from app.core.metrics import PDF_PARSE_SECONDS
+from app.services.chunking import chunker_for
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+import asyncio
 import logging
+import multiprocessing
+import os
+import tempfile
+import time
 from io import BytesIO
 
 logger = logging.getLogger(__name__)
 
-def process_pdf(content: bytes) -> List[Tuple[str, int]]:
+# Raw PDF bytes or the path of a PDF file on disk
+PdfSource = Union[bytes, str]
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@contextmanager
+def _open(source: PdfSource) -> Iterator[PyPDF2.PdfReader]:
+    """
+    A reader over a PDF. Files are handed to PdfReader as an open stream, which it seeks into
+    as objects are needed; given a path, it would read the whole file into memory first.
+    """
+    if isinstance(source, bytes):
+        yield PyPDF2.PdfReader(BytesIO(source))
+        return
+    with open(source, "rb") as f:
+        yield PyPDF2.PdfReader(f)
+
+
+def count_pages(source: PdfSource) -> int:
+    with _open(source) as reader:
+        return len(reader.pages)
+
+
+def extract_page_range(source: PdfSource, start: int = 0, end: Optional[int] = None, chunker=None) -> List[Tuple[str, int]]:
     """
-    Process PDF content and return chunks with their page numbers.
+    Extract chunks from pages [start, end) of a PDF, splitting each page with ``chunker``
+    (the CHUNK_STRATEGY chunker for PDFs by default).
+    Returns: List of (chunk_text, page_number) tuples, page numbers starting at 1
+    """
+    chunker = chunker or chunker_for(".pdf")
+    chunks_with_pages = []
+    with _open(source) as reader:
+        end = len(reader.pages) if end is None else min(end, len(reader.pages))
+        for page_num in range(start, end):
+            text = reader.pages[page_num].extract_text()
+            for chunk in chunker.split(text):
+                chunks_with_pages.append((chunk, page_num + 1))
+    return chunks_with_pages
+
+
+def _timed_extract(source: PdfSource, start: int, end: int, chunker) -> Tuple[List[Tuple[str, int]], float]:
+    """extract_page_range for worker processes, also returning the time it took there."""
+    started = time.perf_counter()
+    chunks = extract_page_range(source, start, end, chunker)
+    return chunks, time.perf_counter() - started
+
+
+def process_pdf(content: bytes, chunker=None) -> List[Tuple[str, int]]:
+    """
+    Process PDF content and return chunks with their page numbers, in the calling thread.
     Returns: List of (chunk_text, page_number) tuples
     """
     try:
-        reader = PyPDF2.PdfReader(BytesIO(content))
-        chunks_with_pages = []
-        
-        for page_num, page in enumerate(reader.pages, 1):
-            text = page.extract_text()
-            # Simple chunking by paragraphs - you might want to use a more sophisticated approach
-            paragraphs = text.split('\n\n')
-            for paragraph in paragraphs:
-                if len(paragraph.strip()) > 0:
-                    chunks_with_pages.append((paragraph.strip(), page_num))
-        
-        return chunks_with_pages
+        return extract_page_range(content, chunker=chunker)
+    except Exception as e:
+        logger.error(f"Error processing PDF: {e}")
+        raise
+
+
+def pdf_workers() -> int:
+    return settings.PDF_PROCESS_WORKERS or os.cpu_count() or 1
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """Process pool for PDF extraction, created on first use."""
+    global _executor
+    if _executor is None:
+        # "spawn" avoids forking a process that has a running event loop and open connections
+        _executor = ProcessPoolExecutor(
+            max_workers=pdf_workers(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_pdf_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def iter_pdf_chunks(
+    source: PdfSource,
+    chunker=None,
+    on_page_count: Optional[Callable[[int], Awaitable[None]]] = None,
+    window: Optional[int] = None
+) -> AsyncIterator[Tuple[str, int]]:
+    """
+    Extract a PDF in the process pool and yield (chunk_text, page_number) tuples in page order.
+
+    Pages are split into ranges of PDF_PAGES_PER_TASK. Up to ``window`` ranges (twice the
+    pool size by default) are in flight at once, so later pages are extracted on other cores
+    while the caller embeds the earliest ones, and the next range is submitted as each one is
+    consumed: memory holds a bounded number of extracted ranges, however long the PDF.
+    PDF bytes are written to a temporary file first so each task receives a path rather
+    than a pickled copy of the document, and reads only the parts of the file its pages need.
+    ``chunker`` is pickled into each task.
+    ``on_page_count`` is awaited with the number of pages before any chunk is yielded.
+    """
+    chunker = chunker or chunker_for(".pdf")
+    executor = get_pdf_executor()
+    temp_path = None
+    if isinstance(source, bytes):
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(source)
+            temp_path = source = f.name
+
+    # Tasks submitted and not yet finished; the file must outlive every one of them
+    in_flight = set()
+
+    def submit(fn, *args) -> Future:
+        future = executor.submit(fn, *args)
+        in_flight.add(future)
+        future.add_done_callback(in_flight.discard)
+        return future
+
+    futures = deque()
+    try:
+        page_count = await asyncio.wrap_future(submit(count_pages, source))
+        if on_page_count is not None:
+            await on_page_count(page_count)
+        step = max(1, settings.PDF_PAGES_PER_TASK)
+        starts = iter(range(0, page_count, step))
+        window = max(1, window or 2 * pdf_workers())
+
+        def submit_next():
+            start = next(starts, None)
+            if start is not None:
+                futures.append(submit(_timed_extract, source, start, start + step, chunker))
+
+        for _ in range(window):
+            submit_next()
+        while futures:
+            chunks, seconds = await asyncio.wrap_future(futures.popleft())
+            submit_next()
+            # Measured in the worker, so time spent queued for a free process is not included
+            PDF_PARSE_SECONDS.observe(seconds)
+            for chunk in chunks:
+                yield chunk
     except Exception as e:
         logger.error(f"Error processing PDF: {e}")
         raise
+    finally:
+        # Queued tasks are cancelled; ones already running in a worker cannot be, so they are
+        # waited for before the file they read is removed
+        running = [future for future in list(in_flight) if not future.cancel()]
+        if running:
+            await asyncio.wait([asyncio.wrap_future(future) for future in running])
+        if temp_path is not None:
+            os.remove(temp_path)
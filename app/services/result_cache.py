@@ -0,0 +1,187 @@
+"""
+Cache of /api/query results.
+
+Entries are keyed by the normalized request together with the generation of every collection
+it searches: each collection's ``version`` (bumped in the same transaction as any upload or
+document deletion that changes its chunks) and its search settings. A deleted collection
+drops out of the generation, and searches across all collections include every collection's.
+A change therefore moves later searches to a new key instead of serving the old result, and
+superseded entries are simply evicted.
+
+Results are stored as JSON, in process within RESULT_CACHE_MAX_BYTES ("memory") or in Redis
+("redis") so that every worker shares the same entries.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from app.core.config import settings
+from app.models import Collection
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryResultBackend:
+    """Least-recently-used entries within a budget of bytes (keys and serialized results)."""
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.size_bytes = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self._clock():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes):
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, self._clock() + self.ttl if self.ttl else None)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str):
+        value, _ = self._data.pop(key)
+        self.size_bytes -= len(key) + len(value)
+
+    def clear(self):
+        self._data.clear()
+        self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisResultBackend:
+    """
+    Entries in Redis, shared by every worker. Memory is bounded by the server's maxmemory
+    policy; entries also expire after ``ttl``. Needs the ``redis`` package unless a client
+    is passed in.
+    """
+
+    def __init__(self, url: str, ttl: Optional[float] = None, client=None, prefix: str = "rag:results:"):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes):
+        await self.client.set(self.prefix + key, value, ex=int(self.ttl) if self.ttl else None)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+async def collection_generation(db: AsyncSession, collection_ids: Optional[List[int]]) -> str:
+    """The version and search settings of each searched collection (every collection when None)."""
+    query = select(
+        Collection.id,
+        Collection.version,
+        Collection.vector_quantization,
+        func.coalesce(Collection.rerank_oversample, settings.RERANK_OVERSAMPLE)
+    ).order_by(Collection.id)
+    if collection_ids is not None:
+        query = query.where(Collection.id.in_(collection_ids))
+    rows = (await db.execute(query)).all()
+    return ";".join(":".join(map(str, row)) for row in rows)
+
+
+def result_cache_key(
+    query_text: str,
+    collection_ids: Optional[List[int]],
+    limit: int,
+    ef_search: Optional[int],
+    probes: Optional[int],
+    generation: str
+) -> str:
+    request = [
+        settings.EMBEDDING_PROVIDER.value, settings.EMBEDDING_MODEL, settings.VECTOR_DISTANCE,
+        settings.TEXT_SEARCH_CONFIG, settings.HYBRID_CANDIDATE_FACTOR, settings.RRF_K,
+        query_text, sorted(set(collection_ids)) if collection_ids is not None else None,
+        limit, ef_search, probes, generation,
+    ]
+    return hashlib.sha256(json.dumps(request).encode()).hexdigest()
+
+
+class SearchResultCache:
+    """Search results by request and collection generation. Backend errors count as misses."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def key(
+        self,
+        db: AsyncSession,
+        query_text: str,
+        collection_ids: Optional[List[int]],
+        limit: int,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
+    ) -> str:
+        generation = await collection_generation(db, collection_ids)
+        return result_cache_key(query_text, collection_ids, limit, ef_search, probes, generation)
+
+    async def get(self, key: str) -> Optional[List[dict]]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Search result cache lookup failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key: str, results: List[dict]):
+        try:
+            await self.backend.set(key, json.dumps(results).encode())
+        except Exception as e:
+            logger.warning(f"Could not cache search results: {e}")
+
+
+result_cache: Optional[SearchResultCache] = None
+
+
+def get_result_cache() -> Optional[SearchResultCache]:
+    """The process-wide result cache, created on first use; None when RESULT_CACHE_BACKEND is off."""
+    global result_cache
+    if result_cache is None:
+        if settings.RESULT_CACHE_BACKEND == "redis":
+            result_cache = SearchResultCache(
+                RedisResultBackend(settings.RESULT_CACHE_REDIS_URL, settings.RESULT_CACHE_TTL)
+            )
+        elif settings.RESULT_CACHE_BACKEND == "memory" and settings.RESULT_CACHE_MAX_BYTES > 0:
+            result_cache = SearchResultCache(
+                MemoryResultBackend(settings.RESULT_CACHE_MAX_BYTES, settings.RESULT_CACHE_TTL)
+            )
+    return result_cache
+
+
+async def close_result_cache():
+    if result_cache is not None and hasattr(result_cache.backend, "close"):
+        await result_cache.backend.close()
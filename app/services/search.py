@@ -0,0 +1,295 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, literal, true, Float, Integer, Text
+from sqlalchemy.dialects.postgresql import ARRAY, REGCONFIG
+from app.models import Collection, Document
+from app.core.config import settings
+from app.core.metrics import SEARCH_SECONDS
+from app.services.collection_registry import resolve_collection_ids
+from app.services.vector_index import (
+    active_chunk_table, apply_iterative_scan, candidate_distance_expression, distance_expression
+)
+from app.services.memory_index import memory_index
+import logging
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyAverage:
+    """Exponentially weighted moving average of a latency in seconds."""
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def observe(self, seconds: float):
+        if self.value is None:
+            self.value = seconds
+        else:
+            self.value += self.alpha * (seconds - self.value)
+
+
+# End-to-end latency of /api/query, used to estimate what a batch would have cost sequentially
+single_query_latency = LatencyAverage()
+
+
+def _filtered_chunks(chunk_table, collection_ids: Optional[List[int]]):
+    """
+    Select over the chunk table restricted to the given collections (None means all). The
+    filter is on the chunks' own collection_id, so a partitioned table is pruned to the
+    partitions of those collections when the statement is planned.
+    """
+    query = select(chunk_table.id).select_from(chunk_table)
+    if collection_ids is not None:
+        query = query.where(chunk_table.collection_id.in_(collection_ids))
+    return query
+
+
+async def quantization_profile(db: AsyncSession, collection_ids: Optional[List[int]]) -> Tuple[str, int]:
+    """
+    (quantization, oversample) for a search over the given collections. Collections with
+    different quantization modes are searched at full precision.
+    """
+    query = select(
+        Collection.vector_quantization,
+        func.coalesce(Collection.rerank_oversample, settings.RERANK_OVERSAMPLE)
+    )
+    if collection_ids is not None:
+        query = query.where(Collection.id.in_(collection_ids))
+    rows = (await db.execute(query)).all()
+    modes = {quantization for quantization, _ in rows}
+    if len(modes) != 1 or "none" in modes:
+        return "none", 1
+    return modes.pop(), max(oversample for _, oversample in rows)
+
+
+def _vector_hits(
+    chunk_table, query_embedding, collection_ids, candidates: int, outer, quantization: str, oversample: int, memory_hits
+):
+    """
+    The nearest ``candidates`` chunks with their exact distance. With quantization, the ANN
+    search runs on the quantized index for ``candidates * oversample`` chunks, and only those
+    are re-ranked by the exact distance over the full-precision vectors. ``memory_hits``
+    (ids and distances already found by the in-process index) replaces the search entirely.
+    """
+    if memory_hits is not None:
+        ids, distances = memory_hits
+        return (
+            func.unnest(literal(list(ids), ARRAY(Integer)), literal(list(distances), ARRAY(Float)))
+            .table_valued("id", "distance")
+            .render_derived(name="vector_hits")
+        )
+    if quantization == "none":
+        distance = distance_expression(chunk_table.content_vector, query_embedding)
+        return (
+            _filtered_chunks(chunk_table, collection_ids)
+            .add_columns(distance.label("distance"))
+            .order_by(distance)
+            .limit(candidates)
+            .correlate(outer)
+            .subquery("vector_hits")
+        )
+    shortlist = (
+        _filtered_chunks(chunk_table, collection_ids)
+        .add_columns(chunk_table.content_vector)
+        .order_by(candidate_distance_expression(chunk_table.content_vector, query_embedding, quantization))
+        .limit(candidates * max(1, oversample))
+        .correlate(outer)
+        .subquery("vector_shortlist")
+    )
+    distance = distance_expression(shortlist.c.content_vector, query_embedding)
+    return (
+        select(shortlist.c.id, distance.label("distance"))
+        .order_by(distance)
+        .limit(candidates)
+        .correlate(outer)
+        .subquery("vector_hits")
+    )
+
+
+def hybrid_search_query(
+    query_text,
+    query_embedding,
+    collection_ids: Optional[List[int]],
+    limit: int,
+    outer=None,
+    quantization: str = "none",
+    oversample: int = 1,
+    memory_hits: Optional[Tuple[List[int], List[float]]] = None
+):
+    """
+    Build a single statement that fuses vector and keyword retrieval with reciprocal-rank fusion.
+    ``query_text`` and ``query_embedding`` may be values or columns of ``outer``, the FROM the
+    statement is correlated with when it runs as a LATERAL subquery. ``collection_ids`` (None
+    for all collections) restricts both halves.
+
+    The vector half takes the nearest ``limit * HYBRID_CANDIDATE_FACTOR`` chunks by the configured
+    distance operator (served by the ANN index, over quantized vectors when ``quantization`` is
+    set); the keyword half takes the best ranked full-text matches from the GIN-indexed
+    ``content_tsv`` column. Each chunk scores ``sum(1 / (RRF_K + rank))`` over the lists it
+    appears in, and the top ``limit`` are returned with their exact vector distance.
+    """
+    chunk_table = active_chunk_table()
+    candidates = limit * settings.HYBRID_CANDIDATE_FACTOR
+    rrf_k = settings.RRF_K
+
+    vector_hits = _vector_hits(
+        chunk_table, query_embedding, collection_ids, candidates, outer, quantization, oversample, memory_hits
+    )
+    vector_ranked = select(
+        vector_hits.c.id,
+        func.row_number().over(order_by=vector_hits.c.distance).label("rank")
+    ).cte("vector_ranked", nesting=outer is not None)
+
+    tsquery = func.websearch_to_tsquery(literal(settings.TEXT_SEARCH_CONFIG).cast(REGCONFIG), query_text)
+    keyword_score = func.ts_rank(chunk_table.content_tsv, tsquery)
+    keyword_hits = (
+        _filtered_chunks(chunk_table, collection_ids)
+        .add_columns(keyword_score.label("score"))
+        .where(chunk_table.content_tsv.op('@@')(tsquery))
+        .order_by(keyword_score.desc())
+        .limit(candidates)
+        .correlate(outer)
+        .subquery("keyword_hits")
+    )
+    keyword_ranked = select(
+        keyword_hits.c.id,
+        func.row_number().over(order_by=keyword_hits.c.score.desc()).label("rank")
+    ).cte("keyword_ranked", nesting=outer is not None)
+
+    score = (
+        func.coalesce(1.0 / (vector_ranked.c.rank + rrf_k).cast(Float), 0.0)
+        + func.coalesce(1.0 / (keyword_ranked.c.rank + rrf_k).cast(Float), 0.0)
+    )
+    fused = (
+        select(
+            func.coalesce(vector_ranked.c.id, keyword_ranked.c.id).label("id"),
+            score.label("score")
+        )
+        .select_from(vector_ranked.join(keyword_ranked, vector_ranked.c.id == keyword_ranked.c.id, full=True))
+        .order_by(score.desc())
+        .limit(limit)
+        .cte("fused", nesting=outer is not None)
+    )
+
+    return (
+        select(
+            chunk_table.content,
+            chunk_table.chunk_index,
+            Document.filename,
+            Collection.name.label("collection_name"),
+            distance_expression(chunk_table.content_vector, query_embedding).label("distance"),
+            fused.c.score
+        )
+        .select_from(fused)
+        .join(chunk_table, chunk_table.id == fused.c.id)
+        .join(Document, chunk_table.document_id == Document.id)
+        .join(Collection, Document.collection_id == Collection.id)
+        .order_by(fused.c.score.desc())
+    )
+
+
+async def hybrid_search(
+    db: AsyncSession,
+    query_text: str,
+    query_embedding,
+    collections: Optional[List[str]],
+    limit: int
+) -> List[dict]:
+    """
+    Run the fused vector + keyword search and format the rows for the API. Collections held
+    by the in-process memory index have their vector candidates ranked there instead.
+    """
+    collection_ids = await resolve_collection_ids(db, collections)
+    if collection_ids == []:
+        return []
+    if settings.MEMORY_INDEX_ENABLED:
+        candidates = limit * settings.HYBRID_CANDIDATE_FACTOR
+        memory_hits = await memory_index.search(db, collection_ids, query_embedding, candidates)
+        if memory_hits is not None:
+            with SEARCH_SECONDS.labels("memory").time():
+                results = await db.execute(
+                    hybrid_search_query(query_text, query_embedding, collection_ids, limit, memory_hits=memory_hits)
+                )
+            return [_format_row(row) for row in results]
+    if collection_ids is not None:
+        await apply_iterative_scan(db)
+    quantization, oversample = await quantization_profile(db, collection_ids)
+    with SEARCH_SECONDS.labels("hybrid").time():
+        results = await db.execute(
+            hybrid_search_query(query_text, query_embedding, collection_ids, limit, None, quantization, oversample)
+        )
+    return [_format_row(row) for row in results]
+
+
+def _format_row(row) -> dict:
+    return {
+        "chunk_content": row.content,
+        "document_filename": row.filename,
+        "collection_name": row.collection_name,
+        "distance": float(row.distance),
+        "score": float(row.score),
+        "chunk_number": row.chunk_index
+    }
+
+
+def _vector_literal(embedding) -> str:
+    return "[" + ",".join(map(str, embedding.tolist())) + "]"
+
+
+def batch_search_query(
+    query_texts: List[str],
+    query_embeddings,
+    collection_ids: Optional[List[int]],
+    limit: int,
+    quantization: str = "none",
+    oversample: int = 1
+):
+    """
+    Build one statement running the hybrid search for every query.
+
+    The queries are unnested from two parallel arrays (text and vector literals) with their
+    ordinal, and the per-query hybrid search runs as a LATERAL subquery over each of them.
+    """
+    queries = (
+        func.unnest(
+            literal(list(query_texts), ARRAY(Text)),
+            literal([_vector_literal(embedding) for embedding in query_embeddings], ARRAY(Text))
+        )
+        .table_valued("query_text", "query_vector", with_ordinality="ordinal")
+        .render_derived(name="queries")
+    )
+    hits = hybrid_search_query(
+        queries.c.query_text, queries.c.query_vector, collection_ids, limit, queries, quantization, oversample
+    ).lateral("hits")
+    return (
+        select(queries.c.ordinal, hits)
+        .select_from(queries.join(hits, true()))
+        .order_by(queries.c.ordinal, hits.c.score.desc())
+    )
+
+
+async def batch_hybrid_search(
+    db: AsyncSession,
+    query_texts: List[str],
+    query_embeddings,
+    collections: Optional[List[str]],
+    limit: int
+) -> List[List[dict]]:
+    """Run the hybrid search for several queries in one round trip; results are in query order."""
+    results: List[List[dict]] = [[] for _ in query_texts]
+    if not query_texts:
+        return results
+    collection_ids = await resolve_collection_ids(db, collections)
+    if collection_ids == []:
+        return results
+    if collection_ids is not None:
+        await apply_iterative_scan(db)
+    quantization, oversample = await quantization_profile(db, collection_ids)
+    with SEARCH_SECONDS.labels("batch").time():
+        rows = await db.execute(
+            batch_search_query(query_texts, query_embeddings, collection_ids, limit, quantization, oversample)
+        )
+    for row in rows:
+        results[row.ordinal - 1].append(_format_row(row))
+    return results
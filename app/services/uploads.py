@@ -0,0 +1,119 @@
+"""
+Upload intake with bounded memory.
+
+Uploads are copied to the ingestion spool directory block by block and capped at
+MAX_UPLOAD_BYTES, and spooled text is decoded block by block, so the memory an upload
+takes does not depend on its size.
+"""
+from app.core.config import settings
+import codecs
+import json
+import os
+from typing import AsyncIterator, Iterator, Union
+
+# Raw upload bytes or the path of a spooled upload
+UploadSource = Union[bytes, str]
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the maximum size of {limit} bytes")
+
+
+async def spool_upload(blocks: AsyncIterator[bytes], path: str, max_bytes: int = None) -> int:
+    """
+    Write an upload to ``path`` as it arrives and return its size. Raises UploadTooLarge as
+    soon as more than ``max_bytes`` arrive, leaving nothing behind.
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            async for block in blocks:
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                f.write(block)
+    except BaseException:
+        discard_upload(path)
+        raise
+    return size
+
+
+async def iter_upload_file(file, block_size: int = None) -> AsyncIterator[bytes]:
+    """Blocks of an UploadFile, read without loading it whole."""
+    block_size = block_size or settings.UPLOAD_READ_SIZE
+    while block := await file.read(block_size):
+        yield block
+
+
+def discard_upload(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def read_head(source: UploadSource, size: int = 5) -> bytes:
+    if isinstance(source, bytes):
+        return source[:size]
+    with open(source, "rb") as f:
+        return f.read(size)
+
+
+def is_pdf(source: UploadSource) -> bool:
+    return read_head(source, 4) == b'%PDF'
+
+
+def iter_text_blocks(source: UploadSource, block_size: int = None) -> Iterator[str]:
+    """
+    UTF-8 text of an upload in blocks of about ``block_size`` bytes. Characters split across
+    blocks are carried over by the incremental decoder; invalid bytes become U+FFFD.
+    """
+    block_size = block_size or settings.UPLOAD_READ_SIZE
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    if isinstance(source, bytes):
+        view = memoryview(source)
+        for start in range(0, len(view), block_size):
+            yield decoder.decode(view[start:start + block_size])
+    else:
+        with open(source, "rb") as f:
+            while block := f.read(block_size):
+                yield decoder.decode(block)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware answering 413 to uploads whose Content-Length exceeds MAX_UPLOAD_BYTES,
+    before any of the body is read. Uploads without a length are capped while spooling.
+    """
+
+    # Room for the multipart boundaries and headers around the file
+    MULTIPART_OVERHEAD = 64 * 1024
+
+    def __init__(self, app, path_prefix: str = "/api/documents/upload"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].startswith(self.path_prefix):
+            headers = dict(scope["headers"])
+            length = headers.get(b"content-length")
+            if length is not None and length.isdigit() and int(length) > settings.MAX_UPLOAD_BYTES + self.MULTIPART_OVERHEAD:
+                await self._reject(send)
+                return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send):
+        body = json.dumps({"detail": str(UploadTooLarge(settings.MAX_UPLOAD_BYTES))}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,267 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import cast, func, select, text, Float
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.types import UserDefinedType
+from app.db.database import engine
+from app.models import ChunkOllama, ChunkOpenAI, Collection, Vector
+from app.services.chunk_partitions import partitioned_tables, unindexed_partitions
+from app.core.config import settings, EmbeddingProvider
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Distance name -> (SQL operator, pgvector operator class)
+DISTANCE_OPS = {
+    "l2": ("<->", "vector_l2_ops"),
+    "cosine": ("<=>", "vector_cosine_ops"),
+    "inner_product": ("<#>", "vector_ip_ops"),
+}
+
+INDEX_METHODS = ("hnsw", "ivfflat")
+
+# Compact copies of content_vector that ANN indexes can be built on instead of the float32 column
+QUANTIZATIONS = ("none", "halfvec", "binary")
+
+# Distance name -> pgvector operator class for halfvec expressions
+HALFVEC_OPCLASSES = {
+    "l2": "halfvec_l2_ops",
+    "cosine": "halfvec_cosine_ops",
+    "inner_product": "halfvec_ip_ops",
+}
+
+# Binary quantized vectors are compared by Hamming distance whatever the configured distance
+HAMMING_OPERATOR = "<~>"
+
+CHUNK_TABLES = {
+    EmbeddingProvider.OLLAMA: ChunkOllama,
+    EmbeddingProvider.OPENAI: ChunkOpenAI,
+}
+
+
+def active_chunk_table():
+    """Chunk model used by the configured embedding provider."""
+    return CHUNK_TABLES[settings.EMBEDDING_PROVIDER]
+
+
+def distance_expression(column, query_vector, distance: Optional[str] = None):
+    """
+    Distance between a vector column and a query vector, written with the pgvector operator
+    so the planner can use an ANN index built with the matching operator class.
+    """
+    operator, _ = DISTANCE_OPS[distance or settings.VECTOR_DISTANCE]
+    return column.op(operator, return_type=Float)(cast(query_vector, Vector(column.type.dim)))
+
+
+class HalfVector(UserDefinedType):
+    """pgvector halfvec type, only used in casts (the pinned pgvector package has no type for it)."""
+    cache_ok = True
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def get_col_spec(self, **kw):
+        return f"HALFVEC({self.dim})"
+
+
+def quantized_expression(vector, dim: int, quantization: str):
+    """
+    A vector expression in its quantized form. These render the same expressions the
+    quantized indexes are built on, so the planner can match them.
+    """
+    if quantization == "halfvec":
+        return cast(vector, HalfVector(dim))
+    if quantization == "binary":
+        return cast(func.binary_quantize(vector), BIT(dim))
+    return vector
+
+
+def candidate_distance_expression(column, query_vector, quantization: str, distance: Optional[str] = None):
+    """
+    Distance used to shortlist ANN candidates: the exact distance without quantization,
+    otherwise the distance between the quantized column and the quantized query vector.
+    """
+    if quantization == "none":
+        return distance_expression(column, query_vector, distance)
+    dim = column.type.dim
+    operator = HAMMING_OPERATOR if quantization == "binary" else DISTANCE_OPS[distance or settings.VECTOR_DISTANCE][0]
+    query = quantized_expression(cast(query_vector, Vector(dim)), dim, quantization)
+    return quantized_expression(column, dim, quantization).op(operator, return_type=Float)(query)
+
+
+def index_name(table_name: str, method: str, distance: str, quantization: str = "none") -> str:
+    if quantization == "binary":
+        return f"ix_{table_name}_vector_{method}_binary"
+    suffix = "" if quantization == "none" else f"_{quantization}"
+    return f"ix_{table_name}_vector_{method}_{distance}{suffix}"
+
+
+def build_index_ddl(
+    table_name: str,
+    method: str,
+    distance: str,
+    concurrently: bool = True,
+    m: Optional[int] = None,
+    ef_construction: Optional[int] = None,
+    lists: Optional[int] = None,
+    quantization: str = "none",
+    dimension: Optional[int] = None,
+    only: bool = False
+) -> str:
+    """CREATE INDEX for an ANN index; ``only`` creates a partitioned table's index without its partitions'."""
+    if method not in INDEX_METHODS:
+        raise ValueError(f"Unsupported index method: {method}")
+    if distance not in DISTANCE_OPS:
+        raise ValueError(f"Unsupported distance: {distance}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unsupported quantization: {quantization}")
+    if quantization != "none" and not dimension:
+        raise ValueError("Quantized indexes need the vector dimension")
+    if method == "hnsw":
+        options = f"m = {int(m or settings.HNSW_M)}, ef_construction = {int(ef_construction or settings.HNSW_EF_CONSTRUCTION)}"
+    else:
+        options = f"lists = {int(lists or settings.IVFFLAT_LISTS)}"
+    if quantization == "halfvec":
+        target = f"(content_vector::halfvec({int(dimension)})) {HALFVEC_OPCLASSES[distance]}"
+    elif quantization == "binary":
+        target = f"(binary_quantize(content_vector)::bit({int(dimension)})) bit_hamming_ops"
+    else:
+        target = f"content_vector {DISTANCE_OPS[distance][1]}"
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+        f"{index_name(table_name, method, distance, quantization)} ON {'ONLY ' if only else ''}{table_name} "
+        f"USING {method} ({target}) WITH ({options})"
+    )
+
+
+async def create_vector_index(
+    method: str,
+    distance: Optional[str] = None,
+    provider: Optional[EmbeddingProvider] = None,
+    concurrently: bool = True,
+    m: Optional[int] = None,
+    ef_construction: Optional[int] = None,
+    lists: Optional[int] = None,
+    quantization: str = "none"
+) -> str:
+    """Build an ANN index on a chunk table, optionally over a quantized copy of the vectors. Returns the index name."""
+    distance = distance or settings.VECTOR_DISTANCE
+    chunk_table = CHUNK_TABLES[provider or settings.EMBEDDING_PROVIDER]
+    table_name = chunk_table.__tablename__
+    options = dict(
+        method=method, distance=distance, m=m, ef_construction=ef_construction, lists=lists,
+        quantization=quantization, dimension=chunk_table.content_vector.type.dim
+    )
+    ddl = build_index_ddl(table_name, concurrently=concurrently, **options)
+    name = index_name(table_name, method, distance, quantization)
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if settings.INDEX_BUILD_MAINTENANCE_WORK_MEM:
+            await conn.execute(text("SELECT set_config('maintenance_work_mem', :value, false)"),
+                               {"value": settings.INDEX_BUILD_MAINTENANCE_WORK_MEM})
+        if concurrently and table_name in await partitioned_tables(conn):
+            # A partitioned index cannot be built concurrently: create it on the parent only,
+            # then build each partition's index concurrently and attach it. Partitions created
+            # later get their own copy automatically.
+            await conn.execute(text(build_index_ddl(table_name, concurrently=False, only=True, **options)))
+            for partition in await unindexed_partitions(conn, table_name, name):
+                partition_ddl = build_index_ddl(partition, concurrently=True, **options)
+                logger.info(f"Building vector index for partition {partition}: {partition_ddl}")
+                await conn.execute(text(partition_ddl))
+                await conn.execute(text(
+                    f"ALTER INDEX {name} ATTACH PARTITION {index_name(partition, method, distance, quantization)}"
+                ))
+        else:
+            logger.info(f"Building vector index {name}: {ddl}")
+            await conn.execute(text(ddl))
+    logger.info(f"Vector index {name} ready")
+    return name
+
+
+async def list_vector_indexes() -> List[dict]:
+    """ANN indexes on the chunk tables, with validity (an interrupted concurrent build leaves an invalid index)."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT c.relname AS name, t.relname AS table_name, am.amname AS method,
+                       i.indisvalid AS valid, c.relkind = 'I' AS partitioned,
+                       pg_relation_size(c.oid) AS size_bytes,
+                       pg_get_indexdef(c.oid) AS definition
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_class t ON t.oid = i.indrelid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE t.relname = ANY(:tables) AND am.amname = ANY(:methods)
+                ORDER BY c.relname
+            """),
+            {"tables": [model.__tablename__ for model in CHUNK_TABLES.values()], "methods": list(INDEX_METHODS)}
+        )
+        return [dict(row._mapping) for row in result]
+
+
+async def drop_vector_index(name: str, concurrently: bool = True) -> bool:
+    """
+    Drop an ANN index by name. Only indexes reported by list_vector_indexes can be dropped.
+    Indexes of partitioned tables (with their partitions' indexes) are never dropped concurrently.
+    """
+    index = {index["name"]: index for index in await list_vector_indexes()}.get(name)
+    if index is None:
+        return False
+    concurrently = concurrently and not index["partitioned"]
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        quoted = conn.dialect.identifier_preparer.quote(name)
+        await conn.execute(text(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {quoted}"))
+    logger.info(f"Dropped vector index {name}")
+    return True
+
+
+async def quantizations_in_use() -> List[str]:
+    """Quantization modes enabled on at least one collection."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(Collection.vector_quantization).where(Collection.vector_quantization != "none").distinct()
+        )
+        return list(result.scalars())
+
+
+async def ensure_vector_index(quantizations: Optional[List[str]] = None):
+    """
+    Create the configured index for the active provider if it does not exist yet, plus a
+    quantized one for each quantization mode in use (all of them when not given).
+    """
+    if settings.VECTOR_INDEX_METHOD == "none":
+        return
+    try:
+        if quantizations is None:
+            await create_vector_index(settings.VECTOR_INDEX_METHOD)
+            quantizations = await quantizations_in_use()
+        for quantization in quantizations:
+            await create_vector_index(settings.VECTOR_INDEX_METHOD, quantization=quantization)
+    except Exception as e:
+        logger.error(f"Could not ensure vector index: {e}")
+
+
+async def apply_search_params(db: AsyncSession, ef_search: Optional[int] = None, probes: Optional[int] = None):
+    """Set per-query ANN search parameters for the current transaction only."""
+    if ef_search is not None:
+        await db.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(int(ef_search))})
+    if probes is not None:
+        await db.execute(text("SELECT set_config('ivfflat.probes', :value, true)"), {"value": str(int(probes))})
+
+
+async def apply_iterative_scan(db: AsyncSession):
+    """
+    With VECTOR_ITERATIVE_SCAN, let ANN scans of a filtered search go on past ef_search/probes
+    until enough chunks pass the filter, for the current transaction only. IVFFlat only
+    supports relaxed order.
+    """
+    mode = settings.VECTOR_ITERATIVE_SCAN
+    if mode == "off":
+        return
+    await db.execute(
+        text("SELECT set_config('hnsw.iterative_scan', :hnsw, true), set_config('ivfflat.iterative_scan', :ivfflat, true)"),
+        {"hnsw": mode, "ivfflat": "relaxed_order"}
+    )
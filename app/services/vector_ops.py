@@ -0,0 +1,69 @@
+import numpy as np
+import logging
+from typing import Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def to_matrix(embeddings: Sequence, dimension: int) -> np.ndarray:
+    """
+    Convert provider output into a validated (n, dimension) float32 matrix.
+
+    Vectors longer than ``dimension`` are truncated and shorter ones zero-padded. Raises
+    ValueError for missing, non-numeric or non-finite values.
+    """
+    try:
+        matrix = _as_float32(embeddings)
+    except _Ragged:
+        matrix = None
+    if matrix is not None and matrix.ndim == 2:
+        matrix = fit_dimension(matrix, dimension)
+    else:
+        rows = [_as_float32(embedding).ravel()[:dimension] for embedding in embeddings]
+        matrix = np.zeros((len(rows), dimension), dtype=np.float32)
+        for i, row in enumerate(rows):
+            matrix[i, :row.shape[0]] = row
+    if not np.isfinite(matrix).all():
+        raise ValueError("Embeddings contain NaN or infinite values")
+    return matrix
+
+
+class _Ragged(ValueError):
+    """Rows of different lengths, which cannot be converted in one go."""
+
+
+def _as_float32(values) -> np.ndarray:
+    # Let numpy infer the type first: casting straight to float32 would accept numeric strings
+    try:
+        array = np.asarray(values)
+    except ValueError as e:
+        raise _Ragged(str(e)) from e
+    if array.dtype.kind not in "iuf":
+        if array.dtype.kind == "O" and any(value is None for value in array.ravel()):
+            raise ValueError("Embeddings contain missing (None) values")
+        raise ValueError(f"Embeddings must be numeric, got values of type {array.dtype}")
+    return array.astype(np.float32, copy=False)
+
+
+def fit_dimension(matrix: np.ndarray, dimension: int) -> np.ndarray:
+    """Truncate or zero-pad every row of the matrix to ``dimension`` columns."""
+    current = matrix.shape[1]
+    if current == dimension:
+        return matrix
+    if current > dimension:
+        return np.ascontiguousarray(matrix[:, :dimension])
+    padded = np.zeros((matrix.shape[0], dimension), dtype=matrix.dtype)
+    padded[:, :current] = matrix
+    return padded
+
+
+def zero_rows(matrix: np.ndarray) -> int:
+    """Number of all-zero vectors, which carry no similarity information."""
+    return int((~matrix.any(axis=1)).sum())
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length in place; all-zero rows are left as they are."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
@@ -0,0 +1,75 @@
+"""
+Chunking throughput per strategy, against the previous inline splitter.
+
+Runs in-process on the deterministic corpus text, plus a Chunk-Overlap as large as the
+chunk size, where the previous splitter moved forward by a single character per chunk. Usage:
+    python -m benchmarks.bench_chunking --paragraphs 2000 --chunk-size 1000 --overlap 200
+"""
+import argparse
+import random
+import time
+
+from app.services.chunking import STRATEGIES, get_chunker
+from benchmarks.corpus import make_markdown, make_text
+
+
+def legacy_split(text, chunk_size, chunk_overlap):
+    """The previous splitter from DocumentService._iter_text_chunks."""
+    current_pos = 0
+    while current_pos < len(text):
+        chunk_end = min(current_pos + chunk_size, len(text))
+        if chunk_end < len(text):
+            last_space = text.rfind(' ', current_pos, chunk_end)
+            if last_space != -1:
+                chunk_end = last_space
+        chunk = text[current_pos:chunk_end].strip()
+        if chunk:
+            yield chunk
+        current_pos = max(current_pos + 1, chunk_end - chunk_overlap)
+
+
+def measure(split, text, max_seconds):
+    """(MB/s, chunks) for consuming ``split(text)``, or (None, chunks) past the time budget."""
+    chunks = 0
+    start = time.perf_counter()
+    for _ in split(text):
+        chunks += 1
+        if chunks % 1000 == 0 and time.perf_counter() - start > max_seconds:
+            return None, chunks
+    elapsed = time.perf_counter() - start
+    return len(text) / elapsed / 1e6, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="Give up on a run after this long")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    text = make_text(rng, args.paragraphs)
+    scenarios = [
+        ("text", text, args.overlap),
+        ("markdown", make_markdown(rng, args.paragraphs), args.overlap),
+        ("no spaces", "x" * len(text), args.overlap),
+        ("overlap = chunk size", text, args.chunk_size)
+    ]
+
+    print(f"chunk size {args.chunk_size}")
+    for scenario, text, overlap in scenarios:
+        print(f"{scenario} ({len(text) / 1e6:.1f} MB, overlap {overlap})")
+        runners = {"legacy": lambda text: legacy_split(text, args.chunk_size, overlap)}
+        for name in STRATEGIES:
+            # Token sizes count tokens; roughly five characters each
+            scale = 5 if name == "token" else 1
+            runners[name] = get_chunker(name, args.chunk_size // scale, overlap // scale).split
+        for runner_name, split in runners.items():
+            throughput, chunks = measure(split, text, args.max_seconds)
+            rate = f"{throughput:8.1f} MB/s" if throughput is not None else f"  >{args.max_seconds:.0f}s, stopped"
+            print(f"  {runner_name:<10} {rate}  {chunks:>9} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare the old one-request-per-text Ollama path against the batched client.
+
+Starts the stub Ollama server locally, embeds the same synthetic texts both ways and
+prints texts/sec for each. Usage:
+    python -m benchmarks.bench_embeddings --texts 2000 --request-latency 0.005
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.services.embeddings import OllamaEmbeddingClient
+from benchmarks.stub_ollama import StubOllamaServer
+
+
+async def embed_sequential(base_url: str, texts):
+    """The pre-batching behaviour: a fresh client and one POST per text."""
+    async with httpx.AsyncClient() as client:
+        embeddings = []
+        for text in texts:
+            response = await client.post(
+                f"{base_url}/api/embeddings",
+                json={"model": "stub", "prompt": text},
+                timeout=30.0
+            )
+            response.raise_for_status()
+            embeddings.append(response.json()["embedding"])
+        return embeddings
+
+
+async def embed_batched(base_url: str, texts, batch_size: int, concurrency: int):
+    client = OllamaEmbeddingClient(base_url, "stub", batch_size=batch_size, max_concurrency=concurrency)
+    try:
+        return await client.embed(texts)
+    finally:
+        await client.aclose()
+
+
+async def run(args):
+    texts = [f"synthetic chunk {i} " + "lorem ipsum dolor sit amet " * 20 for i in range(args.texts)]
+    with StubOllamaServer(args.dimension, args.request_latency, args.text_latency) as server:
+        start = time.perf_counter()
+        sequential = await embed_sequential(server.base_url, texts)
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = await embed_batched(server.base_url, texts, args.batch_size, args.concurrency)
+        batched_time = time.perf_counter() - start
+
+    assert sequential == batched, "batched embeddings differ from sequential ones"
+    print(f"sequential: {len(texts) / sequential_time:10.1f} texts/sec ({sequential_time:.2f}s)")
+    print(f"batched:    {len(texts) / batched_time:10.1f} texts/sec ({batched_time:.2f}s)")
+    print(f"speedup:    {sequential_time / batched_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--request-latency", type=float, default=0.005)
+    parser.add_argument("--text-latency", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
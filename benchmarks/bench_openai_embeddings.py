@@ -0,0 +1,85 @@
+"""
+Measure the OpenAI-compatible client against a rate-limited local server.
+
+Starts the stub server with a capacity of concurrent requests (beyond it, requests get 429
+with a Retry-After) and embeds the same synthetic texts one request per text and with the
+batched, adaptively limited client. The server's ceiling is measured rather than derived from
+its simulated latencies, which leave out the stub's own encoding cost: the same texts are
+embedded with concurrency fixed at the capacity, so no request is ever throttled. Prints
+texts/sec for each, and the adaptive client as a share of that ceiling. Usage:
+    python -m benchmarks.bench_openai_embeddings --texts 5000 --capacity 4 --concurrency 16
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.services.embeddings import OpenAIEmbeddingClient
+from benchmarks.stub_ollama import StubOllamaServer
+
+
+async def embed_sequential(base_url: str, texts):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        embeddings = []
+        for text in texts:
+            response = await client.post("/embeddings", json={"model": "stub", "input": [text]})
+            response.raise_for_status()
+            embeddings.append(response.json()["data"][0]["embedding"])
+        return embeddings
+
+
+async def embed_batched(base_url: str, texts, args, concurrency: int):
+    client = OpenAIEmbeddingClient(
+        base_url, "stub", batch_size=args.batch_size, batch_tokens=args.batch_tokens,
+        max_concurrency=concurrency, max_connections=concurrency, retry_wait=0.01
+    )
+    try:
+        return await client.embed(texts), client.limiter.limit
+    finally:
+        await client.aclose()
+
+
+async def run(args):
+    texts = [f"synthetic chunk {i} " + "lorem ipsum dolor sit amet " * 20 for i in range(args.texts)]
+    with StubOllamaServer(args.dimension, args.request_latency, args.text_latency, capacity=args.capacity) as server:
+        base_url = f"{server.base_url}/v1"
+        sample = texts[:args.sequential_texts]
+        start = time.perf_counter()
+        sequential = await embed_sequential(base_url, sample)
+        sequential_time = time.perf_counter() - start
+
+        # Ceiling: exactly as many requests in flight as the server accepts
+        start = time.perf_counter()
+        await embed_batched(base_url, texts, args, args.capacity or args.concurrency)
+        ceiling_time = time.perf_counter() - start
+        ceiling_throttled = server.stats["throttled"]
+
+        start = time.perf_counter()
+        batched, final_limit = await embed_batched(base_url, texts, args, args.concurrency)
+        batched_time = time.perf_counter() - start
+        throttled = server.stats["throttled"] - ceiling_throttled
+
+    assert sequential == batched[:len(sample)], "batched embeddings differ from sequential ones"
+    assert ceiling_throttled == 0, "the ceiling run was throttled"
+    ceiling = len(texts) / ceiling_time
+    rate = len(texts) / batched_time
+    print(f"one per request: {len(sample) / sequential_time:10.1f} texts/sec ({len(sample)} texts)")
+    print(f"server ceiling:  {ceiling:10.1f} texts/sec ({ceiling_time:.2f}s at concurrency "
+          f"{args.capacity or args.concurrency}, unthrottled)")
+    print(f"adaptive:        {rate:10.1f} texts/sec ({batched_time:.2f}s, {rate / ceiling:.0%} of ceiling, "
+          f"{throttled} requests throttled, final concurrency {final_limit})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--sequential-texts", type=int, default=200, help="Texts embedded one request at a time")
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--batch-tokens", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--request-latency", type=float, default=0.02)
+    parser.add_argument("--text-latency", type=float, default=0.0002)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,66 @@
+"""
+Compare the old per-vector embedding post-processing with the vectorized NumPy pipeline.
+
+Runs in-process without Ollama or a database. Usage:
+    python -m benchmarks.bench_postprocess --texts 4096 --source-dim 768 --target-dim 1536
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.vector_ops import to_matrix, zero_rows, l2_normalize
+
+
+def legacy_postprocess(embeddings, target_dim):
+    """The previous path: Python float conversion and dimension fitting one vector at a time."""
+    adjusted = []
+    for embedding in embeddings:
+        current_dim = len(embedding)
+        if current_dim < target_dim:
+            embedding = embedding + [0.0] * (target_dim - current_dim)
+        elif current_dim > target_dim:
+            embedding = embedding[:target_dim]
+        adjusted.append([float(x) for x in embedding])
+    return [[float(x) for x in embedding] for embedding in adjusted]
+
+
+def vectorized_postprocess(embeddings, target_dim, normalize):
+    matrix = to_matrix(embeddings, target_dim)
+    zero_rows(matrix)
+    if normalize:
+        l2_normalize(matrix)
+    return matrix
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=4096)
+    parser.add_argument("--source-dim", type=int, default=768)
+    parser.add_argument("--target-dim", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--normalize", action="store_true")
+    args = parser.parse_args()
+
+    # Provider output arrives as JSON-decoded lists of Python floats
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((args.texts, args.source_dim)).tolist()
+
+    legacy = timed(lambda: legacy_postprocess(embeddings, args.target_dim), args.repeat)
+    vectorized = timed(lambda: vectorized_postprocess(embeddings, args.target_dim, args.normalize), args.repeat)
+    print(f"{args.texts} x {args.source_dim} -> {args.target_dim} dims (best of {args.repeat})")
+    print(f"  legacy      {legacy * 1000:9.1f} ms")
+    print(f"  vectorized  {vectorized * 1000:9.1f} ms  ({legacy / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
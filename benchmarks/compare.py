@@ -0,0 +1,49 @@
+"""
+Compare two bench_suite result files. Usage:
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+"""
+import argparse
+import json
+
+INGESTION_METRICS = ("docs_per_sec", "chunks_per_sec")
+QUERY_METRICS = ("p50_ms", "p95_ms", "p99_ms", "qps")
+
+
+def index(rows):
+    return {(row["corpus_size"], row["concurrency"]): row for row in rows}
+
+
+def change(old, new) -> str:
+    if old in (None, 0) or new is None:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(section: str, metrics, baseline, candidate):
+    old_rows, new_rows = index(baseline[section]), index(candidate[section])
+    print(f"\n{section}")
+    for key in sorted(old_rows.keys() & new_rows.keys()):
+        size, concurrency = key
+        cells = [
+            f"{metric} {old_rows[key][metric]} -> {new_rows[key][metric]} ({change(old_rows[key][metric], new_rows[key][metric])})"
+            for metric in metrics
+        ]
+        print(f"  size={size:<6} c={concurrency:<3} " + "  ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    print(f"{baseline['meta']['commit']} -> {candidate['meta']['commit']}")
+    compare("ingestion", INGESTION_METRICS, baseline, candidate)
+    compare("query", QUERY_METRICS, baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Deterministic synthetic corpora for benchmarks.
+
+Documents are built from a fixed vocabulary with a seeded generator, so the same arguments
+always produce byte-identical files. Text, Markdown and PDF documents are supported; PDFs
+are written directly, without a PDF library.
+"""
+import random
+from typing import Iterator, List, Sequence, Tuple
+
+VOCABULARY = (
+    "vector index query embedding chunk document collection search latency throughput "
+    "postgres cosine distance retrieval ranking keyword hybrid fusion cache batch stream "
+    "ingest parse token sentence paragraph section heading table model server client pool "
+    "memory disk page scan filter sort limit cursor worker queue job progress result score"
+).split()
+
+FORMATS = ("txt", "md", "pdf")
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(sentence(rng, rng.randint(6, 18)) for _ in range(sentences))
+
+
+def make_text(rng: random.Random, paragraphs: int) -> str:
+    return "\n\n".join(paragraph(rng, rng.randint(3, 7)) for _ in range(paragraphs))
+
+
+def make_markdown(rng: random.Random, paragraphs: int) -> str:
+    parts = [f"# {sentence(rng, 4)[:-1]}"]
+    for i in range(paragraphs):
+        if i % 3 == 0:
+            parts.append(f"## {sentence(rng, 3)[:-1]}")
+        if i % 4 == 2:
+            parts.append("\n".join(f"- {sentence(rng, 6)}" for _ in range(rng.randint(2, 5))))
+        else:
+            parts.append(paragraph(rng, rng.randint(3, 7)))
+    return "\n\n".join(parts)
+
+
+def make_pdf(pages: Sequence[str]) -> bytes:
+    """Build a minimal PDF with the given text on each page, one Helvetica line per line of text."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = " T* ".join(f"({line})" + " Tj" for line in text.split("\n"))
+        stream = f"BT /F1 12 Tf 14 TL 72 720 Td {lines} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def make_pdf_document(rng: random.Random, pages: int) -> bytes:
+    return make_pdf([
+        "\n".join(sentence(rng, rng.randint(6, 12)) for _ in range(rng.randint(20, 40)))
+        for _ in range(pages)
+    ])
+
+
+def generate_corpus(
+    documents: int,
+    formats: Sequence[str] = FORMATS,
+    paragraphs: int = 20,
+    seed: int = 0
+) -> List[Tuple[str, bytes]]:
+    """Return ``documents`` (filename, content) pairs, cycling through ``formats``."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(documents):
+        fmt = formats[i % len(formats)]
+        if fmt == "txt":
+            content = make_text(rng, paragraphs).encode()
+        elif fmt == "md":
+            content = make_markdown(rng, paragraphs).encode()
+        elif fmt == "pdf":
+            content = make_pdf_document(rng, max(1, paragraphs // 5))
+        else:
+            raise ValueError(f"Unsupported format: {fmt}")
+        corpus.append((f"doc-{i:05d}.{fmt}", content))
+    return corpus
+
+
+def generate_queries(count: int, seed: int = 1) -> Iterator[str]:
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 6)))
@@ -0,0 +1,153 @@
+"""
+Deterministic stand-in for the Ollama embedding API.
+
+Serves both the batch ``/api/embed`` endpoint and the legacy ``/api/embeddings`` endpoint,
+plus the OpenAI-compatible ``/v1/embeddings``. Vectors are derived from a hash of the input
+text, so the same text always gets the same vector. Latency is simulated per request and per
+text to mimic a GPU-backed server; with a ``capacity``, requests beyond that many in flight
+are rejected with 429 and a Retry-After, like a rate-limited OpenAI-compatible server.
+
+Run standalone with:
+    python -m benchmarks.stub_ollama --port 11434 --dimension 768 --request-latency 0.005
+"""
+import argparse
+import asyncio
+import hashlib
+import socket
+import threading
+import time
+
+import numpy as np
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+def fake_embedding(text: str, dimension: int) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_app(
+    dimension: int = 768, request_latency: float = 0.0, text_latency: float = 0.0, capacity: int = 0
+) -> Starlette:
+    stats = {"requests": 0, "texts": 0, "throttled": 0}
+    in_flight = {"count": 0}
+
+    async def embed(request: Request):
+        body = await request.json()
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        stats["requests"] += 1
+        stats["texts"] += len(texts)
+        await asyncio.sleep(request_latency + text_latency * len(texts))
+        return JSONResponse({
+            "model": body.get("model"),
+            "embeddings": [fake_embedding(text, dimension) for text in texts]
+        })
+
+    async def embeddings(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        stats["texts"] += 1
+        await asyncio.sleep(request_latency + text_latency)
+        return JSONResponse({"embedding": fake_embedding(body.get("prompt", ""), dimension)})
+
+    async def openai_embeddings(request: Request):
+        body = await request.json()
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        if capacity and in_flight["count"] >= capacity:
+            stats["throttled"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status_code=429,
+                headers={"retry-after-ms": str(int(request_latency * 1000) or 1)}
+            )
+        in_flight["count"] += 1
+        try:
+            stats["requests"] += 1
+            stats["texts"] += len(texts)
+            await asyncio.sleep(request_latency + text_latency * len(texts))
+        finally:
+            in_flight["count"] -= 1
+        return JSONResponse({
+            "object": "list",
+            "model": body.get("model"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimension)}
+                for i, text in enumerate(texts)
+            ],
+        })
+
+    async def get_stats(request: Request):
+        return JSONResponse(stats)
+
+    app = Starlette(routes=[
+        Route("/api/embed", embed, methods=["POST"]),
+        Route("/api/embeddings", embeddings, methods=["POST"]),
+        Route("/v1/embeddings", openai_embeddings, methods=["POST"]),
+        Route("/stats", get_stats, methods=["GET"]),
+    ])
+    app.state.stats = stats
+    return app
+
+
+class StubOllamaServer:
+    """Runs the stub app with uvicorn in a background thread, for use from benchmarks."""
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        request_latency: float = 0.0,
+        text_latency: float = 0.0,
+        port: int = 0,
+        capacity: int = 0
+    ):
+        self.app = create_app(dimension, request_latency, text_latency, capacity)
+        self.port = port or _free_port()
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def stats(self) -> dict:
+        return self.app.state.stats
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--request-latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--text-latency", type=float, default=0.0, help="Seconds added per embedded text")
+    parser.add_argument("--capacity", type=int, default=0, help="OpenAI requests in flight before 429s (0 = unlimited)")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.dimension, args.request_latency, args.text_latency, args.capacity),
+        host="127.0.0.1", port=args.port
+    )
@@ -5,6 +5,9 @@ CREATE EXTENSION IF NOT EXISTS vector;
 CREATE TABLE IF NOT EXISTS collections (
     id SERIAL PRIMARY KEY,
     name VARCHAR NOT NULL UNIQUE,
+    vector_quantization VARCHAR NOT NULL DEFAULT 'none',
+    rerank_oversample INTEGER,
+    version BIGINT NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -15,26 +18,71 @@ CREATE TABLE IF NOT EXISTS documents (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX IF NOT EXISTS ix_documents_filename_id ON documents (filename, id);
+CREATE INDEX IF NOT EXISTS ix_documents_created_at_id ON documents (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_documents_collection_id_filename ON documents (collection_id, filename);
+
+CREATE TABLE IF NOT EXISTS collection_stats (
+    collection_id INTEGER PRIMARY KEY REFERENCES collections(id) ON DELETE CASCADE,
+    document_count BIGINT NOT NULL DEFAULT 0,
+    chunk_count BIGINT NOT NULL DEFAULT 0,
+    total_characters BIGINT NOT NULL DEFAULT 0,
+    last_ingest_at TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS chunks_ollama (
     id SERIAL PRIMARY KEY,
     document_id INTEGER REFERENCES documents(id) ON DELETE CASCADE,
+    collection_id INTEGER,
     content TEXT NOT NULL,
     content_vector vector(768),
+    -- Regenerated on startup when TEXT_SEARCH_CONFIG is not 'simple'
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, content)) STORED,
     chunk_index INTEGER NOT NULL,
     page_number INTEGER NOT NULL,
+    content_hash VARCHAR(64),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX IF NOT EXISTS ix_chunks_ollama_content_tsv ON chunks_ollama USING gin (content_tsv);
+CREATE INDEX IF NOT EXISTS ix_chunks_ollama_document_id_content_hash ON chunks_ollama (document_id, content_hash);
+CREATE INDEX IF NOT EXISTS ix_chunks_ollama_collection_id_document_id ON chunks_ollama (collection_id, document_id);
+CREATE INDEX IF NOT EXISTS ix_chunks_ollama_missing_collection_id ON chunks_ollama (id) WHERE collection_id IS NULL;
+
 CREATE TABLE IF NOT EXISTS chunks_openai (
     id SERIAL PRIMARY KEY,
     document_id INTEGER REFERENCES documents(id) ON DELETE CASCADE,
+    collection_id INTEGER,
     content TEXT NOT NULL,
     content_vector vector(1536),
+    -- Regenerated on startup when TEXT_SEARCH_CONFIG is not 'simple'
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, content)) STORED,
     chunk_index INTEGER NOT NULL,
     page_number INTEGER NOT NULL,
+    content_hash VARCHAR(64),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX IF NOT EXISTS ix_chunks_openai_content_tsv ON chunks_openai USING gin (content_tsv);
+CREATE INDEX IF NOT EXISTS ix_chunks_openai_document_id_content_hash ON chunks_openai (document_id, content_hash);
+CREATE INDEX IF NOT EXISTS ix_chunks_openai_collection_id_document_id ON chunks_openai (collection_id, document_id);
+CREATE INDEX IF NOT EXISTS ix_chunks_openai_missing_collection_id ON chunks_openai (id) WHERE collection_id IS NULL;
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    provider VARCHAR NOT NULL,
+    model VARCHAR NOT NULL,
+    dimension INTEGER NOT NULL,
+    normalized BOOLEAN NOT NULL DEFAULT FALSE,
+    content_hash VARCHAR(64) NOT NULL,
+    embedding vector NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (provider, model, dimension, normalized, content_hash)
+);
+
+CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_used_at ON embedding_cache (last_used_at);
+
 -- Add comments to remind about the vector dimensions
 COMMENT ON COLUMN chunks_ollama.content_vector IS 'Vector dimension for Ollama embeddings (768)';
 COMMENT ON COLUMN chunks_openai.content_vector IS 'Vector dimension for OpenAI embeddings (1536)';
@@ -250,14 +250,7 @@ async function fetchCollections() {
         };
 
         // Fetch documents
-        const documentsResponse = await fetch('/api/documents');
-        console.log('Documents response:', documentsResponse);
-        
-        if (!documentsResponse.ok) {
-            throw new Error(`HTTP error! status: ${documentsResponse.status}`);
-        }
-        
-        const documents = await documentsResponse.json();
+        const documents = await fetchAllDocuments();
         console.log('Documents data:', documents);
 
         const collectionsList = document.getElementById('collectionsList');
@@ -392,13 +385,12 @@ async function deleteCollection(collectionName) {
 
 async function updateCounts() {
     try {
-        const [documentsResponse, collectionsResponse] = await Promise.all([
-            fetch('/api/documents'),
+        const [documents, collectionsResponse] = await Promise.all([
+            fetchAllDocuments(),
             fetch('/api/collections')
         ]);
         
-        if (documentsResponse.ok && collectionsResponse.ok) {
-            const documents = await documentsResponse.json();
+        if (collectionsResponse.ok) {
             const collections = await collectionsResponse.json();
             
             document.getElementById('documentsCount').textContent = documents.length;
@@ -409,14 +401,26 @@ async function updateCounts() {
     }
 }
 
-async function fetchDocuments() {
-    try {
-        const response = await fetch('/api/documents');
-        await updateCounts(); // Update the counts after fetching documents
+// Reads every page of /api/documents by following the X-Next-Cursor header
+async function fetchAllDocuments() {
+    const documents = [];
+    let cursor = null;
+    do {
+        const url = '/api/documents?limit=1000' + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+        const response = await fetch(url);
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        const documents = await response.json();
+        documents.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return documents;
+}
+
+async function fetchDocuments() {
+    try {
+        const documents = await fetchAllDocuments();
+        await updateCounts(); // Update the counts after fetching documents
         const documentsList = document.getElementById('documentsList');
         const noDocumentsMessage = document.getElementById('noDocumentsMessage');
         const documentsTable = document.getElementById('documentsTable');
@@ -538,6 +542,36 @@ function showStatus(message, isError = false) {
     }, 5000);
 }
 
+// Poll an ingestion job until it completes; throws with the job's error if it fails
+async function waitForJob(jobId) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.detail || 'Could not fetch upload status');
+        }
+        if (job.status === 'completed') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Processing failed');
+        }
+        // The chunk total is only known once the document is stored; until then show the count so far
+        const details = [];
+        if (job.chunks_total) {
+            details.push(`${job.chunks_embedded}/${job.chunks_total} chunks`);
+        } else if (job.chunks_embedded) {
+            details.push(`${job.chunks_embedded} chunks`);
+        }
+        if (job.pages_total) {
+            details.push(`page ${job.pages_done || 0}/${job.pages_total}`);
+        }
+        const progress = details.length ? ` (${details.join(', ')})` : '';
+        state.setUploadStatus({ message: `Processing: ${job.stage}${progress}`, isError: false });
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 async function fetchCollectionsForQueryDropdown() {
     try {
         console.log('fetchCollectionsForQueryDropdown');
@@ -863,6 +897,10 @@ document.addEventListener('DOMContentLoaded', () => {
             const data = await response.json();
 
             if (response.ok) {
+                if (response.status === 202) {
+                    // Uploads are processed in the background; wait for the ingestion job
+                    await waitForJob(data.job_id);
+                }
                 document.getElementById('uploadSpinner').classList.add('hidden');
                 showStatus('Document uploaded successfully');
                 setTimeout(() => {
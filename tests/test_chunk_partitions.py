@@ -0,0 +1,23 @@
+from app.db.database import schema_upgrades
+from app.services.chunk_partitions import partition_ddl, partition_name, partitioned_table_ddl
+
+
+def test_partition_per_collection():
+    assert partition_name("chunks_ollama", 12) == "chunks_ollama_c12"
+    assert partition_ddl("chunks_openai", 3) == (
+        "CREATE TABLE IF NOT EXISTS chunks_openai_c3 PARTITION OF chunks_openai FOR VALUES IN (3)"
+    )
+
+
+def test_partitioned_table_keys_include_the_collection():
+    statements = partitioned_table_ddl("chunks_ollama", "chunks_ollama_partitioned")
+    assert statements[0].endswith("PARTITION BY LIST (collection_id)")
+    assert "ADD PRIMARY KEY (id, collection_id)" in statements[2]
+
+
+def test_existing_chunks_are_backfilled_with_their_collection():
+    upgrades = schema_upgrades()
+    column = upgrades.index("ALTER TABLE chunks_ollama ADD COLUMN IF NOT EXISTS collection_id integer")
+    backfill = next(i for i, statement in enumerate(upgrades) if statement.startswith("UPDATE chunks_ollama"))
+    assert column < backfill
+    assert "chunks_ollama.collection_id IS NULL" in upgrades[backfill]
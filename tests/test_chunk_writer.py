@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+from app.models import ChunkOllama
+from app.services import chunk_writer
+from app.services.chunk_writer import CHUNK_COLUMNS, copy_chunks, write_chunks
+
+
+class FakeDriverConnection:
+    def __init__(self):
+        self.copies = []
+
+    def is_in_transaction(self):
+        return True
+
+    async def copy_records_to_table(self, table, records, columns):
+        # Rows must arrive as an iterator that COPY consumes, not as a prebuilt list
+        assert not isinstance(records, (list, tuple))
+        self.copies.append((table, list(records), columns))
+
+
+class FakeSession:
+    def __init__(self):
+        self.driver = FakeDriverConnection()
+        self.connections = 0
+
+    async def connection(self):
+        self.connections += 1
+
+        async def get_raw_connection():
+            return SimpleNamespace(driver_connection=self.driver)
+
+        return SimpleNamespace(get_raw_connection=get_raw_connection)
+
+
+def rows(count):
+    for i in range(count):
+        yield (1, 2, f"chunk {i}", [0.0, 1.0], i, 1, f"hash{i}")
+
+
+async def test_copy_streams_rows_and_counts_them():
+    db = FakeSession()
+    assert await copy_chunks(db, ChunkOllama, rows(3)) == 3
+    (table, copied, columns), = db.driver.copies
+    assert (table, columns) == ("chunks_ollama", CHUNK_COLUMNS)
+    assert [row[2] for row in copied] == ["chunk 0", "chunk 1", "chunk 2"]
+
+    # Nothing to write: no connection is checked out
+    db = FakeSession()
+    assert await copy_chunks(db, ChunkOllama, rows(0)) == 0
+    assert db.connections == 0
+
+
+async def test_insert_method_selection_and_copy_fallback(monkeypatch):
+    used = []
+
+    def writer(name):
+        async def write(db, chunk_table, rows):
+            used.append(name)
+            return len(list(rows))
+        return write
+
+    monkeypatch.setattr(chunk_writer, "CHUNK_WRITERS", {name: writer(name) for name in chunk_writer.CHUNK_WRITERS})
+    for method, binary_vectors in [("copy", True), ("copy", False), ("executemany", True), ("orm", False)]:
+        monkeypatch.setattr(chunk_writer.settings, "CHUNK_INSERT_METHOD", method)
+        monkeypatch.setattr(chunk_writer.settings, "DB_BINARY_VECTORS", binary_vectors)
+        assert await write_chunks(None, ChunkOllama, rows(2)) == 2
+
+    # COPY ... BINARY needs the binary vector codec, so it falls back to executemany without it
+    assert used == ["copy", "executemany", "executemany", "orm"]
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from app.services.chunking import (
+    _TOKEN as TOKEN, CharacterChunker, MarkdownChunker, SentenceChunker, TokenChunker, check_chunk_options,
+    get_chunker, strategy_for
+)
+
+
+def test_character_chunks_break_at_spaces_and_overlap():
+    text = " ".join(f"word{i}" for i in range(200))
+    chunks = list(CharacterChunker(100, 20).split(text))
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(not chunk.startswith(" ") and chunk.split()[0].startswith("word") for chunk in chunks)
+    # Every word survives, and consecutive chunks share their boundary words
+    assert set(" ".join(chunks).split()) == set(text.split())
+    assert chunks[1].split()[0] in chunks[0].split()
+
+
+def test_character_chunks_without_spaces_are_linear():
+    # The old splitter advanced one character per chunk here once the overlap exceeded the window
+    text = "x" * 200_000
+    start = time.perf_counter()
+    chunks = list(CharacterChunker(1000, 900).split(text))
+    assert time.perf_counter() - start < 1.0
+    assert all(len(chunk) == 1000 for chunk in chunks[:-1])
+    assert len(chunks) <= 4 * len(text) // 1000 + 1
+
+
+def test_sentences_are_kept_whole_and_overlapped():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(40))
+    chunks = list(SentenceChunker(120, 60).split(text))
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert all(chunk.endswith("ends here.") for chunk in chunks)
+    last = chunks[0].split(". ")[-1]
+    assert chunks[1].startswith(last.rstrip("."))
+
+
+def test_long_sentence_falls_back_to_characters():
+    chunks = list(SentenceChunker(50).split("Short one. " + "a" * 120 + " tail."))
+    assert chunks[0] == "Short one."
+    assert all(len(chunk) <= 50 for chunk in chunks)
+
+
+def test_overlap_is_trimmed_to_fit_the_next_sentence():
+    chunks = list(SentenceChunker(100, 25).split("Short one. Tiny. " + "x" * 95 + "."))
+    assert chunks == ["Short one. Tiny.", "x" * 95 + "."]
+
+
+@pytest.mark.parametrize("strategy", ["character", "sentence", "markdown"])
+def test_chunks_never_exceed_chunk_size(strategy):
+    sentences = ["Short one.", "Tiny.", "x" * 95 + ".", "A medium sentence of some length.", "y" * 150 + "."]
+    text = "# Head\n\n" + " ".join(sentences * 5) + "\n\n## Next\n\n" + " ".join(reversed(sentences * 5))
+    for chunk_size, overlap in [(100, 25), (60, 40), (300, 100)]:
+        chunks = list(get_chunker(strategy, chunk_size, overlap).split(text))
+        assert chunks and max(len(chunk) for chunk in chunks) <= chunk_size
+
+
+def test_token_chunks_never_exceed_max_tokens():
+    text = " ".join(f"word{i}, x." for i in range(500))
+    for max_tokens, overlap in [(10, 3), (64, 16)]:
+        chunks = list(get_chunker("token", max_tokens, overlap).split(text))
+        assert max(len(TOKEN.findall(chunk)) for chunk in chunks) <= max_tokens
+
+
+def test_markdown_chunks_carry_their_heading():
+    text = "Intro text.\n\n# Guide\n\nFirst part. Second part.\n\n## Install\n\nRun the installer. " * 3
+    chunks = list(MarkdownChunker(40).split(text))
+    assert chunks[0] == "Intro text."
+    assert any(chunk.startswith("## Install\nRun the installer.") for chunk in chunks)
+    assert all(chunk.startswith("#") for chunk in chunks[1:])
+
+
+def test_long_markdown_headings_are_cut_to_fit():
+    heading = "# " + "Very long heading " * 20
+    text = f"{heading}\n\nFirst part. Second part.\n\n{heading}\n\n## Empty {'x' * 200}"
+    for chunk_size, overlap in [(60, 100), (100, 25), (3, 1)]:
+        chunks = list(MarkdownChunker(chunk_size, overlap).split(text))
+        assert chunks and max(len(chunk) for chunk in chunks) <= chunk_size
+    chunks = list(MarkdownChunker(40).split(text))
+    assert chunks[:2] == ["# Very long heading\nFirst part.", "# Very long heading\nSecond part."]
+
+
+def test_token_chunks_slice_the_original_text():
+    text = "alpha, beta gamma.\n\ndelta epsilon zeta eta"
+    chunks = list(TokenChunker(4, 1).split(text))
+    assert chunks == ["alpha, beta gamma", "gamma.\n\ndelta epsilon", "epsilon zeta eta"]
+
+
+def test_strategy_selection(monkeypatch):
+    monkeypatch.setattr("app.services.chunking.settings.CHUNK_STRATEGY", "auto")
+    assert strategy_for("notes.MD") == "markdown"
+    assert strategy_for("report.pdf") == "sentence"
+    monkeypatch.setattr("app.services.chunking.settings.CHUNK_STRATEGY", "token")
+    assert strategy_for("notes.md") == "token"
+    with pytest.raises(ValueError):
+        get_chunker("paragraph")
+
+
+def test_requested_overlap_is_used_as_given_or_rejected(monkeypatch):
+    monkeypatch.setattr("app.services.chunking.settings.CHUNK_STRATEGY", "character")
+    monkeypatch.setattr("app.services.chunking.settings.CHUNK_SIZE", 1000)
+    monkeypatch.setattr("app.services.chunking.settings.CHUNK_OVERLAP", 200)
+    check_chunk_options("notes.txt", 500, 125)
+    check_chunk_options("notes.txt", None, 250)
+    for size, overlap in ((500, 200), (500, 500), (None, 251), (500, -1), (0, None)):
+        with pytest.raises(ValueError):
+            check_chunk_options("notes.txt", size, overlap)
+    # An explicit zero overlap is not replaced by the configured default
+    assert get_chunker("character", 500, 0).chunk_overlap == 0
+    assert get_chunker("character", 500).chunk_overlap == 125
@@ -0,0 +1,31 @@
+from app.services import collection_registry
+from app.services.collection_registry import invalidate_collection_ids, resolve_collection_ids
+
+
+class FakeSession:
+    def __init__(self, ids):
+        self.ids = ids
+        self.lookups = []
+
+    async def execute(self, statement):
+        names = statement.whereclause.right.value
+        self.lookups.append(list(names))
+        return [(name, self.ids[name]) for name in names if name in self.ids]
+
+
+async def test_names_resolve_once_until_invalidated():
+    invalidate_collection_ids()
+    db = FakeSession({"docs": 3, "notes": 7})
+
+    assert await resolve_collection_ids(db, ["docs", "missing"]) == [3]
+    assert await resolve_collection_ids(db, ["docs", "notes", "docs"]) == [3, 7]
+    # "docs" came from the cache; unknown names are looked up every time
+    assert db.lookups == [["docs", "missing"], ["notes"]]
+    assert await resolve_collection_ids(db, ["-"]) is None
+    assert await resolve_collection_ids(db, None) is None
+
+    db.ids["docs"] = 8  # Deleted and created again
+    invalidate_collection_ids()
+    assert await resolve_collection_ids(db, ["docs"]) == [8]
+    assert len(collection_registry.collection_id_cache) == 1
+    invalidate_collection_ids()
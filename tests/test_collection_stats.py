@@ -0,0 +1,39 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.collection_stats import apply_stats_delta, format_stats, vector_storage_bytes
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+
+
+async def test_delta_is_an_atomic_increment_upsert():
+    db = RecordingSession()
+    await apply_stats_delta(db, 3, documents=1, chunks=10, characters=500, ingested=True)
+    sql = db.statements[0]
+    assert "ON CONFLICT (collection_id) DO UPDATE" in sql
+    assert "chunk_count = (collection_stats.chunk_count + excluded.chunk_count)" in sql
+    assert "last_ingest_at = excluded.last_ingest_at" in sql
+
+
+async def test_delta_without_ingest_keeps_last_ingest_time():
+    db = RecordingSession()
+    await apply_stats_delta(db, 3, documents=-1, chunks=-10, characters=-500)
+    assert "last_ingest_at" not in db.statements[0]
+
+
+def test_vector_bytes_derived_from_chunk_count():
+    row = SimpleNamespace(
+        name="Default", document_count=2, chunk_count=10, total_characters=900,
+        last_ingest_at=datetime(2024, 1, 2, 3, 4, 5)
+    )
+    stats = format_stats(row)
+    assert stats["vector_bytes"] == 10 * vector_storage_bytes(768)
+    assert stats["last_ingest_at"] == "2024-01-02T03:04:05"
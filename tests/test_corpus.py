@@ -0,0 +1,35 @@
+from app.services.pdf_processor import process_pdf
+from app.services import result_cache
+from benchmarks.bench_suite import configure_for_benchmark, percentiles
+from benchmarks.corpus import generate_corpus
+
+
+def test_corpus_is_deterministic_and_cycles_formats():
+    corpus = generate_corpus(6, paragraphs=5, seed=3)
+    assert corpus == generate_corpus(6, paragraphs=5, seed=3)
+    assert [name.rsplit(".", 1)[1] for name, _ in corpus] == ["txt", "md", "pdf"] * 2
+    assert corpus[1][1].startswith(b"# ")
+
+
+def test_generated_pdf_is_extractable():
+    _, pdf = generate_corpus(3, paragraphs=10)[2]
+    chunks = process_pdf(pdf)
+    assert {page for _, page in chunks} == {1, 2}
+    assert all(text for text, _ in chunks)
+
+
+def test_percentiles_in_milliseconds():
+    result = percentiles([0.001 * i for i in range(1, 101)])
+    assert result["p50_ms"] == 50.5
+    assert result["p99_ms"] == 99.01
+
+
+def test_benchmark_bypasses_the_result_cache(monkeypatch):
+    monkeypatch.setattr(result_cache.settings, "RESULT_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(result_cache.settings, "INGEST_MODE", "async")
+    monkeypatch.setattr(result_cache, "result_cache", None)
+    assert result_cache.get_result_cache() is not None
+
+    configure_for_benchmark()
+    assert result_cache.settings.INGEST_MODE == "sync"
+    assert result_cache.get_result_cache() is None
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.pool import NullPool
+
+from app.db import database
+from app.db.database import _engine_options, register_vector_codec
+from app.models import Vector
+
+
+def test_production_profile_pools_connections(monkeypatch):
+    monkeypatch.setattr(database.settings, "DB_ENGINE_PROFILE", "production")
+    monkeypatch.setattr(database.settings, "DB_POOL_SIZE", 7)
+    monkeypatch.setattr(database.settings, "DB_MAX_OVERFLOW", 3)
+    monkeypatch.setattr(database.settings, "DB_STATEMENT_CACHE_SIZE", 50)
+
+    options = _engine_options()
+    assert "poolclass" not in options
+    assert (options["pool_size"], options["max_overflow"], options["echo"]) == (7, 3, False)
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"statement_cache_size": 50, "prepared_statement_cache_size": 50}
+
+
+def test_development_profile_echoes_without_a_pool(monkeypatch):
+    monkeypatch.setattr(database.settings, "DB_ENGINE_PROFILE", "development")
+    options = _engine_options()
+    assert options["poolclass"] is NullPool and options["echo"] is True
+    assert "pool_size" not in options
+
+
+def test_vectors_are_bound_as_float32_arrays(monkeypatch):
+    monkeypatch.setattr("app.models.settings.DB_BINARY_VECTORS", True)
+    process = Vector(3).bind_processor(postgresql.dialect())
+
+    value = process([1, 2, 3])
+    assert isinstance(value, np.ndarray) and value.dtype == np.float32
+    assert value.tolist() == [1.0, 2.0, 3.0]
+    assert process(None) is None
+    with pytest.raises(ValueError, match="expected 3 dimensions, not 2"):
+        process([1.0, 2.0])
+    with pytest.raises(ValueError, match="ndim"):
+        process([[1.0, 2.0, 3.0]])
+
+
+def test_vectors_are_bound_as_text_without_the_binary_codec(monkeypatch):
+    monkeypatch.setattr("app.models.settings.DB_BINARY_VECTORS", False)
+    process = Vector(3).bind_processor(postgresql.dialect())
+    assert process([1.0, 2.0, 3.0]) == "[1.0,2.0,3.0]"
+
+
+class FakeDbapiConnection:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def run_async(self, fn):
+        self.calls.append(fn)
+        if self.error:
+            raise self.error
+
+
+def test_vector_codec_is_registered_on_new_connections(monkeypatch):
+    monkeypatch.setattr(database.settings, "DB_BINARY_VECTORS", True)
+    connection = FakeDbapiConnection()
+    register_vector_codec(connection, None)
+    assert connection.calls == [database.register_vector]
+
+    # Before the extension exists the connection is left with the text format
+    register_vector_codec(FakeDbapiConnection(ValueError("unknown type: public.vector")), None)
+
+    monkeypatch.setattr(database.settings, "DB_BINARY_VECTORS", False)
+    connection = FakeDbapiConnection()
+    register_vector_codec(connection, None)
+    assert connection.calls == []
@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.main import app
+from app.services.document_service import DocumentService, _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip():
+    created = datetime(2024, 5, 1, 12, 30)
+    cursor = _encode_cursor("created_at", "desc", created, 17)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor, "created_at", "desc") == (created, 17)
+    assert _decode_cursor(_encode_cursor("filename", "asc", "a.pdf", 3), "filename", "asc") == ("a.pdf", 3)
+
+
+def test_cursor_must_match_listing_order():
+    cursor = _encode_cursor("filename", "asc", "a.pdf", 3)
+    with pytest.raises(ValueError):
+        _decode_cursor(cursor, "filename", "desc")
+    with pytest.raises(ValueError):
+        _decode_cursor("not a cursor", "id", "asc")
+
+
+@pytest.mark.parametrize("sort, payload", [
+    ("created_at", ["created_at", "asc", 12345, 1]),
+    ("created_at", ["created_at", "asc", "yesterday", 1]),
+    ("id", ["id", "asc", "7", 1]),
+    ("filename", ["filename", "asc", "a.pdf", "1"]),
+    ("id", {"sort": "id"}),
+    ("id", 42),
+])
+def test_malformed_cursor_is_a_400(sort, payload):
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        _decode_cursor(cursor, sort, "asc")
+
+    client = TestClient(app)
+    response = client.get("/api/documents", params={"sort": sort, "order": "asc", "cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return FakeResult(self.results.pop(0))
+
+
+async def test_get_documents_pages_and_counts_only_the_page():
+    rows = [
+        SimpleNamespace(id=i, filename=f"{i}.txt", collection_id=1, created_at=None, name="Default")
+        for i in (1, 2, 3)
+    ]
+    db = FakeSession(rows, [(1, 4), (2, 9)])
+    documents, next_cursor = await DocumentService(db).get_documents(limit=2)
+
+    assert [(d["id"], d["chunk_count"]) for d in documents] == [(1, 4), (2, 9)]
+    assert _decode_cursor(next_cursor, "id", "asc") == (2, 2)
+    assert "LIMIT" in db.statements[0]
+    assert "GROUP BY" in db.statements[1] and "IN (__[POSTCOMPILE" in db.statements[1]
@@ -0,0 +1,231 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models import Collection, Document
+from app.services import document_service
+from app.services.document_service import DocumentService
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeChunkSession:
+    """Stands in for the collection, document and chunk tables of one collection."""
+
+    def __init__(self):
+        self.collection = SimpleNamespace(id=7, name="manuals")
+        self.document = None
+        self.chunks = {}
+        self.next_id = 1
+        self.statements = []
+
+    def add(self, document):
+        self.document = document
+
+    async def flush(self):
+        self.document.id = 3
+
+    async def commit(self):
+        self.statements.append("commit")
+
+    async def rollback(self):
+        self.statements.append("rollback")
+
+    async def execute(self, statement, params=None):
+        if params is not None:
+            # executemany UPDATE by primary key
+            self.statements.append(("update", [row["id"] for row in params]))
+            for row in params:
+                self.chunks[row["id"]].update(chunk_index=row["chunk_index"], page_number=row["page_number"])
+            return None
+        if statement.is_delete:
+            ids = statement.compile(dialect=postgresql.dialect()).params["id_1"]
+            self.statements.append(("delete", list(ids)))
+            for chunk_id in ids:
+                del self.chunks[chunk_id]
+            return None
+        entity = statement.column_descriptions[0]["entity"]
+        if entity is Collection:
+            return FakeResult([self.collection])
+        if entity is Document:
+            return FakeResult([self.document] if self.document else [])
+        # The document's stored chunks; rows without a content hash are hashed by the database
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert "coalesce" in sql and "sha256" in sql
+        return FakeResult([
+            SimpleNamespace(
+                id=chunk_id,
+                chunk_index=chunk["chunk_index"],
+                page_number=chunk["page_number"],
+                length=len(chunk["content"]),
+                digest=chunk["content_hash"] or document_service.content_hash(chunk["content"])
+            )
+            for chunk_id, chunk in sorted(self.chunks.items(), key=lambda item: -item[1]["chunk_index"])
+        ])
+
+    def contents(self):
+        return [chunk["content"] for chunk in sorted(self.chunks.values(), key=lambda chunk: chunk["chunk_index"])]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """A DocumentService on a FakeChunkSession, recording embedded texts and stats deltas."""
+    db = FakeChunkSession()
+    embedded, deltas = [], []
+
+    async def get_embeddings_cached(session, texts):
+        embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+    async def write_chunks(session, chunk_class, rows):
+        for document_id, collection_id, content, embedding, chunk_index, page_number, digest in rows:
+            session.chunks[session.next_id] = {
+                "content": content, "chunk_index": chunk_index, "page_number": page_number, "content_hash": digest
+            }
+            session.next_id += 1
+
+    async def apply_stats_delta(session, collection_id, **delta):
+        deltas.append(delta)
+
+    async def bump_collection_version(session, collection_id):
+        pass
+
+    monkeypatch.setattr(document_service, "get_embeddings_cached", get_embeddings_cached)
+    monkeypatch.setattr(document_service, "write_chunks", write_chunks)
+    monkeypatch.setattr(document_service, "apply_stats_delta", apply_stats_delta)
+    monkeypatch.setattr(document_service, "bump_collection_version", bump_collection_version)
+    monkeypatch.setattr(document_service.settings, "REINDEX_MODE", "incremental")
+    monkeypatch.setattr(document_service.settings, "INGEST_EMBED_BATCH_SIZE", 2)
+    return SimpleNamespace(db=db, service=DocumentService(db), embedded=embedded, deltas=deltas)
+
+
+def chunk_source(monkeypatch, chunks, closed=None):
+    """Have text uploads split into exactly ``chunks``; ``closed`` records when the source is closed."""
+    async def iter_text_chunks(file_content, chunker):
+        try:
+            for chunk in chunks:
+                yield chunk, 1
+        finally:
+            if closed is not None:
+                closed.append(True)
+
+    monkeypatch.setattr(DocumentService, "_iter_text_chunks", staticmethod(iter_text_chunks))
+
+
+async def test_chunk_source_is_closed_when_embedding_fails(service, monkeypatch):
+    closed = []
+    chunk_source(monkeypatch, ["one", "two", "three"], closed)
+
+    async def failing_embedder(session, texts):
+        raise RuntimeError("embedding service unavailable")
+
+    monkeypatch.setattr(document_service, "get_embeddings_cached", failing_embedder)
+    with pytest.raises(RuntimeError):
+        await service.service.upload_document(b"text", "manual.txt", "manuals")
+    assert closed == [True]
+
+
+async def reupload(service, monkeypatch, first, second, legacy=False):
+    """Upload ``first``, then re-upload the same file as ``second``; returns the re-upload's result.
+    With ``legacy``, the stored chunks lose their content hash in between, like rows written before hashes were kept."""
+    chunk_source(monkeypatch, first)
+    await service.service.upload_document(b"text", "manual.txt", "manuals")
+    if legacy:
+        for chunk in service.db.chunks.values():
+            chunk["content_hash"] = None
+    service.embedded.clear()
+    service.deltas.clear()
+    service.db.statements.clear()
+    chunk_source(monkeypatch, second)
+    return await service.service.upload_document(b"text", "manual.txt", "manuals")
+
+
+def ids_by_content(db):
+    return {chunk["content"]: chunk_id for chunk_id, chunk in db.chunks.items()}
+
+
+async def test_unchanged_document_embeds_and_writes_nothing(service, monkeypatch):
+    result = await reupload(service, monkeypatch, ["alpha", "beta", "gamma"], ["alpha", "beta", "gamma"])
+
+    assert (result.chunks, result.added, result.kept, result.removed) == (3, 0, 3, 0)
+    assert service.embedded == []
+    assert service.db.statements == ["commit"]
+    assert service.deltas == [{"documents": 0, "chunks": 0, "characters": 0, "ingested": True}]
+
+
+async def test_edited_chunk_is_the_only_one_embedded(service, monkeypatch):
+    result = await reupload(service, monkeypatch, ["alpha", "beta", "gamma"], ["alpha", "beta v2", "gamma"])
+    kept = ids_by_content(service.db)
+
+    assert (result.added, result.kept, result.removed) == (1, 2, 1)
+    assert service.embedded == ["beta v2"]
+    assert service.db.contents() == ["alpha", "beta v2", "gamma"]
+    assert (kept["alpha"], kept["gamma"]) == (1, 3)
+    assert service.deltas[0]["chunks"] == 0
+    assert service.deltas[0]["characters"] == len("beta v2") - len("beta")
+
+
+async def test_duplicate_chunks_each_keep_one_stored_row(service, monkeypatch):
+    result = await reupload(service, monkeypatch, ["same", "same", "tail"], ["same", "same", "same", "tail"])
+
+    # Two stored copies are kept in order, the third copy is new, and "tail" moves down one place
+    assert (result.added, result.kept, result.removed) == (1, 3, 0)
+    assert service.embedded == ["same"]
+    assert service.db.contents() == ["same", "same", "same", "tail"]
+    assert [service.db.chunks[chunk_id]["chunk_index"] for chunk_id in (1, 2, 3)] == [0, 1, 3]
+    assert ("update", [3]) in service.db.statements
+    assert service.deltas[0]["chunks"] == 1
+
+
+async def test_dropped_duplicate_removes_the_later_copy(service, monkeypatch):
+    result = await reupload(service, monkeypatch, ["same", "same", "tail"], ["same", "tail"])
+
+    assert (result.added, result.kept, result.removed) == (0, 2, 1)
+    assert service.embedded == []
+    assert ("delete", [2]) in service.db.statements
+    assert service.db.contents() == ["same", "tail"]
+    assert service.deltas[0]["chunks"] == -1
+
+
+async def test_reordered_chunks_are_repositioned_without_embedding(service, monkeypatch):
+    result = await reupload(service, monkeypatch, ["alpha", "beta", "gamma"], ["gamma", "alpha", "beta"])
+
+    assert (result.added, result.kept, result.removed) == (0, 3, 0)
+    assert service.embedded == []
+    assert service.db.contents() == ["gamma", "alpha", "beta"]
+    assert ids_by_content(service.db) == {"alpha": 1, "beta": 2, "gamma": 3}
+    assert not any(statement[0] == "delete" for statement in service.db.statements if isinstance(statement, tuple))
+    assert service.deltas[0]["chunks"] == 0
+
+
+async def test_removed_chunks_are_deleted_in_batches(service, monkeypatch):
+    monkeypatch.setattr(document_service, "_DELETE_BATCH", 2)
+    result = await reupload(service, monkeypatch, ["a1", "b22", "c333", "d4444", "e55555"], ["a1", "e55555"])
+
+    assert (result.added, result.kept, result.removed) == (0, 2, 3)
+    assert service.embedded == []
+    deletes = [ids for kind, ids in (s for s in service.db.statements if isinstance(s, tuple)) if kind == "delete"]
+    assert [len(ids) for ids in deletes] == [2, 1]
+    assert sorted(sum(deletes, [])) == [2, 3, 4]
+    assert service.db.contents() == ["a1", "e55555"]
+    assert service.deltas[0]["chunks"] == -3
+    assert service.deltas[0]["characters"] == -len("b22c333d4444")
+
+
+async def test_legacy_rows_without_a_hash_are_matched_by_content(service, monkeypatch):
+    result = await reupload(service, monkeypatch, ["alpha", "beta", "gamma"], ["alpha", "beta v2", "gamma"], legacy=True)
+
+    assert (result.added, result.kept, result.removed) == (1, 2, 1)
+    assert service.embedded == ["beta v2"]
+    assert service.db.contents() == ["alpha", "beta v2", "gamma"]
+    assert service.deltas[0]["chunks"] == 0
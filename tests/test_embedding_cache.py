@@ -0,0 +1,195 @@
+from types import SimpleNamespace
+
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import EmbeddingProvider
+from app.services import embedding_cache
+from app.services.embedding_cache import EmbeddingCache, cache_stats, content_hash, get_embeddings_cached
+
+
+class FakeCacheSession:
+    """Stands in for the embedding_cache table, reading keys from the compiled statements."""
+
+    def __init__(self):
+        self.rows = {}
+        self.statements = []
+        self.inserted = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def commit(self):
+        self.statements.append("commit")
+
+    async def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        params = compiled.params
+        if statement.is_insert:
+            self.statements.append("insert")
+            i = 0
+            while f"provider_m{i}" in params:
+                self.inserted.append(params[f"content_hash_m{i}"])
+                key = tuple(params[f"{name}_m{i}"] for name in ("provider", "model", "dimension", "normalized"))
+                self.rows.setdefault(key + (params[f"content_hash_m{i}"],), {
+                    "embedding": params[f"embedding_m{i}"], "stale": False
+                })
+                i += 1
+            return None
+        # Booleans are rendered inline
+        normalized = "normalized = true" in str(compiled)
+        key = tuple(params[f"{name}_1"] for name in ("provider", "model", "dimension")) + (normalized,)
+        if statement.is_select:
+            return [
+                SimpleNamespace(content_hash=digest, embedding=row["embedding"], stale=row["stale"])
+                for digest in params["content_hash_1"]
+                for row in [self.rows.get(key + (digest,))] if row is not None
+            ]
+        self.statements.append(("touch", list(params["content_hash_1"])))
+        for digest in params["content_hash_1"]:
+            self.rows[key + (digest,)]["stale"] = False
+
+
+def fake_db(monkeypatch):
+    """Session for the lookups, also handed out by AsyncSessionLocal for the cache writes."""
+    db = FakeCacheSession()
+    monkeypatch.setattr(embedding_cache, "AsyncSessionLocal", lambda: db)
+    return db
+
+
+def fake_provider(monkeypatch):
+    calls = []
+
+    async def get_embeddings(texts):
+        calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+    monkeypatch.setattr(embedding_cache, "get_embeddings", get_embeddings)
+    monkeypatch.setattr(embedding_cache.settings, "EMBEDDING_CACHE_ENABLED", True)
+    return calls
+
+
+async def test_hits_misses_and_duplicates(monkeypatch):
+    calls = fake_provider(monkeypatch)
+    db = fake_db(monkeypatch)
+    hits, misses = cache_stats.hits, cache_stats.misses
+
+    first = await get_embeddings_cached(db, ["alpha", "be", "alpha"])
+    second = await get_embeddings_cached(db, ["be", "gamma!"])
+
+    # Each missing text is embedded once, however often it occurs
+    assert calls == [["alpha", "be"], ["gamma!"]]
+    assert first.tolist() == [[5, 1], [2, 1], [5, 1]]
+    assert second.tolist() == [[2, 1], [6, 1]]
+    assert (cache_stats.hits - hits, cache_stats.misses - misses) == (1, 3)
+
+
+async def test_entries_are_isolated_by_provider_model_dimension_and_normalization(monkeypatch):
+    calls = fake_provider(monkeypatch)
+    db = fake_db(monkeypatch)
+    await get_embeddings_cached(db, ["text"])
+
+    for name, value in [
+        ("EMBEDDING_PROVIDER", EmbeddingProvider.OPENAI),
+        ("EMBEDDING_MODEL", "other-model"),
+        ("EMBEDDING_DIMENSION", 7),
+        ("EMBEDDING_NORMALIZE", True),
+    ]:
+        with monkeypatch.context() as m:
+            m.setattr(embedding_cache.settings, name, value)
+            await get_embeddings_cached(db, ["text"])
+    await get_embeddings_cached(db, ["text"])
+
+    assert calls == [["text"]] * 5
+    assert len(db.rows) == 5
+
+
+async def test_hits_only_touch_entries_not_used_recently(monkeypatch):
+    fake_provider(monkeypatch)
+    db = fake_db(monkeypatch)
+    await get_embeddings_cached(db, ["a", "b"])
+    for key, row in db.rows.items():
+        row["stale"] = key[-1] == content_hash("b")
+
+    await get_embeddings_cached(db, ["a", "b"])
+    await get_embeddings_cached(db, ["a", "b"])
+
+    assert db.statements == ["insert", "commit", ("touch", [content_hash("b")]), "commit"]
+
+
+async def test_stale_hits_are_touched_outside_the_upload_session_in_content_hash_order(monkeypatch):
+    fake_provider(monkeypatch)
+    upload_db, cache_db = FakeCacheSession(), fake_db(monkeypatch)
+    texts = [f"chunk {i}" for i in range(20)]
+    await get_embeddings_cached(cache_db, texts)
+    upload_db.rows = cache_db.rows
+    for row in cache_db.rows.values():
+        row["stale"] = True
+    cache_db.statements.clear()
+
+    await get_embeddings_cached(upload_db, texts)
+
+    assert upload_db.statements == []
+    assert cache_db.statements == [("touch", sorted(content_hash(text) for text in texts)), "commit"]
+
+
+async def test_eviction_runs_outside_the_upload_session(monkeypatch):
+    fake_provider(monkeypatch)
+    monkeypatch.setattr(embedding_cache.settings, "EMBEDDING_CACHE_EVICT_INTERVAL", 2)
+    monkeypatch.setattr(embedding_cache, "_writes_since_eviction", 0)
+    scheduled = []
+    monkeypatch.setattr(embedding_cache, "schedule_eviction", lambda: scheduled.append(True))
+    db = fake_db(monkeypatch)
+
+    await get_embeddings_cached(db, ["a"])
+    assert scheduled == []
+    await get_embeddings_cached(db, ["b", "c"])
+    assert scheduled == [True]
+    assert db.statements == ["insert", "commit", "insert", "commit"]
+
+
+async def test_new_entries_are_committed_in_content_hash_order(monkeypatch):
+    fake_provider(monkeypatch)
+    upload_db, cache_db = FakeCacheSession(), fake_db(monkeypatch)
+    texts = [f"chunk {i}" for i in range(20)]
+
+    await get_embeddings_cached(upload_db, texts)
+
+    # The upload's session only reads; the entries are committed on their own right away
+    assert upload_db.statements == []
+    assert cache_db.statements == ["insert", "commit"]
+    assert cache_db.inserted == sorted(content_hash(text) for text in texts)
+
+
+class EvictionSession:
+    def __init__(self, over_cap):
+        self.over_cap = over_cap
+        self.sql = []
+
+    async def execute(self, statement):
+        self.sql.append(str(statement.compile(dialect=postgresql.dialect())))
+        if statement.is_select:
+            return SimpleNamespace(scalar_one_or_none=lambda: "(0,1)" if self.over_cap else None)
+        return SimpleNamespace(rowcount=3)
+
+
+async def test_evict_drops_expired_then_least_recently_used(monkeypatch):
+    monkeypatch.setattr(embedding_cache.settings, "EMBEDDING_CACHE_MAX_ENTRIES", 100)
+    evictions = cache_stats.evictions
+
+    db = EvictionSession(over_cap=True)
+    assert await EmbeddingCache(db).evict() == 6
+    expired, check, overflow = db.sql
+    assert "last_used_at < now() -" in expired
+    assert "ORDER BY embedding_cache.last_used_at DESC" in check and "OFFSET" in check
+    # Exactly the entries past the cap, even when timestamps tie
+    assert "WHERE ctid IN (SELECT ctid" in overflow and "OFFSET" in overflow
+    assert cache_stats.evictions - evictions == 6
+
+    # Under the cap, only expired entries go
+    db = EvictionSession(over_cap=False)
+    assert await EmbeddingCache(db).evict() == 3
+    assert len(db.sql) == 2
@@ -0,0 +1,236 @@
+import base64
+import json
+import time
+import httpx
+import numpy as np
+import pytest
+from app.services.embeddings import (
+    AdaptiveConcurrencyLimiter, EmbeddingError, OllamaEmbeddingClient, OpenAIEmbeddingClient,
+    pack_batches, retry_after_seconds
+)
+
+
+def make_client(handler, **kwargs):
+    return OllamaEmbeddingClient(
+        "http://ollama.test", "test-model", transport=httpx.MockTransport(handler), **kwargs
+    )
+
+
+def vector_for(text):
+    return [float(len(text)), 1.0]
+
+
+async def test_embed_batches_and_preserves_order():
+    requests = []
+
+    def handler(request):
+        texts = json.loads(request.content)["input"]
+        requests.append(texts)
+        return httpx.Response(200, json={"embeddings": [vector_for(t) for t in texts]})
+
+    client = make_client(handler, batch_size=3, max_concurrency=2)
+    texts = ["a" * i for i in range(1, 8)]
+    embeddings = await client.embed(texts)
+    await client.aclose()
+
+    assert embeddings == [vector_for(t) for t in texts]
+    assert sorted(len(batch) for batch in requests) == [1, 3, 3]
+
+
+async def test_failed_batch_is_split_instead_of_zero_filled():
+    def handler(request):
+        texts = json.loads(request.content)["input"]
+        if "bad" in texts and len(texts) > 1:
+            return httpx.Response(400, json={"error": "input too long"})
+        return httpx.Response(200, json={"embeddings": [vector_for(t) for t in texts]})
+
+    client = make_client(handler, batch_size=4)
+    embeddings = await client.embed(["one", "bad", "three", "four"])
+    await client.aclose()
+
+    assert embeddings == [vector_for(t) for t in ["one", "bad", "three", "four"]]
+
+
+async def test_persistent_failure_raises():
+    def handler(request):
+        return httpx.Response(500)
+
+    client = make_client(handler, batch_size=2, max_retries=2)
+    with pytest.raises(EmbeddingError):
+        await client.embed(["one", "two"])
+    await client.aclose()
+
+
+async def test_server_errors_are_retried_without_splitting():
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content)["input"])
+        if len(requests) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"embeddings": [vector_for(t) for t in requests[-1]]})
+
+    client = make_client(handler, batch_size=4, max_retries=3)
+    embeddings = await client.embed(["one", "two", "three", "four"])
+    await client.aclose()
+
+    assert embeddings == [vector_for(t) for t in ["one", "two", "three", "four"]]
+    assert [len(batch) for batch in requests] == [4, 4, 4]
+
+
+async def test_unreachable_server_fails_fast_without_splitting():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = make_client(handler, batch_size=64, max_retries=2)
+    with pytest.raises(EmbeddingError):
+        await client.embed([f"text {i}" for i in range(128)])
+    await client.aclose()
+
+    # Each of the two batches is tried max_retries times, never split into single texts
+    assert len(requests) == 4
+
+
+async def test_falls_back_to_legacy_endpoint():
+    def handler(request):
+        if request.url.path == "/api/embed":
+            return httpx.Response(404, text="404 page not found")
+        prompt = json.loads(request.content)["prompt"]
+        return httpx.Response(200, json={"embedding": vector_for(prompt)})
+
+    client = make_client(handler)
+    embeddings = await client.embed(["x", "yy"])
+    await client.aclose()
+
+    assert embeddings == [vector_for("x"), vector_for("yy")]
+
+
+def make_openai_client(handler, **kwargs):
+    return OpenAIEmbeddingClient(
+        "http://openai.test/v1", "test-model", transport=httpx.MockTransport(handler), retry_wait=0, **kwargs
+    )
+
+
+def openai_response(texts, status=200, headers=None):
+    data = [{"object": "embedding", "index": i, "embedding": vector_for(t)} for i, t in enumerate(texts)]
+    # Servers may return the items in any order
+    return httpx.Response(status, json={"object": "list", "data": data[::-1]}, headers=headers)
+
+
+def test_batches_are_packed_by_count_and_tokens():
+    texts = ["a" * 40, "b" * 40, "c" * 400, "d" * 4, "e" * 4, "f" * 4]
+    # 10, 10, 100, 1, 1, 1 estimated tokens
+    assert pack_batches(texts, max_inputs=2, max_tokens=50, chars_per_token=4) == [(0, 2), (2, 3), (3, 5), (5, 6)]
+    assert pack_batches(texts, max_inputs=100, max_tokens=1000, chars_per_token=4) == [(0, 6)]
+
+
+async def test_openai_embeds_in_order_with_auth():
+    requests = []
+
+    def handler(request):
+        assert request.url.path == "/v1/embeddings"
+        assert request.headers["authorization"] == "Bearer secret"
+        body = json.loads(request.content)
+        requests.append(body["input"])
+        return openai_response(body["input"])
+
+    client = make_openai_client(handler, api_key="secret", batch_size=3)
+    texts = ["a" * i for i in range(1, 8)]
+    embeddings = await client.embed(texts)
+    await client.aclose()
+
+    assert embeddings == [vector_for(t) for t in texts]
+    assert [len(batch) for batch in requests] == [3, 3, 1]
+
+
+async def test_openai_decodes_base64_embeddings():
+    def handler(request):
+        body = json.loads(request.content)
+        assert body["encoding_format"] == "base64" and body["dimensions"] == 2
+        data = [
+            {"index": i, "embedding": base64.b64encode(np.array(vector_for(t), dtype="<f4").tobytes()).decode()}
+            for i, t in enumerate(body["input"])
+        ]
+        return httpx.Response(200, json={"data": data})
+
+    client = make_openai_client(handler, encoding_format="base64", dimensions=2)
+    embeddings = await client.embed(["one", "three"])
+    await client.aclose()
+
+    assert [list(e) for e in embeddings] == [vector_for("one"), vector_for("three")]
+
+
+@pytest.mark.parametrize("data", [["x"], [{"index": 0}], [{"index": "0", "embedding": [1.0]}], [None]])
+async def test_openai_malformed_responses_raise(data):
+    client = make_openai_client(lambda request: httpx.Response(200, json={"data": data}), max_retries=1)
+    with pytest.raises(EmbeddingError):
+        await client.embed(["one"])
+    await client.aclose()
+
+
+async def test_openai_backs_off_on_429():
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        if calls["count"] <= 2:
+            return httpx.Response(429, headers={"retry-after-ms": "20"})
+        return openai_response(json.loads(request.content)["input"])
+
+    client = make_openai_client(handler, max_concurrency=8)
+    start = time.monotonic()
+    embeddings = await client.embed(["one"])
+    await client.aclose()
+
+    assert embeddings == [vector_for("one")]
+    assert calls["count"] == 3
+    assert time.monotonic() - start >= 0.02
+    assert client.limiter.limit < 8
+
+
+async def test_openai_client_errors_are_not_retried():
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        return httpx.Response(400, json={"error": {"message": "input too long"}})
+
+    client = make_openai_client(handler)
+    with pytest.raises(EmbeddingError):
+        await client.embed(["one"])
+    await client.aclose()
+    assert calls["count"] == 1
+
+
+async def test_openai_persistent_server_errors_raise():
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        return httpx.Response(503)
+
+    client = make_openai_client(handler, max_retries=3)
+    with pytest.raises(EmbeddingError):
+        await client.embed(["one"])
+    await client.aclose()
+    assert calls["count"] == 3
+
+
+async def test_limiter_recovers_after_throttling():
+    limiter = AdaptiveConcurrencyLimiter(4, decrease_interval=0)
+    limiter.throttled()
+    limiter.throttled()
+    assert limiter.limit == 1
+    for _ in range(1 + 2 + 3):
+        async with limiter:
+            limiter.succeeded()
+    assert limiter.limit == 4
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds(httpx.Response(429, headers={"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(httpx.Response(429, headers={"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(httpx.Response(429)) is None
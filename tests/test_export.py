@@ -0,0 +1,58 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.export import chunk_export, chunk_summary, document_chunks_query, stream_ndjson
+
+
+class FakeResult:
+    def __init__(self, rows, size):
+        self.rows, self.size = rows, size
+
+    async def partitions(self):
+        for i in range(0, len(self.rows), self.size):
+            yield self.rows[i:i + self.size]
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.options = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, statement):
+        self.options = statement.get_execution_options()
+        return FakeResult(self.rows, self.options["yield_per"])
+
+
+def make_row(index):
+    return SimpleNamespace(
+        document_id=1,
+        filename="a.txt",
+        chunk_index=index,
+        page_number=1,
+        content=f"chunk {index}",
+        content_vector=np.arange(8, dtype=np.float32)
+    )
+
+
+async def test_stream_ndjson_emits_one_line_per_row_in_batches():
+    session = FakeSession([make_row(i) for i in range(5)])
+    batches = [b async for b in stream_ndjson(document_chunks_query(1), chunk_summary, lambda: session, yield_per=2)]
+    assert session.options["yield_per"] == 2
+    assert len(batches) == 3
+    lines = b"".join(batches).decode().splitlines()
+    assert [json.loads(line)["chunk_number"] for line in lines] == [0, 1, 2, 3, 4]
+    assert json.loads(lines[0])["embedding_preview"] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_chunk_export_vectors_optional():
+    row = make_row(3)
+    assert chunk_export(row)["embedding"] == list(range(8))
+    assert "embedding" not in chunk_export(row, include_vectors=False)
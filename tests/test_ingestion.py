@@ -0,0 +1,202 @@
+import asyncio
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.document_service import UploadResult
+from app.services.ingestion import (
+    IngestionQueue, InMemoryJobStore, NonRetryableJobError, get_ingestion_queue
+)
+
+
+async def stub_embedder(texts):
+    return [[float(len(text))] for text in texts]
+
+
+def make_handler(chunks, seen_progress):
+    async def handler(job, progress):
+        await progress("parsed", 0, len(chunks))
+        for done in range(1, len(chunks) + 1):
+            await stub_embedder(chunks[done - 1:done])
+            await progress("embedding", done, len(chunks))
+            seen_progress.append(done)
+        await progress("stored", len(chunks), len(chunks))
+        return 42, len(chunks)
+    return handler
+
+
+async def test_worker_processes_job_with_progress(tmp_path):
+    source = tmp_path / "upload"
+    source.write_bytes(b"hello")
+    seen = []
+    queue = IngestionQueue(InMemoryJobStore(), make_handler(["a", "b", "c"], seen), poll_interval=0.01)
+
+    job = await queue.submit("doc.txt", "Default", str(source))
+    await queue.start()
+    for _ in range(100):
+        if (await queue.get(job.id)).status == "completed":
+            break
+        await asyncio.sleep(0.01)
+    await queue.stop()
+
+    job = await queue.get(job.id)
+    assert job.status == "completed"
+    assert (job.document_id, job.chunks_embedded, job.chunks_total) == (42, 3, 3)
+    assert seen == [1, 2, 3]
+    assert not source.exists()
+
+
+async def test_failed_job_is_retried_then_marked_failed(tmp_path):
+    calls = []
+
+    async def handler(job, progress):
+        calls.append(job.attempts)
+        raise RuntimeError("embedding server down")
+
+    queue = IngestionQueue(InMemoryJobStore(), handler, max_attempts=2)
+    job = await queue.submit("doc.txt", "Default", str(tmp_path / "missing"))
+    while await queue.run_once():
+        pass
+
+    job = await queue.get(job.id)
+    assert calls == [1, 2]
+    assert job.status == "failed"
+    assert "embedding server down" in job.error
+
+
+async def test_invalid_input_is_not_retried(tmp_path):
+    async def handler(job, progress):
+        raise NonRetryableJobError("Collection not found: nope")
+
+    queue = IngestionQueue(InMemoryJobStore(), handler, max_attempts=3)
+    job = await queue.submit("doc.txt", "nope", str(tmp_path / "missing"))
+    await queue.run_once()
+
+    job = await queue.get(job.id)
+    assert (job.status, job.attempts) == ("failed", 1)
+
+
+async def test_stale_running_jobs_resume():
+    store = InMemoryJobStore()
+    queue = IngestionQueue(store, make_handler(["a"], []))
+    job = await queue.submit("doc.txt", "Default", "unused")
+    await store.claim()  # A worker took the job and then the process died
+
+    assert await store.requeue_stale(timedelta(seconds=-1)) == 1
+    assert await queue.run_once()
+    assert (await queue.get(job.id)).status == "completed"
+
+
+async def test_job_that_keeps_killing_its_worker_is_given_up(tmp_path):
+    source = tmp_path / "upload"
+    source.write_bytes(b"hello")
+    store = InMemoryJobStore()
+    queue = IngestionQueue(store, make_handler(["a"], []), max_attempts=2)
+    job = await queue.submit("doc.pdf", "Default", str(source))
+
+    # Each run dies mid-job and the job is requeued, until it is out of attempts
+    await store.claim()
+    assert await store.requeue_stale(timedelta(seconds=-1), queue.max_attempts) == 1
+    await store.claim()
+    assert await store.requeue_stale(timedelta(seconds=-1), queue.max_attempts) == 0
+
+    job = await queue.get(job.id)
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert "stopped responding" in job.error
+    assert not source.exists()
+    assert not await queue.run_once()
+
+
+def test_job_status_endpoint():
+    store = InMemoryJobStore()
+    queue = IngestionQueue(store, make_handler([], []))
+    app.dependency_overrides[get_ingestion_queue] = lambda: queue
+    try:
+        client = TestClient(app)
+        job = asyncio.run(queue.submit("doc.txt", "Default", "unused"))
+
+        response = client.get(f"/api/jobs/{job.id}")
+        assert response.status_code == 200
+        assert response.json()["status"] == "queued"
+        assert client.get("/api/jobs/unknown").status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+
+async def test_reindex_counts_are_recorded(tmp_path):
+    source = tmp_path / "upload"
+    source.write_bytes(b"hello")
+
+    async def handler(job, progress):
+        return UploadResult(7, 10, added=2, kept=8, removed=1)
+
+    queue = IngestionQueue(InMemoryJobStore(), handler)
+    job = await queue.submit("doc.md", "Default", str(source))
+    assert await queue.run_once()
+
+    job = await queue.get(job.id)
+    assert (job.chunks_total, job.chunks_added, job.chunks_kept, job.chunks_removed) == (10, 2, 8, 1)
+
+
+async def test_heartbeat_keeps_long_jobs_from_being_requeued(tmp_path):
+    source = tmp_path / "upload"
+    source.write_bytes(b"hello")
+    store = InMemoryJobStore()
+    stale_after = timedelta(seconds=0.05)
+    requeued = []
+
+    async def handler(job, progress):
+        # Parsing a large file without reporting progress for several stale_after periods
+        for _ in range(5):
+            await asyncio.sleep(0.03)
+            requeued.append(await store.requeue_stale(stale_after))
+        return 1, 1
+
+    queue = IngestionQueue(store, handler, stale_after=0.05, heartbeat_interval=0.01)
+    job = await queue.submit("doc.pdf", "Default", str(source))
+    assert await queue.run_once()
+
+    assert requeued == [0] * 5
+    assert (await queue.get(job.id)).status == "completed"
+
+
+async def test_run_taken_over_by_another_worker_leaves_the_job_alone(tmp_path):
+    source = tmp_path / "upload"
+    source.write_bytes(b"hello")
+    store = InMemoryJobStore()
+
+    async def handler(job, progress):
+        # Meanwhile the job was requeued and claimed by another worker
+        await store.requeue_stale(timedelta(seconds=-1))
+        await store.claim()
+        return 1, 1
+
+    queue = IngestionQueue(store, handler)
+    job = await queue.submit("doc.txt", "Default", str(source))
+    assert await queue.run_once()
+
+    job = await queue.get(job.id)
+    assert (job.status, job.attempts) == ("running", 2)
+    assert source.exists()
+
+
+async def test_page_progress_is_recorded_for_pdfs(tmp_path):
+    store = InMemoryJobStore()
+    snapshots = []
+
+    async def handler(job, progress):
+        await progress("parsed", 0, None, 0, 120)
+        await progress("embedding", 256, None, 14, 120)
+        current = await store.get(job.id)
+        snapshots.append((current.stage, current.chunks_total, current.pages_done, current.pages_total))
+        await progress("embedding", 512, None)  # Documents without pages leave the page counts alone
+        return 1, 600
+
+    queue = IngestionQueue(store, handler)
+    job = await queue.submit("doc.pdf", "Default", str(tmp_path / "upload"))
+    assert await queue.run_once()
+
+    job = await queue.get(job.id)
+    assert snapshots == [("embedding", None, 14, 120)]
+    assert (job.pages_done, job.pages_total, job.chunks_total) == (14, 120, 600)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services import memory_index as memory_index_module
+from app.services.memory_index import Snapshot, load_snapshot, remove_snapshots, snapshot_prefix, write_snapshot
+
+
+def brute_force(matrix, query, distance):
+    if distance == "l2":
+        return np.linalg.norm(matrix - query, axis=1)
+    if distance == "cosine":
+        return 1 - matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    return -(matrix @ query)
+
+
+@pytest.mark.parametrize("distance", ["l2", "cosine", "inner_product"])
+def test_search_matches_brute_force(distance):
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((500, 32)).astype(np.float32)
+    query = rng.standard_normal(32).astype(np.float32)
+    snapshot = Snapshot(1, np.arange(1000, 1500), matrix)
+
+    ids, distances = snapshot.search(query, 10, distance)
+    expected = brute_force(matrix, query, distance)
+    order = np.argsort(expected)[:10]
+    assert ids.tolist() == (order + 1000).tolist()
+    np.testing.assert_allclose(distances, expected[order], rtol=1e-4, atol=1e-4)
+
+
+def test_snapshots_are_versioned_files(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.memory_index.settings.MEMORY_INDEX_DIR", str(tmp_path))
+    matrix = np.eye(4, dtype=np.float32)
+    for version in (1, 2):
+        write_snapshot(snapshot_prefix(7, version), np.arange(4), matrix * version)
+
+    remove_snapshots(7, keep_version=2)
+    assert load_snapshot(snapshot_prefix(7, 1), 1) is None
+    snapshot = load_snapshot(snapshot_prefix(7, 2), 2)
+    assert isinstance(snapshot.matrix, np.memmap)
+    assert snapshot.search(np.array([0, 0, 2, 0], dtype=np.float32), 1, "l2")[0].tolist() == [2]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, statement):
+        return FakeResult(self.rows)
+
+
+async def test_new_version_falls_back_until_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.memory_index.settings.MEMORY_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr("app.services.memory_index.settings.MEMORY_INDEX_HOT_QUERIES", 1000)
+    index = memory_index_module.MemoryIndex()
+    query = np.array([1, 0], dtype=np.float32)
+    write_snapshot(snapshot_prefix(3, 5), np.array([10, 11]), np.array([[0, 1], [1, 0]], dtype=np.float32))
+
+    assert await index.search(FakeSession([(3, 5, 2)]), [3], query, 1) == ([11], [0.0])
+    # An upload bumped the version: the old snapshot must not answer
+    assert await index.search(FakeSession([(3, 6, 3)]), [3], query, 1) is None
+    # Too large, or across all collections: Postgres
+    monkeypatch.setattr("app.services.memory_index.settings.MEMORY_INDEX_MAX_CHUNKS", 2)
+    assert await index.search(FakeSession([(3, 5, 3)]), [3], query, 1) is None
+    assert await index.search(FakeSession([(3, 5, 2)]), None, query, 1) is None
@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+
+from app.core.metrics import NOOP, Counter, Gauge, Histogram, Registry
+from app.main import app
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = Histogram("t_seconds", "Test", ["stage"], buckets=(0.1, 1.0), registry=registry)
+    histogram.labels("embed").observe(0.05)
+    histogram.labels(stage="embed").observe(0.5, count=2)
+    histogram.labels("embed").observe(5.0)
+    lines = registry.render().splitlines()
+    assert 't_seconds_bucket{stage="embed",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="embed",le="1"} 3' in lines
+    assert 't_seconds_bucket{stage="embed",le="+Inf"} 4' in lines
+    assert 't_seconds_sum{stage="embed"} 6.05' in lines
+    assert 't_seconds_count{stage="embed"} 4' in lines
+    assert "# TYPE t_seconds histogram" in lines
+
+
+def test_counter_gauge_and_functions():
+    registry = Registry()
+    counter = Counter("t_total", "Test", registry=registry)
+    counter.inc()
+    counter.inc(2)
+    gauge = Gauge("t_gauge", "Test", registry=registry)
+    gauge.set(5)
+    gauge.dec()
+    sampled = Gauge("t_sampled", "Test", registry=registry)
+    sampled.set_function(lambda: 7)
+    registry.add_callback(lambda: gauge.inc(10))
+    lines = registry.render().splitlines()
+    assert "t_total 3" in lines
+    assert "t_gauge 14" in lines
+    assert "t_sampled 7" in lines
+
+
+def test_noop_metric_accepts_every_call():
+    with NOOP.labels("x").time():
+        NOOP.observe(1.0)
+    NOOP.inc()
+    NOOP.set(1)
+
+
+def test_metrics_endpoint_reports_requests():
+    client = TestClient(app)
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'rag_http_request_seconds_count{method="GET",route="/health",status="200"}' in response.text
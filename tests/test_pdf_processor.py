@@ -0,0 +1,109 @@
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.pdf_processor import (
+    count_pages, extract_page_range, iter_pdf_chunks, process_pdf, shutdown_pdf_executor
+)
+from benchmarks.corpus import make_pdf
+
+
+async def test_pages_stream_back_in_order(monkeypatch):
+    monkeypatch.setattr("app.services.pdf_processor.settings.PDF_PAGES_PER_TASK", 2)
+    monkeypatch.setattr("app.services.pdf_processor.settings.PDF_PROCESS_WORKERS", 2)
+    pdf = make_pdf([f"Page number {i}" for i in range(1, 6)])
+
+    counted = []
+
+    async def on_page_count(pages):
+        counted.append(pages)
+
+    try:
+        chunks = [chunk async for chunk in iter_pdf_chunks(pdf, on_page_count=on_page_count)]
+    finally:
+        shutdown_pdf_executor()
+
+    assert counted == [5]
+    assert [page for _, page in chunks] == [1, 2, 3, 4, 5]
+    assert chunks == process_pdf(pdf)
+    assert chunks[0][0] == "Page number 1"
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+async def test_page_ranges_in_flight_are_bounded(monkeypatch):
+    monkeypatch.setattr("app.services.pdf_processor.settings.PDF_PAGES_PER_TASK", 1)
+    executor = CountingExecutor()
+    monkeypatch.setattr("app.services.pdf_processor.get_pdf_executor", lambda: executor)
+    pdf = make_pdf([f"Page number {i}" for i in range(1, 11)])
+
+    chunks = iter_pdf_chunks(pdf, window=2)
+    try:
+        first = await chunks.__anext__()
+        # The page count, the first window and the range submitted as the first one was consumed
+        assert executor.submitted == 1 + 2 + 1
+        rest = [chunk async for chunk in chunks]
+    finally:
+        await chunks.aclose()
+        executor.shutdown()
+
+    assert [page for _, page in [first] + rest] == list(range(1, 11))
+    assert executor.submitted == 1 + 10
+
+
+def peak_extraction_memory(path) -> int:
+    tracemalloc.start()
+    try:
+        count_pages(str(path))
+        extract_page_range(str(path), 0, 1)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_extracting_a_range_does_not_read_the_whole_file(tmp_path):
+    peaks, sizes = [], []
+    for lines in (100, 3000):
+        pdf = make_pdf(["First page"] + ["\n".join(f"Line {j} of page {i}" for j in range(lines)) for i in range(20)])
+        path = tmp_path / f"{lines}.pdf"
+        path.write_bytes(pdf)
+        sizes.append(len(pdf))
+        peaks.append(peak_extraction_memory(path))
+
+    # The file grows by well over a megabyte; reading the first page should not
+    assert sizes[1] - sizes[0] > 1_000_000
+    assert peaks[1] - peaks[0] < 200_000
+
+
+async def test_temp_file_outlives_ranges_still_running_when_closed(monkeypatch):
+    monkeypatch.setattr("app.services.pdf_processor.settings.PDF_PAGES_PER_TASK", 1)
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr("app.services.pdf_processor.get_pdf_executor", lambda: executor)
+    file_seen = []
+
+    def slow_extract(source, start, end, chunker):
+        time.sleep(0.05 if start == 0 else 0.3)
+        file_seen.append(os.path.exists(source))
+        return extract_page_range(source, start, end, chunker), 0.0
+
+    monkeypatch.setattr("app.services.pdf_processor._timed_extract", slow_extract)
+    pdf = make_pdf([f"Page number {i}" for i in range(1, 11)])
+
+    chunks = iter_pdf_chunks(pdf, window=2)
+    try:
+        await chunks.__anext__()
+    finally:
+        # The next ranges are running in the pool when the consumer gives up
+        await chunks.aclose()
+        executor.shutdown()
+
+    assert file_seen and all(file_seen)
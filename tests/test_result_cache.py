@@ -0,0 +1,115 @@
+import warnings
+
+from app.services.result_cache import (
+    MemoryResultBackend, RedisResultBackend, SearchResultCache, collection_generation, result_cache_key
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """In-memory stand-in for redis.asyncio.Redis."""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expiry[key] = ex
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, statement):
+        return FakeResult(self.rows)
+
+
+async def test_memory_backend_stays_within_budget():
+    backend = MemoryResultBackend(max_bytes=30)
+    await backend.set("a", b"x" * 10)
+    await backend.set("b", b"x" * 10)
+    assert await backend.get("a") == b"x" * 10  # "b" becomes least recently used
+    await backend.set("c", b"x" * 10)
+
+    assert await backend.get("b") is None
+    assert backend.size_bytes == 22 and len(backend) == 2
+    await backend.set("huge", b"x" * 100)
+    assert await backend.get("huge") is None
+
+
+async def test_memory_backend_expiry():
+    clock = FakeClock()
+    backend = MemoryResultBackend(max_bytes=100, ttl=5, clock=clock)
+    await backend.set("a", b"1")
+    clock.now = 6
+    assert await backend.get("a") is None
+    assert backend.size_bytes == 0
+
+
+async def test_new_collection_version_misses():
+    cache = SearchResultCache(RedisResultBackend("redis://unused", ttl=60, client=FakeRedis()))
+    results = [{"chunk_content": "text", "distance": 0.5, "score": 0.03}]
+
+    key = await cache.key(FakeSession([(3, 5, "none", 4)]), "query", [3], 10)
+    assert await cache.get(key) is None
+    await cache.set(key, results)
+    assert await cache.get(await cache.key(FakeSession([(3, 5, "none", 4)]), "query", [3], 10)) == results
+    # An upload bumped the version
+    assert await cache.get(await cache.key(FakeSession([(3, 6, "none", 4)]), "query", [3], 10)) is None
+    # The collection was deleted
+    assert await cache.get(await cache.key(FakeSession([]), "query", [3], 10)) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert cache.backend.client.expiry == {"rag:results:" + key: 60}
+
+
+def test_key_normalizes_collection_order():
+    first = result_cache_key("query", [7, 3], 10, None, None, "3:5")
+    assert first == result_cache_key("query", [3, 7, 3], 10, None, None, "3:5")
+    assert first != result_cache_key("query", None, 10, None, None, "3:5")
+    assert first != result_cache_key("query", [3, 7], 10, 40, None, "3:5")
+
+
+async def test_generation_includes_search_settings():
+    generation = await collection_generation(FakeSession([(1, 2, "binary", 8), (4, 0, "none", 4)]), None)
+    assert generation == "1:2:binary:8;4:0:none:4"
+
+
+async def test_backend_errors_are_misses():
+    class BrokenBackend:
+        async def get(self, key):
+            raise ConnectionError("down")
+
+        async def set(self, key, value):
+            raise ConnectionError("down")
+
+    cache = SearchResultCache(BrokenBackend())
+    await cache.set("k", [])
+    assert await cache.get("k") is None
+    assert cache.misses == 1
+
+
+async def test_redis_backend_closes_without_deprecation_warning():
+    backend = RedisResultBackend("redis://localhost:6379/0")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        await backend.close()
@@ -0,0 +1,101 @@
+import re
+
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from app.db.database import content_tsv_rebuild
+from app.services import embeddings
+from app.services.search import LatencyAverage, batch_search_query, hybrid_search_query
+
+
+def test_batch_query_correlates_lateral_search():
+    sql = str(batch_search_query(["a", "b"], np.zeros((2, 768), dtype=np.float32), [1], 5).compile(
+        dialect=postgresql.dialect()
+    ))
+    assert sql.count("unnest(") == 1
+    assert "WITH ORDINALITY AS queries(query_text, query_vector, ordinal) JOIN LATERAL" in sql
+    assert "queries.query_text" in sql and "queries.query_vector" in sql
+
+
+async def test_query_embeddings_embed_misses_once(monkeypatch):
+    calls = []
+
+    async def fake_get_embeddings(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t))] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(embeddings, "get_embeddings", fake_get_embeddings)
+    embeddings.query_embedding_cache.clear()
+    embeddings.query_embedding_cache.set(embeddings._query_cache_key("cached"), np.array([9.0], dtype=np.float32))
+
+    result = await embeddings.get_query_embeddings(["ab", "cached", "abc", "ab"])
+    assert calls == [["ab", "abc"]]
+    assert result[:, 0].tolist() == [2.0, 9.0, 3.0, 2.0]
+    embeddings.query_embedding_cache.clear()
+
+
+def test_latency_average():
+    average = LatencyAverage(alpha=0.5)
+    assert average.value is None
+    average.observe(1.0)
+    average.observe(3.0)
+    assert average.value == 2.0
+
+
+def test_quantized_search_reranks_an_oversampled_shortlist():
+    sql = str(hybrid_search_query("q", np.zeros(768, dtype=np.float32), [1], 5, None, "binary", 3).compile(
+        dialect=postgresql.dialect()
+    ))
+    shortlist, rerank = sql.split(") AS vector_shortlist", 1)
+    # ANN order on the quantized expression the index is built on, exact distance on the shortlist
+    assert "ORDER BY CAST(binary_quantize(chunks_ollama.content_vector) AS BIT(768)) <~>" in shortlist
+    assert "ORDER BY vector_shortlist.content_vector <-> CAST(" in rerank
+
+
+def test_collection_filter_is_on_the_chunk_rows():
+    sql = str(hybrid_search_query("q", np.zeros(768, dtype=np.float32), [3, 7], 5).compile(
+        dialect=postgresql.dialect()
+    ))
+    candidates, final = sql.split(")\n SELECT ", 1)
+    # Ids rather than a join let a partitioned table be pruned; documents are only joined for the top rows
+    assert candidates.count("chunks_ollama.collection_id IN (__[POSTCOMPILE_collection_id_") == 2
+    assert "documents" not in candidates
+    assert "JOIN documents" in final
+
+    unfiltered = str(hybrid_search_query("q", np.zeros(768, dtype=np.float32), None, 5).compile(
+        dialect=postgresql.dialect()
+    ))
+    assert "collection_id IN" not in unfiltered
+
+
+def test_keyword_and_vector_lists_are_fused_by_reciprocal_rank(monkeypatch):
+    monkeypatch.setattr("app.services.search.settings.TEXT_SEARCH_CONFIG", "english")
+    monkeypatch.setattr("app.services.search.settings.RRF_K", 60)
+    monkeypatch.setattr("app.services.search.settings.HYBRID_CANDIDATE_FACTOR", 4)
+    statement = hybrid_search_query("fast cars -trucks", np.zeros(768, dtype=np.float32), [1], 5)
+    compiled = statement.compile(dialect=postgresql.dialect())
+    sql, params = str(compiled), compiled.params
+
+    # The keyword half parses user syntax with the configured config, on the GIN-indexed column
+    config, = set(re.findall(r"websearch_to_tsquery\(CAST\(%\((\w+)\)s AS REGCONFIG\), %\(websearch_to_tsquery_1\)s\)", sql))
+    assert (params[config], params["websearch_to_tsquery_1"]) == ("english", "fast cars -trucks")
+    assert "chunks_ollama.content_tsv @@ websearch_to_tsquery(" in sql
+    # Both lists take limit * HYBRID_CANDIDATE_FACTOR candidates and are ranked
+    assert [value for value in params.values() if isinstance(value, int) and value == 20] == [20, 20]
+    assert "row_number() OVER (ORDER BY keyword_hits.score DESC) AS rank" in sql
+    assert "row_number() OVER (ORDER BY vector_hits.distance) AS rank" in sql
+    # A chunk scores 1 / (RRF_K + rank) for each list it appears in, 0 for the other
+    assert "FROM vector_ranked FULL OUTER JOIN keyword_ranked ON vector_ranked.id = keyword_ranked.id" in sql
+    fused = re.search(r"coalesce\(vector_ranked.id, keyword_ranked.id\) AS id, (.*?) AS score", sql).group(1)
+    terms = re.findall(r"coalesce\(%\((\w+)\)s / CAST\(CAST\((\w+)_ranked.rank \+ %\((\w+)\)s AS FLOAT\) AS FLOAT\), %\((\w+)\)s\)", fused)
+    assert [(params[one], ranked, params[k], params[missing]) for one, ranked, k, missing in terms] == [
+        (1.0, "vector", 60, 0.0), (1.0, "keyword", 60, 0.0)
+    ]
+    assert "ORDER BY fused.score DESC" in sql
+
+
+def test_content_tsv_is_rebuilt_for_another_text_search_config(monkeypatch):
+    monkeypatch.setattr("app.db.database.settings.TEXT_SEARCH_CONFIG", "english")
+    statement = content_tsv_rebuild("chunks_ollama")
+    assert "position($cfg$'english'::regconfig$cfg$ in pg_get_expr(d.adbin, d.adrelid)) = 0" in statement
+    assert "ALTER TABLE chunks_ollama DROP COLUMN content_tsv;" in statement
@@ -0,0 +1,84 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db.database import get_db
+from app.main import app
+from app.services.ingestion import get_ingestion_queue
+from app.services.chunking import CharacterChunker, MarkdownChunker, split_stream
+from app.services.uploads import UploadLimitMiddleware, UploadTooLarge, iter_text_blocks, spool_upload
+
+
+async def blocks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_text_blocks_decode_characters_split_across_blocks(tmp_path):
+    text = "naïve café " * 50 + "\N{SNOWMAN}"
+    path = tmp_path / "upload.txt"
+    path.write_bytes(text.encode("utf-8") + b"\xff")
+    assert "".join(iter_text_blocks(str(path), block_size=7)) == text + "�"
+    assert "".join(iter_text_blocks(text.encode("utf-8"), block_size=3)) == text
+
+
+def test_stream_chunks_match_whole_text_chunks():
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 40 for i in range(50))
+    chunker = CharacterChunker(200)
+    streamed = list(split_stream(chunker, (text[i:i + 97] for i in range(0, len(text), 97)), window=2000))
+    assert all(len(chunk) <= 200 for chunk in streamed)
+    # Cuts fall on paragraph breaks, so only the chunk boundaries next to a cut move
+    assert " ".join(streamed).split() == " ".join(chunker.split(text)).split()
+
+
+def test_stream_cuts_markdown_at_headings():
+    text = "".join(f"# Section {i}\n" + "Some text here. " * 20 + "\n" for i in range(20))
+    chunks = list(split_stream(MarkdownChunker(500), [text], window=1500))
+    assert all(chunk.startswith("# Section") for chunk in chunks)
+
+
+async def test_spool_rejects_oversized_uploads(tmp_path):
+    path = tmp_path / "spool" / "job"
+    assert await spool_upload(blocks(b"abc", b"def"), str(path), max_bytes=6) == 6
+    assert path.read_bytes() == b"abcdef"
+
+    with pytest.raises(UploadTooLarge):
+        await spool_upload(blocks(b"abc", b"defg"), str(path), max_bytes=6)
+    assert not path.exists()
+
+
+async def test_middleware_rejects_by_content_length(monkeypatch):
+    monkeypatch.setattr("app.services.uploads.settings.MAX_UPLOAD_BYTES", 10)
+    received = []
+
+    async def app(scope, receive, send):
+        received.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    transport = httpx.ASGITransport(app=UploadLimitMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        oversized = b"x" * (10 + UploadLimitMiddleware.MULTIPART_OVERHEAD + 1)
+        response = await client.post("/api/documents/upload/text", content=oversized)
+        assert response.status_code == 413
+        assert (await client.post("/api/documents/upload/text", content=b"small")).status_code == 200
+        assert (await client.post("/api/query", content=oversized)).status_code == 200
+    assert received == ["/api/documents/upload/text", "/api/query"]
+
+
+def test_upload_rejects_overlap_the_chunker_would_cap(monkeypatch):
+    monkeypatch.setattr("app.services.chunking.settings.CHUNK_STRATEGY", "character")
+    # Rejected before the collection is looked up or anything is queued
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_ingestion_queue] = lambda: None
+    try:
+        response = TestClient(app).post(
+            "/api/documents/upload/text",
+            content=b"some text",
+            headers={"Collection-Name": "Default", "Document-Name": "notes.txt", "Chunk-Size": "500", "Chunk-Overlap": "200"}
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 400
+    assert "between 0 and 125" in response.json()["detail"]
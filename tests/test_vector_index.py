@@ -0,0 +1,53 @@
+import pytest
+from app.api.admin import IndexCreate
+from app.core.config import EmbeddingProvider
+from app.services.vector_index import build_index_ddl
+
+
+def test_hnsw_ddl_uses_operator_class_and_options():
+    ddl = build_index_ddl("chunks_ollama", "hnsw", "cosine", m=8, ef_construction=32)
+    assert ddl == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_ollama_vector_hnsw_cosine ON chunks_ollama "
+        "USING hnsw (content_vector vector_cosine_ops) WITH (m = 8, ef_construction = 32)"
+    )
+
+
+def test_ivfflat_ddl_without_concurrently():
+    ddl = build_index_ddl("chunks_openai", "ivfflat", "inner_product", concurrently=False, lists=50)
+    assert ddl.startswith("CREATE INDEX IF NOT EXISTS ix_chunks_openai_vector_ivfflat_inner_product")
+    assert "USING ivfflat (content_vector vector_ip_ops) WITH (lists = 50)" in ddl
+
+
+def test_unknown_method_rejected():
+    with pytest.raises(ValueError):
+        build_index_ddl("chunks_ollama", "diskann", "l2")
+
+
+def test_quantized_ddl_indexes_expressions():
+    ddl = build_index_ddl("chunks_ollama", "hnsw", "cosine", m=8, ef_construction=32, quantization="halfvec", dimension=768)
+    assert "ix_chunks_ollama_vector_hnsw_cosine_halfvec" in ddl
+    assert "USING hnsw ((content_vector::halfvec(768)) halfvec_cosine_ops)" in ddl
+
+    ddl = build_index_ddl("chunks_openai", "hnsw", "l2", quantization="binary", dimension=1536)
+    assert "ix_chunks_openai_vector_hnsw_binary" in ddl
+    assert "USING hnsw ((binary_quantize(content_vector)::bit(1536)) bit_hamming_ops)" in ddl
+
+    with pytest.raises(ValueError):
+        build_index_ddl("chunks_ollama", "hnsw", "l2", quantization="halfvec")
+
+
+def test_partitioned_parent_index_is_created_on_the_parent_only():
+    ddl = build_index_ddl("chunks_ollama", "hnsw", "l2", concurrently=False, only=True)
+    assert ddl.startswith("CREATE INDEX IF NOT EXISTS ix_chunks_ollama_vector_hnsw_l2 ON ONLY chunks_ollama USING hnsw")
+
+
+def test_index_requests_default_to_the_configured_provider(monkeypatch):
+    monkeypatch.setattr("app.api.admin.settings.EMBEDDING_PROVIDER", EmbeddingProvider.OPENAI)
+    assert IndexCreate().provider == EmbeddingProvider.OPENAI
+    assert IndexCreate(provider="ollama").provider == EmbeddingProvider.OLLAMA
+
+
+def test_index_requests_default_to_the_configured_distance(monkeypatch):
+    monkeypatch.setattr("app.api.admin.settings.VECTOR_DISTANCE", "cosine")
+    assert IndexCreate().distance == "cosine"
+    assert IndexCreate(distance="l2").distance == "l2"
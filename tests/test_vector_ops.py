@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app.services.vector_ops import fit_dimension, l2_normalize, to_matrix, zero_rows
+
+
+def test_to_matrix_pads_and_truncates():
+    matrix = to_matrix([[1.0, 2.0], [3.0, 4.0]], 4)
+    assert matrix.dtype == np.float32
+    assert matrix.tolist() == [[1.0, 2.0, 0.0, 0.0], [3.0, 4.0, 0.0, 0.0]]
+    assert to_matrix([[1.0, 2.0, 3.0]], 2).tolist() == [[1.0, 2.0]]
+
+
+def test_to_matrix_handles_ragged_rows():
+    matrix = to_matrix([[1.0], [1.0, 2.0, 3.0]], 2)
+    assert matrix.tolist() == [[1.0, 0.0], [1.0, 2.0]]
+
+
+def test_to_matrix_rejects_invalid_values():
+    with pytest.raises(ValueError):
+        to_matrix([[1.0, float("nan")]], 2)
+    with pytest.raises(ValueError):
+        to_matrix(["[1.0, 2.0]"], 2)
+
+
+def test_to_matrix_rejects_numeric_strings():
+    with pytest.raises(ValueError, match="must be numeric"):
+        to_matrix([["1", "2"]], 2)
+    with pytest.raises(ValueError, match="must be numeric"):
+        to_matrix([["1"], ["1", "2"]], 2)
+
+
+def test_to_matrix_reports_missing_values():
+    with pytest.raises(ValueError, match="missing"):
+        to_matrix([[1.0, None]], 2)
+    with pytest.raises(ValueError, match="missing"):
+        to_matrix([[1.0], [1.0, None]], 2)
+    assert to_matrix(np.array([[1, 2]], dtype=np.int64), 2).dtype == np.float32
+
+
+def test_fit_dimension_returns_same_matrix_when_sizes_match():
+    matrix = np.ones((2, 3), dtype=np.float32)
+    assert fit_dimension(matrix, 3) is matrix
+
+
+def test_l2_normalize_leaves_zero_rows():
+    matrix = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+    assert zero_rows(matrix) == 1
+    l2_normalize(matrix)
+    assert np.allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])